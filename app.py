@@ -1,13 +1,32 @@
 import os
+import json
 import logging
-from flask import Flask, render_template, jsonify, request, session
+import datetime
+from flask import Flask, render_template, jsonify, request, Response, g, stream_with_context
 from utils.ps_scripts import (
     check_admin_rights,
     get_installed_autodesk_products,
-    uninstall_products,
-    delete_autodesk_folder,
-    restart_computer
+    get_inventory_changes,
+    get_inventory_digest,
+    get_inventory_token,
+    find_residue,
+    clean_residue,
+    measure_footprint,
+    measure_product_footprints
 )
+from utils.http import (
+    decode_cursor,
+    encode_cursor,
+    json_response,
+    paginate,
+    parse_fields,
+    parse_page_size,
+    project
+)
+from utils.jobs import get_default_engine
+from utils.store import get_default_store
+from utils.metrics import render as render_metrics
+from utils import tracing
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -17,6 +36,38 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "autodesk-uninstaller-secret")
 
+@app.before_request
+def start_request_profile():
+    """Profile the request with ?profile=1 (stats returned instead of the response) or ?profile=save"""
+    mode = request.args.get('profile')
+    if mode not in ('1', 'true', 'save'):
+        return None
+    profile = tracing.start_profile()
+    if profile is None:
+        return jsonify({'success': False, 'error': 'Another request is being profiled'}), 409
+    g.profile = (profile, mode)
+    return None
+
+@app.after_request
+def finish_request_profile(response):
+    """Return or save the profile of a profiled request"""
+    profiled = g.pop('profile', None)
+    if profiled is None:
+        return response
+    profile, mode = profiled
+    tracing.stop_profile(profile)
+    if mode == 'save':
+        response.headers['X-Profile-File'] = tracing.save_profile(profile, request.path)
+        return response
+    return Response(tracing.profile_text(profile), mimetype='text/plain')
+
+@app.teardown_request
+def abandon_request_profile(error):
+    """Stop the profiler if the request failed before after_request ran"""
+    profiled = g.pop('profile', None)
+    if profiled is not None:
+        tracing.stop_profile(profiled[0])
+
 @app.route('/')
 def index():
     """Main page route"""
@@ -28,7 +79,8 @@ def index():
     
     try:
         installed_products = get_installed_autodesk_products()
-        return render_template('index.html', products=installed_products, is_admin=is_admin)
+        return render_template('index.html', products=installed_products, is_admin=is_admin,
+                               inventory_token=get_inventory_token())
     except Exception as e:
         logger.error(f"Error retrieving installed products: {str(e)}")
         return render_template('index.html', 
@@ -37,67 +89,287 @@ def index():
 
 @app.route('/get-products', methods=['GET'])
 def get_products():
-    """API endpoint to get all installed Autodesk products"""
+    """API endpoint to get all installed Autodesk products
+
+    Supports ?fields= projection, ?limit=/&cursor= pagination and
+    ?since=<token> deltas. Responses carry a strong ETag derived from the
+    inventory content, so unchanged polls are answered with 304.
+    ?footprint=1 adds the disk space under each product's install location.
+    A delta is never paged or measured, so since= together with limit=,
+    cursor= or footprint= is answered with 400.
+    """
+    since = request.args.get('since')
+    with_footprint = request.args.get('footprint', '').lower() in ('1', 'true')
+    try:
+        limit = parse_page_size()
+        cursor = request.args.get('cursor')
+        if cursor:
+            decode_cursor(cursor)
+        if since and (limit is not None or cursor or with_footprint):
+            raise ValueError("since cannot be combined with limit, cursor or footprint")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     try:
-        products = get_installed_autodesk_products()
-        return jsonify({'success': True, 'products': products})
+        force_refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        fields = parse_fields()
+        
+        products = get_installed_autodesk_products(force_refresh=force_refresh)
+        token = get_inventory_token()
+        
+        # Pollers that send their last token only get what changed
+        if since:
+            def build_changes():
+                changes = get_inventory_changes(since)
+                for key in ('products', 'added', 'changed'):
+                    if key in changes:
+                        changes[key] = project(changes[key], fields)
+                return {'success': True, **changes}
+            
+            return json_response(build_changes, etag_key=['changes', since, token, fields])
+        
+        def build_products():
+            page, next_cursor = paginate(products, key=lambda product: product['psChildName'],
+                                         cursor=cursor, limit=limit)
+            payload = {'success': True, 'products': project(page, fields), 'token': token}
+            if with_footprint:
+                footprints = measure_product_footprints(page)
+                for product, projected in zip(page, payload['products']):
+                    projected['footprint'] = footprints[product['psChildName']]
+            if limit is not None:
+                payload['nextCursor'] = next_cursor
+            return payload
+        
+        # Footprints change without the inventory changing, so they are tagged by content
+        if with_footprint:
+            return json_response(build_products)
+        
+        return json_response(build_products,
+                             etag_key=['products', get_inventory_digest(), token, fields, cursor, limit])
     except Exception as e:
         logger.error(f"Error retrieving installed products: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/uninstall', methods=['POST'])
 def uninstall():
-    """API endpoint to uninstall selected products"""
+    """API endpoint to start uninstalling selected products
+
+    The work runs as a background job; the response carries its ID for
+    /uninstall-status/<job_id> and /uninstall/stream?jobId=<job_id>.
+    With "trace": true (or ?trace=1) the job is traced for /uninstall-trace/<job_id>.
+    """
     try:
         data = request.json
         product_ids = data.get('productIds', [])
         delete_folder = data.get('deleteFolder', False)
         restart_pc = data.get('restartComputer', False)
+        traced = data.get('trace') is True or request.args.get('trace', '').lower() in ('1', 'true')
         
         if not product_ids:
             return jsonify({'success': False, 'error': 'No products selected for uninstallation'})
         
-        logger.info(f"Starting uninstallation of {len(product_ids)} products")
-        
-        # Store uninstallation session data
-        session['uninstall_in_progress'] = True
-        session['products_to_uninstall'] = product_ids
-        
-        # Start the uninstallation process
-        uninstall_results = uninstall_products(product_ids)
+        trace = tracing.Trace("uninstall job") if traced else None
+        with tracing.activate(trace), tracing.span("POST /uninstall", category="http", products=len(product_ids)):
+            logger.info(f"Starting uninstallation of {len(product_ids)} products")
+            job = get_default_engine().submit(product_ids, delete_folder=delete_folder, restart_computer=restart_pc,
+                                              trace=trace)
         
-        # Handle additional requested operations
-        autodesk_folder_deleted = False
-        if delete_folder:
-            autodesk_folder_deleted = delete_autodesk_folder()
+        return jsonify({'success': True, 'jobId': job.id, 'state': job.state}), 202
         
-        # After successful uninstallation and folder deletion, restart if requested
-        if restart_pc:
-            restart_computer()
-            return jsonify({'success': True, 'message': 'Uninstallation complete. System is restarting...'})
-        
-        return jsonify({
-            'success': True, 
-            'message': 'Uninstallation completed successfully',
-            'results': uninstall_results,
-            'folderDeleted': autodesk_folder_deleted
-        })
+    except Exception as e:
+        logger.error(f"Error starting uninstallation: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/uninstall-trace/<job_id>', methods=['GET'])
+def uninstall_trace(job_id):
+    """API endpoint returning a traced job's spans as a Chrome trace (chrome://tracing, Perfetto)"""
+    job = get_default_engine().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Unknown job: {job_id}'}), 404
+    if job.trace is None:
+        return jsonify({'success': False, 'error': f'Job {job_id} was not traced'}), 404
+    response = jsonify(job.trace.to_chrome())
+    response.headers['Content-Disposition'] = f'attachment; filename=uninstall-{job_id}.trace.json'
+    return response
+
+@app.route('/uninstall/stream', methods=['GET'])
+def uninstall_stream():
+    """Server-Sent Events endpoint that streams a job's progress
+
+    Subscribes to the job named by ?jobId=, which POST /uninstall started;
+    a GET never starts an uninstall. Events carry their position as the SSE
+    id, so a reconnecting browser resumes where it left off.
+    """
+    job_id = request.args.get('jobId')
+    if not job_id:
+        return jsonify({'success': False, 'error': 'jobId is required; start jobs with POST /uninstall'}), 400
+    job = get_default_engine().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Unknown job: {job_id}'}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    
+    def generate():
+        """Relay the job's events to the client as they happen"""
+        index = start
+        yield f"event: job\ndata: {json.dumps({'jobId': job.id})}\n\n"
+        while True:
+            events, done = job.events_since(index, timeout=15)
+            if not events:
+                if done:
+                    return
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield f"id: {index}\ndata: {json.dumps(event)}\n\n"
+                index += 1
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/footprint', methods=['GET'])
+def footprint():
+    """API endpoint reporting the disk space used by the Autodesk folders
+
+    Repeat requests only re-list directories that changed since the last
+    scan; ?refresh=1 forgets the cached directories first.
+    """
+    try:
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        return json_response({'success': True, **measure_footprint(refresh=refresh)})
+    except Exception as e:
+        logger.error(f"Error measuring Autodesk folders: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+def _residue_candidates():
+    """Product keys of the latest job, whose emptied uninstall keys count as leftovers"""
+    job = get_default_engine().latest()
+    return job.product_ids if job is not None else []
+
+@app.route('/residue', methods=['GET'])
+def residue():
+    """API endpoint listing what uninstalled Autodesk products left behind"""
+    try:
+        return json_response({'success': True, **find_residue(_residue_candidates())})
+    except Exception as e:
+        logger.error(f"Error finding leftovers: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/residue/clean', methods=['POST'])
+def residue_clean():
+    """API endpoint removing leftovers: {"ids": [...]} from /residue, or {"all": true}"""
+    try:
+        data = request.json or {}
+        item_ids = data.get('ids')
+        if item_ids is None and data.get('all') is not True:
+            return jsonify({'success': False, 'error': 'No leftovers selected for removal'}), 400
         
+        result = clean_residue(item_ids, _residue_candidates())
+        return jsonify({'success': not result['failed'], **result})
+    except Exception as e:
+        logger.error(f"Error removing leftovers: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus endpoint with PowerShell, discovery, uninstall and folder deletion timings"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+def _parse_time(value):
+    """Parse a timestamp given as epoch seconds or ISO 8601"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.timestamp()
+
+def _inventory_store():
+    """Return the inventory history store, or raise if it is disabled"""
+    store = get_default_store()
+    if store is None:
+        raise LookupError("Inventory history is disabled")
+    return store
+
+@app.route('/inventory/hosts', methods=['GET'])
+def inventory_hosts():
+    """API endpoint listing the hosts that currently have a product (?product=name or ?productCode=key)"""
+    name = request.args.get('product')
+    product_code = request.args.get('productCode')
+    if not name and not product_code:
+        return jsonify({'success': False, 'error': 'product or productCode is required'}), 400
+    try:
+        matches = _inventory_store().hosts_with(name=name, product_code=product_code)
+        return json_response({'success': True, 'hosts': matches,
+                              'hostCount': len({match['host'].lower() for match in matches})})
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
     except Exception as e:
-        logger.error(f"Error during uninstallation: {str(e)}")
+        logger.error(f"Error querying inventory history: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
-    finally:
-        # Clear uninstallation session data
-        session.pop('uninstall_in_progress', None)
-        session.pop('products_to_uninstall', None)
+
+@app.route('/inventory/changes', methods=['GET'])
+def inventory_changes():
+    """API endpoint listing products added or removed across hosts
+
+    ?change=removed|added (default removed), ?since= epoch seconds or ISO
+    8601, optional ?host=, ?product= (name) and ?productCode= filters, and
+    ?limit=/?cursor= paging, oldest first.
+    """
+    change = request.args.get('change', 'removed')
+    try:
+        if change not in ('added', 'removed'):
+            raise ValueError(f"Invalid change: {change}")
+        since = _parse_time(request.args['since']) if request.args.get('since') else 0.0
+        cursor = request.args.get('cursor')
+        after = tuple(json.loads(decode_cursor(cursor))) if cursor else None
+        limit = parse_page_size() or 100
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        page, next_after = _inventory_store().changes(
+            change=change, since=since, host=request.args.get('host'), name=request.args.get('product'),
+            product_code=request.args.get('productCode'), after=after, limit=limit)
+        next_cursor = encode_cursor(json.dumps(list(next_after))) if next_after else None
+        return json_response({'success': True, 'changes': page, 'nextCursor': next_cursor})
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error querying inventory history: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+def _job_status_response(job):
+    """Build a job status response, with product states when asked for"""
+    payload = job.status()
+    if request.args.get('products', '').lower() in ('1', 'true'):
+        try:
+            page, next_cursor = paginate(job.product_states(), key=lambda product: product['psChildName'],
+                                         cursor=request.args.get('cursor'), limit=parse_page_size())
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        payload['products'] = page
+        if request.args.get('limit'):
+            payload['nextCursor'] = next_cursor
+    return json_response({'success': True, **payload})
 
 @app.route('/uninstall-status', methods=['GET'])
 def uninstall_status():
-    """API endpoint to check uninstallation status"""
-    in_progress = session.get('uninstall_in_progress', False)
-    products = session.get('products_to_uninstall', [])
-    
-    return jsonify({
-        'inProgress': in_progress,
-        'products': products
-    })
+    """API endpoint to check the status of the most recent uninstallation"""
+    job = get_default_engine().latest()
+    if job is None:
+        return json_response({'success': True, 'inProgress': False})
+    return _job_status_response(job)
+
+@app.route('/uninstall-status/<job_id>', methods=['GET'])
+def uninstall_job_status(job_id):
+    """API endpoint to check the status of an uninstallation job"""
+    job = get_default_engine().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Unknown job: {job_id}'}), 404
+    return _job_status_response(job)
@@ -0,0 +1,81 @@
+"""Benchmark for deleting a C:\\Autodesk-shaped folder tree.
+
+Generates a tree of nested directories with a share of read-only files
+(the attribute that makes Remove-Item and shutil.rmtree fail) and deletes
+copies of it with shutil.rmtree, made to clear read-only files, and with
+the parallel FolderDeleter. Works on any platform.
+
+    python -m benchmarks.bench_fs_delete --dirs 400 --files 25 --workers 8
+"""
+import argparse
+import tempfile
+import logging
+import shutil
+import stat
+import time
+import os
+
+from utils.fs_delete import FolderDeleter
+
+def build_tree(root, dirs, files, size, readonly_share):
+    """Create dirs directories of files files each, some of them read-only"""
+    payload = b"x" * size
+    created = 0
+    for index in range(dirs):
+        # Three levels deep, like product/version/component folders
+        path = os.path.join(root, f"product{index % 10}", f"version{index % 7}", f"component{index}")
+        os.makedirs(path, exist_ok=True)
+        for number in range(files):
+            file_path = os.path.join(path, f"file{number}.dat")
+            with open(file_path, "wb") as f:
+                f.write(payload)
+            if (created % 100) < readonly_share * 100:
+                os.chmod(file_path, stat.S_IREAD)
+            created += 1
+    return created
+
+def run_rmtree(root):
+    """Delete with shutil.rmtree, clearing read-only attributes as it goes"""
+    def on_error(function, path, _):
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        function(path)
+    shutil.rmtree(root, onerror=on_error)
+    return not os.path.exists(root)
+
+def run_deleter(root, workers):
+    """Delete with the parallel FolderDeleter"""
+    report = FolderDeleter(workers=workers).delete(root)
+    return report["complete"] and not report["lockedCount"] and not report["errors"]
+
+def main():
+    """Run the benchmark and print a table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=400)
+    parser.add_argument("--files", type=int, default=25)
+    parser.add_argument("--size", type=int, default=4096, help="bytes per file")
+    parser.add_argument("--readonly", type=float, default=0.2, help="share of read-only files")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base = tempfile.mkdtemp(prefix="adu-delete-bench-")
+    try:
+        print(f"{'mode':>8} {'files':>8} {'seconds':>9} {'files/s':>10} {'ok':>4}")
+        modes = (("rmtree", run_rmtree), ("parallel", lambda root: run_deleter(root, args.workers)))
+        for label, run in modes:
+            best = float("inf")
+            ok = True
+            files = 0
+            for attempt in range(args.repeat):
+                root = os.path.join(base, f"{label}{attempt}")
+                files = build_tree(root, args.dirs, args.files, args.size, args.readonly)
+                start = time.perf_counter()
+                ok = run(root) and ok
+                best = min(best, time.perf_counter() - start)
+            print(f"{label:>8} {files:>8} {best:>9.3f} {files / best:>10.0f} {'yes' if ok else 'no':>4}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Benchmark suite for discovery, uninstall orchestration and the /uninstall route.
+
+Drives get_installed_autodesk_products, uninstall_products and POST
+/uninstall against the simulator backend, which stands in for PowerShell:
+registries of 100, 1,000 and 10,000 uninstall keys, Autodesk products that
+are all ODIS, all MSI, all special-case or a mix, and injected installer
+latencies. Each scenario reports throughput, p50/p99 latency and the CPU
+time the Python side spends per product, which excludes time spent waiting
+on (simulated) installers. Works on Linux without PowerShell.
+
+    python -m benchmarks.bench_orchestration
+    python -m benchmarks.bench_orchestration --save-baseline
+    python -m benchmarks.bench_orchestration --compare
+
+Each scenario runs --rounds times and reports the median of each metric.
+--compare exits with status 1 when a scenario is slower than the saved
+baseline (benchmarks/baselines/<name>.json) by more than --tolerance.
+Baselines depend on the machine they were recorded on, so none is kept in
+the repository: record one on the machine that runs the comparison, from
+the code to compare against, e.g.
+
+    git stash
+    python -m benchmarks.bench_orchestration --save-baseline
+    git stash pop
+    python -m benchmarks.bench_orchestration --compare
+"""
+import collections
+import statistics
+import argparse
+import platform
+import tempfile
+import logging
+import shutil
+import json
+import time
+import sys
+import os
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+SIZES = (100, 1000, 10000)
+
+# Shares of the Autodesk products removed by each method
+MIXES = {
+    "odis": {"odis": 1.0},
+    "msi": {"msi": 1.0},
+    "special": {"special": 1.0},
+    "mixed": {"odis": 0.4, "msi": 0.4, "special": 0.2},
+}
+
+# Seconds (mean, jitter) each simulated removal takes
+LATENCIES = {
+    "none": {"odis": (0.0, 0.0), "msi": (0.0, 0.0), "special": (0.0, 0.0), "folder": (0.0, 0.0)},
+    "fast": {"odis": (0.02, 0.005), "msi": (0.005, 0.001), "special": (0.002, 0.0005), "folder": (0.01, 0.0)},
+}
+
+OPERATIONS = ("discovery", "uninstall", "route")
+
+# (metric, True if higher is better, change too small to count as a regression);
+# p99 of a handful of runs moves by several milliseconds whenever the scheduler stalls
+METRICS = (
+    ("throughput", True, 0.0),
+    ("p50_ms", False, 2.0),
+    ("p99_ms", False, 25.0),
+    ("cpu_us_per_product", False, 25.0),
+)
+
+def percentile(values, share):
+    """Nearest-rank percentile of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(share * len(ordered))) - 1))]
+
+def make_backend(size, mix, latency, seed):
+    """A simulated machine; every removal succeeds so runs are comparable"""
+    from utils.simulator import SimulatedBackend
+    return SimulatedBackend(registry_size=size, product_mix=MIXES[mix], latencies=LATENCIES[latency],
+                            latency_scale=1.0, failure_rate=0.0, seed=seed)
+
+def summarize(latencies, products, wall, cpu):
+    """Metrics of one scenario from per-item latencies (seconds) and run totals"""
+    return {
+        "products": products,
+        "seconds": round(wall, 4),
+        "throughput": round(products / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "cpu_us_per_product": round(cpu / products * 1e6, 1) if products else 0.0,
+    }
+
+def bench_discovery(size, repeat, min_seconds, seed):
+    """Full product discoveries of one registry; throughput is keys per second"""
+    from utils.ps_scripts import get_installed_autodesk_products, set_backend
+    set_backend(make_backend(size, "mixed", "none", seed))
+    latencies = []
+    runs = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while runs < repeat or time.perf_counter() - wall_start < min_seconds:
+        start = time.perf_counter()
+        products = get_installed_autodesk_products(force_refresh=True)
+        latencies.append(time.perf_counter() - start)
+        runs += 1
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    metrics = summarize(latencies, len(products) * runs, wall, cpu)
+    metrics["throughput"] = round(size * runs / wall, 1)
+    return metrics
+
+def removal_timer():
+    """Return (on_event, elapsed): elapsed collects each product's seconds from started to finished
+
+    Records only keep durationSeconds rounded to milliseconds, which reads
+    as 0 for removals without simulated latency. Products removed over
+    several passes add up the time of each.
+    """
+    started = {}
+    elapsed = collections.defaultdict(float)
+
+    def on_event(event):
+        kind = event.get("event")
+        if kind == "started":
+            started[event["psChildName"]] = time.perf_counter()
+        elif kind == "finished" and event.get("psChildName") in started:
+            elapsed[event["psChildName"]] += time.perf_counter() - started.pop(event["psChildName"])
+
+    return on_event, elapsed
+
+def bench_uninstall(size, mix, latency, repeat, min_seconds, seed):
+    """Uninstall every Autodesk product, repeatedly; latencies are per product removal"""
+    from utils.ps_scripts import get_installed_autodesk_products, set_backend, uninstall_products
+    latencies = []
+    products = wall = cpu = attempt = 0
+    while attempt < repeat or wall < min_seconds:
+        set_backend(make_backend(size, mix, latency, seed + attempt))
+        ids = [product['psChildName'] for product in get_installed_autodesk_products(force_refresh=True)]
+        on_event, elapsed = removal_timer()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        uninstall_products(ids, on_event=on_event)
+        wall += time.perf_counter() - start
+        cpu += time.process_time() - cpu_start
+        products += len(ids)
+        latencies += list(elapsed.values())
+        attempt += 1
+    return summarize(latencies, products, wall, cpu)
+
+def bench_route(size, mix, latency, repeat, min_seconds, seed):
+    """POST /uninstall and wait for the job; latencies are of the request itself"""
+    from app import app
+    from utils.jobs import get_default_engine
+    from utils.ps_scripts import get_installed_autodesk_products, set_backend
+    client = app.test_client()
+    engine = get_default_engine()
+    latencies = []
+    products = wall = cpu = attempt = 0
+    while attempt < repeat or wall < min_seconds:
+        set_backend(make_backend(size, mix, latency, seed + attempt))
+        ids = [product['psChildName'] for product in get_installed_autodesk_products(force_refresh=True)]
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        response = client.post('/uninstall', json={"productIds": ids})
+        latencies.append(time.perf_counter() - start)
+        job = engine.get(response.get_json()["jobId"])
+        index = 0
+        done = False
+        while not done:
+            events, done = job.events_since(index, timeout=1.0)
+            index += len(events)
+        wall += time.perf_counter() - start
+        cpu += time.process_time() - cpu_start
+        products += len(ids)
+        attempt += 1
+    return summarize(latencies, products, wall, cpu)
+
+def median_of(rounds):
+    """Combine rounds of one scenario into the median of each metric
+
+    A single lucky or stalled round moves neither the result nor the
+    baseline, unlike keeping the best round.
+    """
+    ordered = sorted(rounds, key=lambda metrics: metrics["throughput"])
+    median = dict(ordered[len(ordered) // 2])
+    for metric, _, _ in METRICS:
+        median[metric] = round(statistics.median(metrics[metric] for metrics in rounds), 3)
+    return median
+
+def scenarios(args):
+    """Yield (scenario id, function) for every requested combination"""
+    for operation in args.operations:
+        for size in args.sizes:
+            if operation == "discovery":
+                yield f"discovery/keys={size}", lambda size=size: bench_discovery(
+                    size, args.repeat * 10, args.min_seconds, args.seed)
+                continue
+            for mix in args.mixes:
+                for latency in args.latencies:
+                    name = f"{operation}/keys={size}/mix={mix}/latency={latency}"
+                    function = bench_uninstall if operation == "uninstall" else bench_route
+                    yield name, lambda function=function, size=size, mix=mix, latency=latency: function(
+                        size, mix, latency, args.repeat, args.min_seconds, args.seed)
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better, floor in METRICS:
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) if higher_is_better else (new - old)
+            if change > floor and change / old > tolerance:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change / old:+.0%} worse)")
+    return regressions
+
+def baseline_path(name):
+    """Where the baseline called name is stored"""
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def main():
+    """Run the suite, print a table and save or compare baselines"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="uninstall keys per registry")
+    parser.add_argument("--mixes", nargs="+", choices=sorted(MIXES), default=sorted(MIXES))
+    parser.add_argument("--latencies", nargs="+", choices=sorted(LATENCIES), default=sorted(LATENCIES))
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="minimum runs per round (discoveries run 10x as many)")
+    parser.add_argument("--rounds", type=int, default=5,
+                        help="rounds per scenario; each metric is their median")
+    parser.add_argument("--min-seconds", type=float, default=0.2,
+                        help="keep repeating a round until it has been measured this long")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default="default", help="baseline name under benchmarks/baselines")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if results regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, as a fraction")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+
+    # Keep the history store and job journal out of the user's profile
+    scratch = tempfile.mkdtemp(prefix="adu-bench-")
+    os.environ["AUTODESK_UNINSTALLER_INVENTORY_DB"] = ""
+    os.environ["AUTODESK_UNINSTALLER_JOURNAL"] = ""
+    os.environ["AUTODESK_UNINSTALLER_PROFILE_DIR"] = scratch
+    logging.disable(logging.WARNING)
+
+    results = {}
+    print(f"{'scenario':<52} {'products':>8} {'per sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'cpu us/prod':>11}")
+    try:
+        for name, function in scenarios(args):
+            metrics = median_of([function() for _ in range(args.rounds)])
+            results[name] = metrics
+            print(f"{name:<52} {metrics['products']:>8} {metrics['throughput']:>10} {metrics['p50_ms']:>9} "
+                  f"{metrics['p99_ms']:>9} {metrics['cpu_us_per_product']:>11}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    document = {
+        "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.baseline), "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline {baseline_path(args.baseline)}")
+    if args.compare:
+        try:
+            with open(baseline_path(args.baseline)) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {baseline_path(args.baseline)}; run with --save-baseline first")
+            return 2
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions against {baseline_path(args.baseline)} "
+              f"(recorded {baseline['recordedAt']})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
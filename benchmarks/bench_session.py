@@ -0,0 +1,77 @@
+"""Benchmark for running a job's PowerShell commands in one session.
+
+Compares the previous behavior, where every command started a fresh
+interpreter that dot-sourced a newly written copy of the function library,
+with a job-scoped PowerShellSession that loads the library once. Runs
+against the stub host, so it works without PowerShell; use
+--startup-delay to model a real interpreter's start-up time.
+
+    python -m benchmarks.bench_session --products 10 --passes 3 --startup-delay 0.4
+"""
+import argparse
+import tempfile
+import logging
+import time
+import sys
+import os
+
+from utils.ps_host import PowerShellHost
+from utils.ps_scripts import PS_LIBRARY, PowerShellSession
+
+STUB_ARGV = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "utils", "ps_host_stub.py")]
+
+def job_commands(products, passes):
+    """Return the commands of one job: a command per product per pass, then the restart"""
+    commands = [f"Write-Output removed-{index}" for _ in range(passes) for index in range(products)]
+    return commands + ["Write-Output Restart-ComputerForced"]
+
+def run_spawn_per_command(commands):
+    """Start an interpreter, write and load the library, run, tear down: once per command"""
+    for command in commands:
+        fd, script_path = tempfile.mkstemp(suffix='.ps1')
+        with os.fdopen(fd, 'w') as f:
+            f.write(PS_LIBRARY)
+        host = PowerShellHost(STUB_ARGV)
+        try:
+            # The stub can't read the file, so the library text stands in for dot-sourcing it
+            host.execute(PS_LIBRARY + "\n" + command)
+        finally:
+            host.close()
+            os.unlink(script_path)
+    return len(commands)
+
+def run_session(commands):
+    """Run every command in one job-scoped session"""
+    with PowerShellSession(size=1, argv=STUB_ARGV) as session:
+        for command in commands:
+            session.run(command)
+    return 1
+
+def main():
+    """Run the benchmark and print a table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=10)
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--startup-delay", type=float, default=0.0,
+                        help="seconds each stub interpreter takes to start")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    os.environ["AUTODESK_UNINSTALLER_PS_POOL"] = "1"
+    os.environ["ADU_STUB_STARTUP_DELAY"] = str(args.startup_delay)
+    commands = job_commands(args.products, args.passes)
+
+    print(f"{'mode':>8} {'commands':>9} {'spawns':>7} {'seconds':>9} {'ms/command':>11}")
+    for label, run in (("spawn", run_spawn_per_command), ("session", run_session)):
+        best = float("inf")
+        spawns = 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            spawns = run(commands)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:>8} {len(commands):>9} {spawns:>7} {best:>9.3f} {best * 1000 / len(commands):>11.2f}")
+
+if __name__ == "__main__":
+    main()
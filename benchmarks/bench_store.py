@@ -0,0 +1,87 @@
+"""Benchmark for the SQLite inventory history.
+
+Records snapshots of many hosts, each a little different from the last
+(products are installed and removed between inventories), then times
+the questions the /inventory endpoints answer: which hosts still have a
+product, and what was removed since a given time. Works on any platform.
+
+    python -m benchmarks.bench_store --hosts 500 --snapshots 100 --products 20
+"""
+import argparse
+import tempfile
+import logging
+import random
+import shutil
+import time
+import os
+
+from utils.store import InventoryStore
+
+def product(number):
+    """A synthetic Autodesk product"""
+    return {"psChildName": f"{{{number:08X}-0000-0000-0000-000000000000}}",
+            "displayName": f"Autodesk Product {number}", "publisher": "Autodesk"}
+
+def fill(store, hosts, snapshots, products, catalog, churn, seed):
+    """Record snapshots inventories of every host; return the number of product rows"""
+    rng = random.Random(seed)
+    installed = {f"HOST{index:05d}": set(rng.sample(range(catalog), products)) for index in range(hosts)}
+    rows = 0
+    start_time = time.time() - snapshots * 3600
+    for snapshot in range(snapshots):
+        batch = []
+        for host, numbers in installed.items():
+            for _ in range(churn):
+                numbers.discard(rng.choice(sorted(numbers)))
+                numbers.add(rng.choice([number for number in range(catalog) if number not in numbers]))
+            batch.append((host, start_time + snapshot * 3600, [product(number) for number in numbers]))
+            rows += len(numbers)
+        store.write(batch)
+    return rows
+
+def timed(label, repeat, function):
+    """Print the best of repeat runs of function"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<44} {best * 1000:>9.2f} ms {len(result):>7} rows")
+
+def main():
+    """Run the benchmark and print the query times"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--snapshots", type=int, default=100, help="inventories per host")
+    parser.add_argument("--products", type=int, default=20, help="products per host")
+    parser.add_argument("--catalog", type=int, default=200, help="distinct products across the fleet")
+    parser.add_argument("--churn", type=int, default=1, help="products swapped between inventories")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    base = tempfile.mkdtemp(prefix="adu-store-bench-")
+    try:
+        store = InventoryStore(os.path.join(base, "inventory.sqlite3"))
+        start = time.perf_counter()
+        rows = fill(store, args.hosts, args.snapshots, args.products, args.catalog, args.churn, args.seed)
+        seconds = time.perf_counter() - start
+        print(f"recorded {args.hosts * args.snapshots} snapshots, {rows} product rows "
+              f"in {seconds:.1f}s ({rows / seconds:,.0f} rows/s)")
+
+        since = time.time() - 5 * 3600
+        code = product(7)["psChildName"]
+        timed("hosts with product code", args.repeat, lambda: store.hosts_with(product_code=code))
+        timed("hosts with name containing 'Product 7'", args.repeat, lambda: store.hosts_with(name="Product 7"))
+        timed("removed in the last 5 inventories", args.repeat,
+              lambda: store.changes("removed", since=since, limit=1000)[0])
+        timed("removals of one product, ever", args.repeat,
+              lambda: store.changes("removed", product_code=code, limit=1000)[0])
+        timed("removals on one host, ever", args.repeat,
+              lambda: store.changes("removed", host="HOST00042", limit=1000)[0])
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Command-line interface for unattended runs (SCCM, Intune, scripts).
+
+Prints JSON (one document) or NDJSON (one object per line) on stdout;
+logs go to stderr. Does not import Flask.
+
+    python cli.py list
+    python cli.py plan --all
+    python cli.py --format ndjson uninstall --ids {GUID} {GUID} --delete-folder
+    python cli.py clean-folder
+    python cli.py footprint
+    python cli.py fleet uninstall --hosts-file lab.txt --all --concurrency 20
+
+Exit codes: 0 success, 1 error, 2 bad arguments, 3 finished but some
+products, files or hosts could not be handled, 4 not running as
+administrator.
+"""
+import argparse
+import logging
+import json
+import sys
+
+from utils.ps_scripts import (
+    check_admin_rights,
+    delete_autodesk_folder,
+    get_installed_autodesk_products,
+    job_session,
+    measure_footprint,
+    measure_product_footprints,
+    plan_uninstall,
+    set_backend,
+    uninstall_products
+)
+from utils.fleet import HOST_SUCCEEDED, FleetOrchestrator, PowerShellRemotingExecutor, SimulatedExecutor
+from utils.results import FAILED
+from utils.store import history_store
+from utils import tracing
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_INCOMPLETE = 3
+EXIT_NOT_ADMIN = 4
+
+class Output:
+    """Writes results as a JSON document or as NDJSON lines"""
+
+    def __init__(self, ndjson=False, stream=None):
+        self.ndjson = ndjson
+        self.stream = stream or sys.stdout
+
+    def line(self, item):
+        """Write one NDJSON line straight away"""
+        self.stream.write(json.dumps(item, default=str) + "\n")
+        self.stream.flush()
+
+    def items(self, key, items, **summary):
+        """Write a list: one line per item in NDJSON, one document otherwise"""
+        if self.ndjson:
+            for item in items:
+                self.line(item)
+            if summary:
+                self.line({"summary": True, **summary})
+        else:
+            self.document({key: items, **summary})
+
+    def event(self, event):
+        """Write a progress event; only NDJSON output streams them"""
+        if self.ndjson:
+            self.line(event)
+
+    def document(self, payload):
+        """Write the final result"""
+        if self.ndjson:
+            self.line(payload)
+        else:
+            self.stream.write(json.dumps(payload, indent=2, default=str) + "\n")
+
+def _selected_ids(args):
+    """Return the product ids named by --ids, or every installed product for --all"""
+    if args.all:
+        return [product['psChildName'] for product in get_installed_autodesk_products(force_refresh=True)]
+    return args.ids
+
+def _require_admin(output):
+    """Return an exit code if the tool lacks administrator rights, else None"""
+    if check_admin_rights():
+        return None
+    output.document({"success": False, "error": "Administrator privileges are required"})
+    return EXIT_NOT_ADMIN
+
+def command_list(args, output):
+    """List the installed Autodesk products"""
+    products = get_installed_autodesk_products(force_refresh=args.refresh)
+    if args.footprint:
+        footprints = measure_product_footprints(products)
+        products = [dict(product, footprint=footprints[product['psChildName']]) for product in products]
+    output.items("products", products, success=True, total=len(products))
+    return EXIT_OK
+
+def command_plan(args, output):
+    """Show what an uninstall would do without doing it"""
+    plan = plan_uninstall(_selected_ids(args))
+    output.items("plan", plan, success=True,
+                 uninstall=sum(1 for entry in plan if entry["action"] == "uninstall"),
+                 skip=sum(1 for entry in plan if entry["action"] == "skip"))
+    return EXIT_OK
+
+def command_uninstall(args, output):
+    """Uninstall products, optionally deleting the C:\\Autodesk folder afterwards"""
+    denied = _require_admin(output)
+    if denied is not None:
+        return denied
+
+    product_ids = _selected_ids(args)
+    folder_deleted = None
+    trace = tracing.Trace("cli.py uninstall") if args.trace else None
+    with job_session(), tracing.activate(trace), tracing.span("uninstall", category="job", products=len(product_ids)):
+        results = uninstall_products(product_ids, on_event=output.event) if product_ids else []
+        if args.delete_folder:
+            output.event({"event": "folder_started"})
+            folder_deleted = delete_autodesk_folder(on_event=output.event)
+    if trace is not None:
+        with open(args.trace, "w") as f:
+            json.dump(trace.to_chrome(), f)
+
+    failed = [record for record in results if record["state"] == FAILED]
+    payload = {"event": "complete", "success": not failed and folder_deleted is not False,
+               "results": results, "failed": len(failed)}
+    if args.delete_folder:
+        payload["folderDeleted"] = folder_deleted
+    output.document(payload)
+    return EXIT_OK if payload["success"] else EXIT_INCOMPLETE
+
+def command_clean_folder(args, output):
+    """Delete the C:\\Autodesk folder"""
+    denied = _require_admin(output)
+    if denied is not None:
+        return denied
+
+    report = {}
+
+    def on_event(event):
+        if event.get("event") == "folder_finished":
+            report.update(event)
+        output.event(event)
+
+    deleted = delete_autodesk_folder(on_event=on_event)
+    report.pop("event", None)
+    output.document({"event": "complete", "success": deleted, **report})
+    return EXIT_OK if deleted else EXIT_INCOMPLETE
+
+def command_footprint(args, output):
+    """Measure the disk space used by the Autodesk folders"""
+    footprint = measure_footprint()
+    output.items("roots", footprint["roots"], success=True, totalBytes=footprint["totalBytes"],
+                 totalFiles=footprint["totalFiles"], seconds=footprint["seconds"])
+    return EXIT_OK
+
+def _read_hosts(args):
+    """Return the hosts named by --hosts and --hosts-file (one per line, # starts a comment)"""
+    hosts = list(args.hosts or [])
+    if args.hosts_file:
+        with open(args.hosts_file) as f:
+            hosts += [line.split("#", 1)[0].strip() for line in f]
+    return [host for host in dict.fromkeys(hosts) if host]
+
+def _progress_line(progress):
+    """Render the aggregate fleet progress as one status line"""
+    states = progress["states"]
+    products = progress["products"]
+    return (f"hosts {progress['done']}/{progress['hosts']} done, {states.get('running', 0)} running, "
+            f"{states.get('failed', 0) + states.get('timed_out', 0)} failed | products "
+            f"{products['removed']} removed, {products['failed']} failed | {progress['elapsedSeconds']}s")
+
+def command_fleet(args, output):
+    """Run inventory or uninstall across many hosts"""
+    hosts = _read_hosts(args)
+    if not hosts:
+        output.document({"success": False, "error": "No hosts given"})
+        return EXIT_USAGE
+    if args.action == "uninstall" and not (args.ids or args.all):
+        output.document({"success": False, "error": "uninstall needs --ids or --all"})
+        return EXIT_USAGE
+
+    live = not output.ndjson and sys.stderr.isatty()
+
+    def on_progress(progress):
+        if output.ndjson:
+            output.line(progress)
+        elif live:
+            sys.stderr.write("\r" + _progress_line(progress).ljust(100))
+            sys.stderr.flush()
+
+    if args.backend == "simulator":
+        # Imported lazily so production runs never load the simulator
+        from utils.simulator import SimulatedBackend
+        executor = SimulatedExecutor(**SimulatedBackend.environment_options())
+    else:
+        executor = PowerShellRemotingExecutor()
+    orchestrator = FleetOrchestrator(executor, concurrency=args.concurrency, timeout=args.timeout,
+                                     retries=args.retries, retry_delay=args.retry_delay,
+                                     on_progress=on_progress, on_host=output.event,
+                                     store=history_store(simulated=args.backend == "simulator"))
+    if args.action == "inventory":
+        run = orchestrator.inventory(hosts)
+    else:
+        run = orchestrator.uninstall(hosts, product_ids=None if args.all else args.ids,
+                                     delete_folder=args.delete_folder)
+    if live:
+        sys.stderr.write("\n")
+
+    succeeded = all(record["state"] == HOST_SUCCEEDED for record in run["hosts"])
+    output.document({"success": succeeded, **run})
+    return EXIT_OK if succeeded else EXIT_INCOMPLETE
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(prog="cli.py", description="Remove Autodesk products without the user interface.")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json",
+                        help="json prints one document; ndjson prints one object per line and streams progress")
+    parser.add_argument("--backend", choices=("powershell", "simulator"),
+                        help="execution backend (default: AUTODESK_UNINSTALLER_BACKEND or powershell)")
+    parser.add_argument("--verbose", action="store_true", help="log debug output to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list installed Autodesk products")
+    list_parser.add_argument("--refresh", action="store_true", help="bypass the inventory cache")
+    list_parser.add_argument("--footprint", action="store_true", help="add each product's disk usage")
+    list_parser.set_defaults(handler=command_list)
+
+    for name, handler, help_text in (("plan", command_plan, "show what would be uninstalled and how"),
+                                     ("uninstall", command_uninstall, "uninstall products")):
+        command = commands.add_parser(name, help=help_text)
+        selection = command.add_mutually_exclusive_group(required=True)
+        selection.add_argument("--ids", nargs="+", metavar="ID", help="uninstall key names (PSChildName)")
+        selection.add_argument("--all", action="store_true", help="every installed Autodesk product")
+        command.set_defaults(handler=handler)
+        if name == "uninstall":
+            command.add_argument("--delete-folder", action="store_true", help="delete C:\\Autodesk afterwards")
+            command.add_argument("--trace", metavar="FILE", help="write a Chrome trace of the run to FILE")
+
+    commands.add_parser("clean-folder", help="delete the C:\\Autodesk folder").set_defaults(handler=command_clean_folder)
+    commands.add_parser("footprint", help="measure the Autodesk folders").set_defaults(handler=command_footprint)
+
+    fleet = commands.add_parser("fleet", help="run inventory or uninstall on many hosts through PowerShell remoting")
+    fleet.add_argument("action", choices=("inventory", "uninstall"))
+    fleet.add_argument("--hosts", nargs="+", metavar="HOST")
+    fleet.add_argument("--hosts-file", metavar="FILE", help="file with one host per line")
+    fleet.add_argument("--ids", nargs="+", metavar="ID", help="uninstall key names (PSChildName)")
+    fleet.add_argument("--all", action="store_true", help="every Autodesk product on each host")
+    fleet.add_argument("--delete-folder", action="store_true", help="delete C:\\Autodesk on each host afterwards")
+    fleet.add_argument("--concurrency", type=int, help="hosts worked on at once (default 16)")
+    fleet.add_argument("--timeout", type=float, default=3600.0, help="seconds allowed per host")
+    fleet.add_argument("--retries", type=int, default=1, help="retries for hosts that fail to connect or error")
+    fleet.add_argument("--retry-delay", type=float, default=5.0, help="seconds before the first retry")
+    fleet.set_defaults(handler=command_fleet)
+    return parser
+
+def main(argv=None):
+    """Run the command line and return the exit code"""
+    args = build_parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    output = Output(ndjson=args.format == "ndjson")
+
+    try:
+        if args.backend:
+            set_backend(args.backend)
+        return args.handler(args, output)
+    except KeyboardInterrupt:
+        output.document({"success": False, "error": "Interrupted"})
+        return EXIT_ERROR
+    except Exception as e:
+        logger.error(f"{args.command} failed: {str(e)}")
+        output.document({"success": False, "error": str(e)})
+        return EXIT_ERROR
+
+if __name__ == "__main__":
+    sys.exit(main())
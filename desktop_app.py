@@ -5,6 +5,9 @@ import threading
 import time
 import logging
 from app import app
+from utils.jobs import get_default_engine
+from utils.ps_host import get_default_pool, pool_enabled
+from utils.ps_scripts import cleanup_library_scripts
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
@@ -40,6 +43,16 @@ def main():
     server_thread.daemon = True
     server_thread.start()
     
+    # Write the PowerShell function library and remove stale copies
+    threading.Thread(target=cleanup_library_scripts, daemon=True).start()
+    
+    # Pick up uninstall jobs a crash or restart cut short
+    threading.Thread(target=get_default_engine, daemon=True).start()
+    
+    # Start the PowerShell hosts while the browser opens
+    if pool_enabled():
+        threading.Thread(target=get_default_pool().warm, daemon=True).start()
+    
     # Open the web browser
     open_browser()
     
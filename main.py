@@ -1,4 +1,11 @@
+import os
 from app import app
+from utils.jobs import get_default_engine
+from utils.ps_scripts import cleanup_library_scripts
 
 if __name__ == "__main__":
+    cleanup_library_scripts()
+    # Resume interrupted jobs in the serving process, not the reloader's watcher
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_default_engine()
     app.run(host="0.0.0.0", port=5000, debug=True)
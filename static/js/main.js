@@ -2,6 +2,7 @@
 let selectedProducts = [];
 let uninstallInProgress = false;
 let logArea;
+let inventoryToken = null;
 
 // Initialize the application when the DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
@@ -18,6 +19,12 @@ function initApp() {
     const restartComputerCheckbox = document.getElementById('restart-computer');
     logArea = document.getElementById('log-area');
     
+    // Remember which inventory snapshot the page was rendered from
+    const productListElement = document.getElementById('product-list');
+    if (productListElement && productListElement.dataset.inventoryToken) {
+        inventoryToken = productListElement.dataset.inventoryToken;
+    }
+    
     // Add event listeners
     if (selectAllCheckbox) {
         selectAllCheckbox.addEventListener('change', handleSelectAll);
@@ -143,105 +150,187 @@ function performUninstallation() {
     progressBar.style.width = '5%';
     progressBar.classList.remove('d-none');
     
-    // Prepare the request data
-    const requestData = {
-        productIds: selectedProducts,
-        deleteFolder: deleteFolder,
-        restartComputer: restartComputer
-    };
+    // Products that have reported a result, for the progress bar
+    const totalProducts = selectedProducts.length;
+    const finishedProducts = new Set();
     
-    // Send the uninstall request
+    // Start the job, then follow its progress stream
     fetch('/uninstall', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json',
+            'Content-Type': 'application/json'
         },
-        body: JSON.stringify(requestData)
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error(`HTTP error! Status: ${response.status}`);
-        }
-        progressBar.style.width = '100%';
-        return response.json();
+        body: JSON.stringify({
+            productIds: selectedProducts,
+            deleteFolder: deleteFolder,
+            restartComputer: restartComputer
+        })
     })
+    .then(response => response.json())
     .then(data => {
-        if (data.success) {
-            // Log success message
-            logMessage(data.message, 'success');
-            
-            // Log details about each product's uninstallation
-            if (data.results) {
-                logUninstallResults(data.results);
-            }
-            
-            // Log folder deletion result
-            if (deleteFolder) {
-                if (data.folderDeleted) {
-                    logMessage('C:\\Autodesk folder was successfully deleted', 'success');
-                } else {
-                    logMessage('Failed to delete C:\\Autodesk folder', 'warning');
-                }
-            }
-            
-            // Show success message
-            showAlert(data.message, 'success');
-            
-            // If restart was requested, show a message
-            if (restartComputer) {
-                logMessage('System will restart shortly...', 'warning');
-                showAlert('System will restart shortly...', 'warning');
-            }
-            
-            // Refresh the product list after uninstallation
-            setTimeout(() => {
-                if (!restartComputer) {
-                    refreshProductList();
-                }
-            }, 2000);
-        } else {
-            throw new Error(data.error || 'An unknown error occurred');
+        if (!data.success) {
+            throw new Error(data.error);
         }
+        logMessage(`Uninstallation job ${data.jobId} started`, 'info');
+        followUninstallJob(data.jobId, deleteFolder, restartComputer, progressBar, totalProducts, finishedProducts);
     })
     .catch(error => {
         logMessage(`Error: ${error.message}`, 'error');
         showAlert(`Error: ${error.message}`, 'danger');
         progressBar.classList.add('bg-danger');
-    })
-    .finally(() => {
+        uninstallInProgress = false;
+        updateUIForUninstallInProgress(false);
+    });
+}
+
+// Stream an uninstallation job's progress into the log
+function followUninstallJob(jobId, deleteFolder, restartComputer, progressBar, totalProducts, finishedProducts) {
+    const eventSource = new EventSource(`/uninstall/stream?jobId=${encodeURIComponent(jobId)}`);
+    
+    const finish = () => {
+        eventSource.close();
         if (!restartComputer) {
             uninstallInProgress = false;
             updateUIForUninstallInProgress(false);
         }
-    });
+    };
+    
+    eventSource.onmessage = (message) => {
+        const data = JSON.parse(message.data);
+        
+        switch (data.event) {
+            case 'pass_started':
+                logMessage(`Starting uninstallation pass ${data.pass} (${data.remaining} products remaining)`, 'info');
+                break;
+            case 'started':
+                logMessage(`Uninstalling ${data.displayName}...`, 'info');
+                break;
+            case 'method':
+                logMessage(`${data.displayName}: using ${data.method.toUpperCase()} removal`, 'info');
+                break;
+            case 'finished':
+                logUninstallResults(data);
+                break;
+            case 'product':
+                // Progress counts products in a final state; a product still
+                // installed after a pass goes back to pending and is retried
+                if (['removed', 'failed', 'skipped'].includes(data.state)) {
+                    finishedProducts.add(data.psChildName);
+                } else {
+                    finishedProducts.delete(data.psChildName);
+                }
+                progressBar.style.width = `${5 + Math.round(90 * finishedProducts.size / totalProducts)}%`;
+                break;
+            case 'pass':
+                logUninstallResults(data);
+                break;
+            case 'converged':
+                if (data.remaining.length > 0) {
+                    logMessage(`${data.remaining.length} products could not be removed after ${data.passes} passes`, 'warning');
+                } else {
+                    logMessage(`All selected products removed in ${data.passes} passes`, 'success');
+                }
+                logMessage(`Waited ${data.waitedSeconds}s for installers to settle (${data.waitSavedSeconds}s less than fixed delays)`, 'info');
+                break;
+            case 'folder_started':
+                logMessage('Deleting C:\\Autodesk folder...', 'info');
+                break;
+            case 'folder_progress':
+                logMessage(`Deleted ${data.filesRemoved} files (${formatBytes(data.bytesRemoved)}) from C:\\Autodesk`, 'info');
+                break;
+            case 'folder_finished':
+                logMessage(`Deleted ${data.filesRemoved} files (${formatBytes(data.bytesRemoved)}) from C:\\Autodesk in ${data.seconds}s`, 'info');
+                if (data.lockedCount > 0) {
+                    logMessage(`${data.lockedCount} files are in use and were left in place: ${data.locked.slice(0, 5).join(', ')}`, 'warning');
+                }
+                break;
+            case 'complete':
+                progressBar.style.width = '100%';
+                
+                // Log the final state of every product
+                logUninstallResults(data.results);
+                
+                // Log success message
+                logMessage(data.message, 'success');
+                
+                // Log folder deletion result
+                if (deleteFolder) {
+                    if (data.folderDeleted) {
+                        logMessage('C:\\Autodesk folder was successfully deleted', 'success');
+                    } else {
+                        logMessage('Failed to delete C:\\Autodesk folder', 'warning');
+                    }
+                }
+                
+                // Show success message
+                showAlert(data.message, 'success');
+                
+                // If restart was requested, show a message
+                if (restartComputer) {
+                    logMessage('System will restart shortly...', 'warning');
+                    showAlert('System will restart shortly...', 'warning');
+                }
+                
+                // Refresh the product list after uninstallation
+                setTimeout(() => {
+                    if (!restartComputer) {
+                        refreshProductList();
+                    }
+                }, 2000);
+                
+                finish();
+                break;
+            case 'error':
+                logMessage(`Error: ${data.error}`, 'error');
+                showAlert(`Error: ${data.error}`, 'danger');
+                progressBar.classList.add('bg-danger');
+                finish();
+                break;
+        }
+    };
+    
+    // The browser reconnects on its own and resumes from the last event it
+    // saw; only give up once it has stopped trying
+    eventSource.onerror = () => {
+        if (eventSource.readyState !== EventSource.CLOSED) {
+            logMessage('Connection to the uninstallation progress stream lost, reconnecting...', 'warning');
+            return;
+        }
+        if (uninstallInProgress) {
+            logMessage('Error: Lost connection to the uninstallation progress stream', 'error');
+            showAlert('Error: Lost connection to the uninstallation progress stream', 'danger');
+            progressBar.classList.add('bg-danger');
+        }
+        finish();
+    };
 }
 
 // Log uninstallation results
 function logUninstallResults(results) {
     if (Array.isArray(results)) {
-        results.forEach(result => {
-            let logType = 'info';
-            if (result.status === 'success') {
-                logType = 'success';
-            } else if (result.status === 'warning') {
-                logType = 'warning';
-            } else if (result.status === 'error') {
-                logType = 'error';
-            }
-            
-            if (result.displayName) {
-                logMessage(`${result.displayName}: ${result.message}`, logType);
-            } else {
-                logMessage(result.message, logType);
-            }
-        });
-    } else if (typeof results === 'object') {
-        // Single result object
+        results.forEach(result => logUninstallResults(result));
+    } else if (results && results.state) {
+        // Final per-product state record
+        const name = results.displayName || results.psChildName;
+        if (results.state === 'removed') {
+            const method = results.method ? results.method.toUpperCase() : 'unknown method';
+            logMessage(`${name}: removed (${method}, ${results.durationSeconds.toFixed(1)}s, ${results.attempts} attempt${results.attempts === 1 ? '' : 's'})`, 'success');
+        } else if (results.state === 'skipped') {
+            logMessage(`${name}: skipped - ${results.message}`, 'warning');
+        } else {
+            logMessage(`${name}: ${results.state} - ${results.message}`, 'error');
+        }
+    } else if (results && typeof results === 'object') {
+        // Single result or status message
         let logType = results.status === 'success' ? 'success' : 
                       results.status === 'warning' ? 'warning' : 
                       results.status === 'error' ? 'error' : 'info';
         
-        logMessage(results.message, logType);
+        if (results.displayName) {
+            logMessage(`${results.displayName}: ${results.message}`, logType);
+        } else {
+            logMessage(results.message, logType);
+        }
     }
 }
 
@@ -307,7 +396,15 @@ function updateUIForUninstallInProgress(inProgress) {
 
 // Refresh the product list
 function refreshProductList() {
-    fetch('/get-products')
+    // With a token the server only sends what changed since then, and only
+    // the fields the list actually renders
+    const params = new URLSearchParams({ fields: 'psChildName,displayName,publisher' });
+    if (inventoryToken) {
+        params.append('since', inventoryToken);
+    }
+    const url = `/get-products?${params.toString()}`;
+    
+    fetch(url)
         .then(response => {
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
@@ -319,14 +416,20 @@ function refreshProductList() {
                 // Log the refreshed product list
                 logMessage('Refreshed product list', 'info');
                 
-                // If needed, update the UI with the new product list
                 const productListElement = document.getElementById('product-list');
                 
-                if (productListElement && data.products.length > 0) {
-                    updateProductListUI(productListElement, data.products);
+                if (data.products) {
+                    // Full list: first load, or our token was too old
+                    if (productListElement && data.products.length > 0) {
+                        updateProductListUI(productListElement, data.products);
+                    } else if (productListElement) {
+                        productListElement.innerHTML = '<div class="alert alert-info">No Autodesk products found installed.</div>';
+                    }
                 } else if (productListElement) {
-                    productListElement.innerHTML = '<div class="alert alert-info">No Autodesk products found installed.</div>';
+                    applyProductListDelta(productListElement, data);
                 }
+                
+                inventoryToken = data.token;
             } else {
                 throw new Error(data.error || 'Failed to refresh product list');
             }
@@ -336,6 +439,38 @@ function refreshProductList() {
         });
 }
 
+// Build the list entry for one product
+function createProductListItem(product) {
+    const listItem = document.createElement('div');
+    listItem.className = 'list-group-item product-item d-flex align-items-center';
+    
+    const checkbox = document.createElement('input');
+    checkbox.type = 'checkbox';
+    checkbox.className = 'form-check-input me-3 product-checkbox';
+    checkbox.value = product.psChildName;
+    checkbox.dataset.name = product.displayName;
+    checkbox.addEventListener('change', updateSelectedProducts);
+    
+    const nameContainer = document.createElement('div');
+    nameContainer.className = 'ms-2 me-auto';
+    
+    const name = document.createElement('div');
+    name.className = 'fw-bold';
+    name.textContent = product.displayName;
+    
+    const publisher = document.createElement('div');
+    publisher.className = 'small text-muted';
+    publisher.textContent = product.publisher || 'Unknown Publisher';
+    
+    nameContainer.appendChild(name);
+    nameContainer.appendChild(publisher);
+    
+    listItem.appendChild(checkbox);
+    listItem.appendChild(nameContainer);
+    
+    return listItem;
+}
+
 // Update the product list UI with new data
 function updateProductListUI(listElement, products) {
     // Clear the current list
@@ -343,34 +478,7 @@ function updateProductListUI(listElement, products) {
     
     // Create a new list with the updated products
     products.forEach(product => {
-        const listItem = document.createElement('div');
-        listItem.className = 'list-group-item product-item d-flex align-items-center';
-        
-        const checkbox = document.createElement('input');
-        checkbox.type = 'checkbox';
-        checkbox.className = 'form-check-input me-3 product-checkbox';
-        checkbox.value = product.psChildName;
-        checkbox.dataset.name = product.displayName;
-        checkbox.addEventListener('change', updateSelectedProducts);
-        
-        const nameContainer = document.createElement('div');
-        nameContainer.className = 'ms-2 me-auto';
-        
-        const name = document.createElement('div');
-        name.className = 'fw-bold';
-        name.textContent = product.displayName;
-        
-        const publisher = document.createElement('div');
-        publisher.className = 'small text-muted';
-        publisher.textContent = product.publisher || 'Unknown Publisher';
-        
-        nameContainer.appendChild(name);
-        nameContainer.appendChild(publisher);
-        
-        listItem.appendChild(checkbox);
-        listItem.appendChild(nameContainer);
-        
-        listElement.appendChild(listItem);
+        listElement.appendChild(createProductListItem(product));
     });
     
     // Reset selection state
@@ -378,6 +486,51 @@ function updateProductListUI(listElement, products) {
     updateSelectedProducts();
 }
 
+// Find the list entry for a product, if it is shown
+function findProductListItem(listElement, psChildName) {
+    return [...listElement.querySelectorAll('.product-item')]
+        .find(item => item.querySelector('.product-checkbox').value === psChildName);
+}
+
+// Apply an inventory delta to the product list without rebuilding it
+function applyProductListDelta(listElement, delta) {
+    if (delta.removed.length === 0 && delta.added.length === 0 && delta.changed.length === 0) {
+        return;
+    }
+    
+    // The list may currently be showing the "no products" message
+    listElement.querySelectorAll('.alert').forEach(alert => alert.remove());
+    
+    delta.removed.forEach(psChildName => {
+        const item = findProductListItem(listElement, psChildName);
+        if (item) {
+            item.remove();
+        }
+    });
+    
+    delta.changed.forEach(product => {
+        const item = findProductListItem(listElement, product.psChildName);
+        const replacement = createProductListItem(product);
+        if (item) {
+            replacement.querySelector('.product-checkbox').checked = item.querySelector('.product-checkbox').checked;
+            item.replaceWith(replacement);
+        } else {
+            listElement.appendChild(replacement);
+        }
+    });
+    
+    delta.added.forEach(product => {
+        listElement.appendChild(createProductListItem(product));
+    });
+    
+    if (!listElement.querySelector('.product-item')) {
+        listElement.innerHTML = '<div class="alert alert-info">No Autodesk products found installed.</div>';
+    }
+    
+    // Keep the selection, minus anything that was removed
+    updateSelectedProducts();
+}
+
 // Log a message to the log area
 function logMessage(message, type = 'info') {
     if (!logArea) return;
@@ -398,6 +551,18 @@ function logMessage(message, type = 'info') {
     logArea.scrollTop = logArea.scrollHeight;
 }
 
+// Format a byte count for the log
+function formatBytes(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let value = bytes || 0;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
+    }
+    return `${value.toFixed(unit === 0 ? 0 : 1)} ${units[unit]}`;
+}
+
 // Show an alert message
 function showAlert(message, type = 'info') {
     const alertContainer = document.getElementById('alert-container');
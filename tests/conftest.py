@@ -0,0 +1,93 @@
+import types
+import stat
+import sys
+import os
+
+import pytest
+
+from utils import ps_scripts
+from utils.fs_delete import IO_REPARSE_TAG_MOUNT_POINT
+from utils.simulator import SimulatedBackend
+
+# Runs the warm host protocol without PowerShell
+STUB_HOST = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "utils", "ps_host_stub.py")]
+
+@pytest.fixture(autouse=True)
+def isolated_environment(monkeypatch):
+    """Keep the job journal and inventory history out of the user's profile"""
+    monkeypatch.setenv("AUTODESK_UNINSTALLER_JOURNAL", "")
+    monkeypatch.setenv("AUTODESK_UNINSTALLER_INVENTORY_DB", "")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "simulator(**options): SimulatedBackend options for the simulator fixture")
+
+@pytest.fixture
+def simulator(request):
+    """A simulated machine with instant, always successful removals, as the active backend
+
+    @pytest.mark.simulator(...) overrides or adds SimulatedBackend options.
+    """
+    options = dict(latency_scale=0.0, failure_rate=0.0, seed=1)
+    marker = request.node.get_closest_marker("simulator")
+    if marker is not None:
+        options.update(marker.kwargs)
+    previous = ps_scripts._backend
+    backend = ps_scripts.set_backend(SimulatedBackend(**options))
+    yield backend
+    ps_scripts.set_backend(previous)
+
+def wait_for(job, timeout=30.0):
+    """Follow a job's events until it is done"""
+    index = 0
+    done = False
+    while not done:
+        events, done = job.events_since(index, timeout=timeout)
+        assert events or done, "job made no progress"
+        index += len(events)
+    return job
+
+class JunctionEntry:
+    """A DirEntry as Python 3.11 shows a Windows junction: a folder that is not a symlink"""
+
+    def __init__(self, entry):
+        self.name = entry.name
+        self.path = entry.path
+        self._mtime_ns = entry.stat(follow_symlinks=False).st_mtime_ns
+
+    def is_symlink(self):
+        return False
+
+    def is_dir(self, follow_symlinks=True):
+        return True
+
+    def is_file(self, follow_symlinks=True):
+        return False
+
+    def stat(self, follow_symlinks=True):
+        return types.SimpleNamespace(st_mode=stat.S_IFDIR, st_size=0, st_mtime_ns=self._mtime_ns,
+                                     st_file_attributes=stat.FILE_ATTRIBUTE_REPARSE_POINT,
+                                     st_reparse_tag=IO_REPARSE_TAG_MOUNT_POINT)
+
+class Listing(list):
+    """A scandir result usable both as a list and as a context manager"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def fake_junctions(monkeypatch, *junctions):
+    """Make os.scandir report the folders at junctions as junctions; return the paths it listed"""
+    scandir = os.scandir
+    junctions = {str(path) for path in junctions}
+    listed = []
+
+    def scandir_with_junctions(path="."):
+        listed.append(str(path))
+        with scandir(path) as entries:
+            return Listing(JunctionEntry(entry) if entry.path in junctions else entry for entry in entries)
+
+    monkeypatch.setattr(os, "scandir", scandir_with_junctions)
+    return listed
@@ -0,0 +1,40 @@
+import pytest
+
+from app import app
+
+@pytest.fixture
+def client(simulator):
+    return app.test_client()
+
+@pytest.mark.parametrize("query", ["limit=abc", "limit=0", "limit=10&cursor=gA"])
+def test_get_products_rejects_bad_paging(client, query):
+    response = client.get(f"/get-products?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+def test_get_products_pages(client):
+    first = client.get("/get-products?limit=5").get_json()
+    assert len(first["products"]) == 5
+    second = client.get(f"/get-products?limit=5&cursor={first['nextCursor']}").get_json()
+    assert second["success"] is True
+    assert not {product["psChildName"] for product in first["products"]} & {
+        product["psChildName"] for product in second["products"]}
+
+def test_stream_never_starts_a_job(client, monkeypatch):
+    from utils.jobs import get_default_engine
+    submitted = []
+    monkeypatch.setattr(get_default_engine(), "submit", lambda *args, **kwargs: submitted.append(args))
+    response = client.get("/uninstall/stream?productIds=anything&deleteFolder=true")
+    assert response.status_code == 400
+    assert client.get("/uninstall/stream?jobId=missing").status_code == 404
+    assert submitted == []
+
+@pytest.mark.parametrize("extra", ["limit=5", "cursor=", "footprint=1"])
+def test_delta_cannot_be_paged(client, extra):
+    token = client.get("/get-products").get_json()["token"]
+    if extra == "cursor=":
+        extra += client.get("/get-products?limit=5").get_json()["nextCursor"]
+    response = client.get(f"/get-products?since={token}&{extra}")
+    assert response.status_code == 400
+    assert "since cannot be combined" in response.get_json()["error"]
+    assert client.get(f"/get-products?since={token}").get_json()["success"] is True
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from utils.fleet import HOST_SUCCEEDED, HOST_TIMED_OUT, FleetOrchestrator
+
+class StuckBackend:
+    """A host whose command only stops when it is cancelled"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+class Executor:
+    def __init__(self):
+        self.backends = {}
+
+    def connect(self, host):
+        return self.backends.setdefault(host, StuckBackend())
+
+def test_timed_out_host_is_cancelled_and_keeps_its_slot():
+    executor = Executor()
+    running = []
+    overlapped = []
+    lock = threading.Lock()
+
+    def operation(host, backend):
+        with lock:
+            running.append(host)
+            overlapped.append(len(running) > 1)
+        try:
+            if host == "stuck":
+                backend.cancelled.wait(10.0)
+                # Stopping takes a moment after the cancel
+                time.sleep(0.1)
+            return {}
+        finally:
+            with lock:
+                running.remove(host)
+
+    orchestrator = FleetOrchestrator(executor, concurrency=1, timeout=0.1, retries=2, retry_delay=0.0)
+    run = orchestrator.run(["stuck", "next"], operation)
+
+    states = {record["host"]: record for record in run["hosts"]}
+    assert executor.backends["stuck"].cancelled.is_set()
+    assert states["stuck"]["state"] == HOST_TIMED_OUT
+    assert states["stuck"]["attempts"] == 1
+    assert states["next"]["state"] == HOST_SUCCEEDED
+    assert not any(overlapped)
@@ -0,0 +1,39 @@
+from conftest import fake_junctions
+from utils.filesystem import InMemoryFilesystem
+from utils.footprint import FootprintScanner, footprint_roots
+from utils.ps_scripts import measure_footprint
+
+def test_roots_are_windows_paths_on_any_platform():
+    filesystem = InMemoryFilesystem(directories=["C:\\Users\\alice", "C:\\Users\\Public"])
+    roots = dict(footprint_roots(filesystem, environ={}))
+
+    assert roots["C:\\Autodesk"] == "C:\\Autodesk"
+    assert roots["Program Files (x86)\\Autodesk"] == "C:\\Program Files (x86)\\Autodesk"
+    assert roots["alice\\AppData\\Local\\Autodesk"] == "C:\\Users\\alice\\AppData\\Local\\Autodesk"
+    assert all("/" not in path for path in roots.values())
+
+def test_footprint_measures_the_backend_disk(simulator):
+    simulator.filesystem.add_file("C:\\Users\\alice\\AppData\\Roaming\\Autodesk\\settings.xml", 300)
+    footprint = measure_footprint()
+    roots = {root["label"]: root for root in footprint["roots"]}
+
+    # Shared licensing and identity files the simulator lays down
+    assert roots["ProgramData\\Autodesk"]["exists"]
+    assert roots["ProgramData\\Autodesk"]["bytes"] >= 22000
+    assert roots["alice\\AppData\\Roaming\\Autodesk"]["bytes"] == 300
+    assert footprint["totalBytes"] == sum(root["bytes"] for root in footprint["roots"])
+
+def test_scan_does_not_follow_junctions(tmp_path, monkeypatch):
+    root = tmp_path / "Autodesk"
+    (root / "Data").mkdir(parents=True)
+    (root / "Data" / "settings.xml").write_bytes(b"x" * 100)
+    # A junction pointing back up the tree would make the scan loop forever
+    loop = root / "Data" / "Loop"
+    loop.mkdir()
+    (loop / "again.xml").write_bytes(b"x" * 1000)
+    listed = fake_junctions(monkeypatch, loop)
+
+    result = FootprintScanner(workers=2).measure(str(root))
+
+    assert str(loop) not in listed
+    assert (result["bytes"], result["files"], result["directories"]) == (100, 1, 2)
@@ -0,0 +1,72 @@
+import errno
+import os
+
+from conftest import fake_junctions
+from utils import fs_delete
+from utils.fs_delete import delete_tree
+
+def make_tree(root, folders=6, files=5):
+    for folder in range(folders):
+        directory = root / f"folder{folder}" / "nested"
+        directory.mkdir(parents=True)
+        for index in range(files):
+            (directory / f"file{index}.dat").write_bytes(b"x" * 100)
+
+def test_locked_file_is_reported_and_the_rest_deleted(tmp_path, monkeypatch):
+    root = tmp_path / "Autodesk"
+    make_tree(root)
+    locked = root / "folder3" / "nested" / "file2.dat"
+    unlink = os.unlink
+
+    def in_use(path, *args, **kwargs):
+        # What Windows raises for a file another process has open
+        if os.path.samefile(path, locked):
+            raise PermissionError(errno.EACCES, "The process cannot access the file", str(path))
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(fs_delete.os, "unlink", in_use)
+    report = delete_tree(str(root), workers=4)
+
+    assert report["filesRemoved"] == 29
+    assert report["bytesRemoved"] == 2900
+    assert report["lockedCount"] == 1
+    assert report["locked"][0].endswith("file2.dat")
+    assert report["errors"] == []
+    assert not report["complete"]
+    # Only the locked file and the folders holding it are left
+    assert locked.exists()
+    assert sorted(path.name for path in root.rglob("*")) == ["file2.dat", "folder3", "nested"]
+
+def test_junction_is_removed_without_following_it(tmp_path, monkeypatch):
+    root = tmp_path / "Autodesk"
+    make_tree(root, folders=2, files=2)
+    # Stands in for a junction to a folder outside the tree
+    junction = root / "folder0" / "Shared"
+    junction.mkdir()
+    target_file = junction / "elsewhere.dat"
+    target_file.write_bytes(b"keep")
+    listed = fake_junctions(monkeypatch, junction)
+    removed_links = []
+    rmdir = os.rmdir
+    unlink = os.unlink
+
+    def remove_directory(path, *args, **kwargs):
+        if str(path) == str(junction):
+            # Deleting a junction removes the link and leaves its target alone
+            removed_links.append(str(path))
+            return None
+        return rmdir(path, *args, **kwargs)
+
+    def remove_file(path, *args, **kwargs):
+        assert not str(path).startswith(str(junction)), f"deleted {path} through a junction"
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(fs_delete.os, "rmdir", remove_directory)
+    monkeypatch.setattr(fs_delete.os, "unlink", remove_file)
+    report = delete_tree(str(root), workers=4)
+
+    assert removed_links == [str(junction)]
+    assert str(junction) not in listed
+    assert target_file.read_bytes() == b"keep"
+    assert report["filesRemoved"] == 4
+    assert report["errors"] == []
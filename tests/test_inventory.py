@@ -0,0 +1,38 @@
+from utils.inventory import InventoryCache
+from utils.ps_scripts import get_installed_autodesk_products
+from utils.registry import UNINSTALL_KEY_PATHS
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [{"psChildName": f"load-{self.calls}"}]
+
+def test_cache_is_reused_until_the_fingerprint_changes():
+    loader = Loader()
+    fingerprint = [1]
+    cache = InventoryCache(loader, fingerprint=lambda: tuple(fingerprint))
+
+    assert cache.get() == cache.get() == [{"psChildName": "load-1"}]
+    assert loader.calls == 1
+
+    fingerprint[0] += 1
+    assert cache.get() == [{"psChildName": "load-2"}]
+    assert loader.calls == 2
+
+def test_cache_expires_after_its_ttl():
+    loader = Loader()
+    cache = InventoryCache(loader, fingerprint=lambda: "unchanged", ttl=0.0)
+    cache.get()
+    cache.get()
+    assert loader.calls == 2
+
+def test_removed_key_invalidates_the_inventory(simulator):
+    products = get_installed_autodesk_products()
+    removed = products[0]["psChildName"]
+    assert get_installed_autodesk_products() == products
+
+    assert any(simulator.registry.delete_key(path, removed) for path in UNINSTALL_KEY_PATHS)
+    assert removed not in {product["psChildName"] for product in get_installed_autodesk_products()}
@@ -0,0 +1,48 @@
+from conftest import wait_for
+from utils.jobs import JobEngine
+from utils.journal import Journal
+from utils.ps_scripts import get_installed_autodesk_products
+from utils.results import FAILED, REMOVED
+from utils.scheduler import wait_until
+
+NOT_INSTALLED = "{00000000-0000-0000-0000-000000000001}"
+
+def installed_ids(count):
+    return [product['psChildName'] for product in get_installed_autodesk_products(force_refresh=True)][:count]
+
+def test_restart_job_stays_open_in_journal(simulator, tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    job = wait_for(JobEngine(journal=journal).submit(installed_ids(2), restart_computer=True))
+
+    assert job.state == "completed"
+    # The restart follows the job's final event
+    wait_until(lambda: simulator.restart_requested, 5.0, interval=0.01)
+    assert simulator.restart_requested
+    [entry] = journal.replay()
+    assert entry["job"] == job.id
+    assert entry["restarted"]
+
+def test_restart_job_is_checked_again_after_restart(simulator, tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    still_installed = installed_ids(1)[0]
+    journal = Journal(path)
+    journal.append({"type": "job", "state": "queued", "job": "before-restart",
+                    "productIds": [NOT_INSTALLED, still_installed], "deleteFolder": False,
+                    "restartComputer": True, "backend": simulator.name, "createdAt": 1.0})
+    # One product was finished off by the restart, the other still needs removing
+    for product_id in (NOT_INSTALLED, still_installed):
+        journal.append({"type": "product", "job": "before-restart", "psChildName": product_id, "state": FAILED,
+                        "attempts": 1, "message": "Still installed after 1 uninstallation passes"})
+    journal.append({"type": "job", "job": "before-restart", "state": "restarting"})
+    assert journal.sync()
+
+    journal = Journal(path)
+    [job] = JobEngine(journal=journal).resume()
+    wait_for(job)
+
+    states = {product["psChildName"]: product for product in job.product_states()}
+    assert states[NOT_INSTALLED]["state"] == REMOVED
+    assert states[NOT_INSTALLED]["message"] == "Removed by the restart"
+    assert states[still_installed]["state"] == REMOVED
+    assert not simulator.restart_requested
+    assert journal.replay() == []
@@ -0,0 +1,24 @@
+import os
+
+from utils import journal as journal_module
+from utils.journal import Journal
+
+def queued(job_id):
+    return {"type": "job", "state": "queued", "job": job_id, "productIds": ["{A}"], "deleteFolder": False,
+            "restartComputer": False, "backend": "simulator", "createdAt": 1.0}
+
+def test_sync_fails_until_records_are_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "RETRY_SECONDS", 0.05)
+    path = tmp_path / "journal.jsonl"
+    # A directory where the file should be makes every write fail
+    os.mkdir(path)
+    journal = Journal(str(path))
+    journal.append(queued("job-1"))
+
+    assert journal.sync(timeout=5.0) is False
+    assert journal.error
+
+    os.rmdir(path)
+    assert journal.sync(timeout=5.0) is True
+    assert journal.error is None
+    assert [entry["job"] for entry in journal.replay()] == ["job-1"]
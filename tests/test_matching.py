@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from utils.matching import ProductMatcher
+
+def write_rules(tmp_path, rules):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(rules) if not isinstance(rules, str) else rules)
+    return str(path)
+
+def test_rules_file_is_loaded(tmp_path):
+    matcher = ProductMatcher.from_file(write_rules(tmp_path, {
+        "include": {"publisher": ["*Autodesk*"]},
+        "exclude": {"displayName": ["*Desktop App*"], "productCode": ["{28B89EEF"]},
+    }))
+    assert matcher.matches("Autodesk Revit 2024", "Autodesk, Inc.", "{7346B4A0-2400-0510-0000-705C0D862004}")
+    assert not matcher.matches("Autodesk Desktop App", "Autodesk, Inc.")
+    assert not matcher.matches("AutoCAD 2024", "Autodesk", "{28B89EEF-4101-0000-0102-CF3F3A09B77D}")
+
+@pytest.mark.parametrize("rules, reason", [
+    ("{not json", "Expecting property name"),
+    (["*Autodesk*"], "must be an object"),
+    ({"includes": {"displayName": ["*Autodesk*"]}}, "Unknown product rule sections: includes"),
+    ({"include": {"name": ["*Autodesk*"]}}, "Unknown product rule fields: name"),
+    ({"include": {"displayName": "*Autodesk*"}}, "include.displayName must be a list of non-empty strings"),
+    ({"include": {"publisher": [""]}}, "include.publisher must be a list"),
+    ({"include": {"displayName": ["*Autodesk*"]}, "exclude": {"displayName": ["[z-a]*"]}},
+     "exclude.displayName has an invalid pattern '[z-a]*'"),
+    ({"exclude": {"displayName": ["*Autodesk*"]}}, "include has no patterns"),
+])
+def test_invalid_rules_name_the_file(tmp_path, rules, reason):
+    path = write_rules(tmp_path, rules)
+    with pytest.raises(ValueError) as raised:
+        ProductMatcher.from_file(path)
+    assert str(raised.value).startswith(f"Invalid product matching rules in {path}: ")
+    assert reason in str(raised.value)
@@ -0,0 +1,33 @@
+from conftest import STUB_HOST
+from utils import metrics, ps_scripts
+from utils.ps_host import PowerShellHostPool
+from utils.ps_scripts import PowerShellSession, run_powershell_command
+
+def counts(mode):
+    return metrics.POWERSHELL_COMMANDS.value(mode=mode), metrics.POWERSHELL_COMMAND_SECONDS.count(mode=mode)
+
+def test_session_commands_are_counted():
+    before = counts("session")
+    with PowerShellSession(size=1, argv=STUB_HOST) as session:
+        assert session.run("Write-Output hello") == "hello\n"
+        session.run("#stub:exit 2")
+    assert counts("session") == (before[0] + 2, before[1] + 2)
+
+def test_pool_commands_are_counted(monkeypatch):
+    pool = PowerShellHostPool(argv=STUB_HOST, size=1)
+    monkeypatch.setattr(ps_scripts, "get_default_pool", lambda: pool)
+    before = counts("pool")
+    try:
+        assert run_powershell_command("Write-Output hello", use_pool=True) == "hello\n"
+    finally:
+        pool.close()
+    assert counts("pool") == (before[0] + 1, before[1] + 1)
+
+def test_fallback_is_counted_under_the_mode_that_ran_it(monkeypatch, tmp_path):
+    unavailable = PowerShellHostPool(argv=[str(tmp_path / "no-such-host")], size=1)
+    monkeypatch.setattr(ps_scripts, "get_default_pool", lambda: unavailable)
+    monkeypatch.setattr(ps_scripts, "run_powershell_process",
+                        lambda command, **options: "from a process\n")
+    before = counts("pool")
+    assert run_powershell_command("Write-Output hello", use_pool=True) == "from a process\n"
+    assert counts("pool") == before
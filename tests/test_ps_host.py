@@ -0,0 +1,36 @@
+from conftest import STUB_HOST
+from utils.ps_host import PowerShellHostPool
+
+def test_host_is_recycled_after_max_commands():
+    pool = PowerShellHostPool(argv=STUB_HOST, size=1, max_commands=2)
+    try:
+        host = pool.acquire(timeout=10)
+        host.execute("Write-Output hello", timeout=10)
+        pool.release(host)
+        assert pool.acquire(timeout=10) is host
+        host.execute("Write-Output hello", timeout=10)
+        pool.release(host)
+        assert not host.is_alive()
+
+        replacement = pool.acquire(timeout=10)
+        assert replacement is not host
+        assert replacement.execute("Write-Output again", timeout=10) == (0, "again\n")
+        pool.release(replacement)
+    finally:
+        pool.close()
+
+def test_host_failing_its_health_check_is_replaced():
+    pool = PowerShellHostPool(argv=STUB_HOST, size=1, health_check_interval=0.0)
+    try:
+        host = pool.acquire(timeout=10)
+        pool.release(host)
+        # Alive, but no longer answering
+        host.ping = lambda timeout=5.0: False
+
+        replacement = pool.acquire(timeout=10)
+        assert replacement is not host
+        assert not host.is_alive()
+        assert replacement.ping()
+        pool.release(replacement)
+    finally:
+        pool.close()
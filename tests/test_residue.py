@@ -0,0 +1,49 @@
+from utils.filesystem import InMemoryFilesystem
+from utils.registry import InMemoryRegistry, UNINSTALL_KEY_PATHS
+from utils.residue import ODIS_METADATA_KIND, ResidueSweeper
+from utils.scheduler import ODIS_METADATA
+
+HIVE = UNINSTALL_KEY_PATHS[0]
+ACCESS_KEY = "{11111111-2222-3333-4444-555555555555}"
+ACCESS_METADATA = "{A3158B3E-5F28-358A-BF1A-9532D8EBC811}"
+REVIT_KEY = "{7346B4A0-2500-0510-0000-705C0D862004}"
+REVIT_BUNDLE = "{DB6D2F19-5B4E-4F0C-9C42-1F1B40C3D6A8}"
+REMOVED_PRODUCT = "{0BB716E0-2400-0410-0000-097DC2F354DF}"
+
+def sweeper(keys):
+    filesystem = InMemoryFilesystem({f"{ODIS_METADATA}\\{name}\\bundleManifest.xml": 100
+                                     for name in (ACCESS_METADATA, REVIT_KEY, REVIT_BUNDLE, REMOVED_PRODUCT)})
+    return ResidueSweeper(filesystem, InMemoryRegistry({HIVE: keys})), filesystem
+
+def orphaned_metadata(residue):
+    return sorted(item["path"].rsplit("\\", 1)[1] for item in residue.scan()["items"]
+                  if item["kind"] == ODIS_METADATA_KIND)
+
+def installed_keys():
+    return {
+        ACCESS_KEY: {"DisplayName": "Autodesk Access", "Publisher": "Autodesk",
+                     "UninstallString": "C:\\Program Files\\Autodesk\\AdODIS\\V1\\RemoveODIS.exe"},
+        REVIT_KEY: {"DisplayName": "Revit 2025", "Publisher": "Autodesk",
+                    "UninstallString": "C:\\Program Files\\Autodesk\\AdODIS\\V1\\Installer.exe -i uninstall "
+                                       f"-m C:\\ProgramData\\Autodesk\\ODIS\\metadata\\{REVIT_BUNDLE}\\"
+                                       "bundleManifest.xml"},
+    }
+
+def test_metadata_of_installed_products_is_kept():
+    residue, _ = sweeper(installed_keys())
+    # Access keeps its metadata under a GUID that is not its key, Revit's bundle
+    # is only named in its UninstallString; only the removed product is orphaned
+    assert orphaned_metadata(residue) == [REMOVED_PRODUCT]
+
+def test_clean_leaves_metadata_of_installed_products():
+    residue, filesystem = sweeper(installed_keys())
+    residue.clean()
+    for name in (ACCESS_METADATA, REVIT_KEY, REVIT_BUNDLE):
+        assert filesystem.exists(f"{ODIS_METADATA}\\{name}")
+    assert not filesystem.exists(f"{ODIS_METADATA}\\{REMOVED_PRODUCT}")
+
+def test_metadata_is_orphaned_once_its_product_is_removed():
+    keys = installed_keys()
+    del keys[ACCESS_KEY]
+    residue, _ = sweeper(keys)
+    assert orphaned_metadata(residue) == sorted([ACCESS_METADATA, REMOVED_PRODUCT])
@@ -0,0 +1,56 @@
+import pytest
+
+from utils.ps_scripts import get_installed_autodesk_products, uninstall_products
+from utils.results import FAILED, PENDING, REMOVED, UninstallResults
+
+PRODUCT = {"psChildName": "{A}", "displayName": "Autodesk Product"}
+ERROR = "Error: Installer exited with code 1603"
+
+def test_errored_product_still_installed_is_retried():
+    results = UninstallResults(["{A}"])
+    results.start(PRODUCT)
+    results.finish("{A}", {"status": "error", "message": ERROR})
+    results.verify({"{A}"})
+    [record] = results.records()
+    assert record["state"] == PENDING
+    assert record["message"] == ERROR
+
+    results.start(PRODUCT)
+    results.finish("{A}", {"status": "success", "message": "Successfully uninstalled"})
+    results.verify(set())
+    [record] = results.records()
+    assert record["state"] == REMOVED
+    assert record["attempts"] == 2
+
+def test_close_keeps_the_uninstaller_error():
+    results = UninstallResults(["{A}", "{B}"])
+    for product_id, status in (("{A}", "error"), ("{B}", "success")):
+        results.start({**PRODUCT, "psChildName": product_id})
+        results.finish(product_id, {"status": status, "message": ERROR if status == "error" else ""})
+    results.verify({"{A}", "{B}"})
+    results.close(1)
+    assert [(record["state"], record["message"]) for record in results.records()] == [
+        (FAILED, ERROR), (FAILED, "Still installed after 1 uninstallation passes")]
+
+@pytest.mark.simulator(registry_size=50, product_mix={"special": 1.0}, seed=3)
+def test_product_that_errored_is_removed_on_a_later_pass(simulator, monkeypatch):
+    # One removal at a time, so each one sees the failure rate set for it
+    monkeypatch.setenv("AUTODESK_UNINSTALLER_PARALLEL_UNINSTALLS", "0")
+    ids = [product['psChildName'] for product in get_installed_autodesk_products(force_refresh=True)]
+    flaky = ids[0]
+    states = []
+
+    def fail_first_attempt(event):
+        if event.get("event") == "product" and event["psChildName"] == flaky:
+            states.append(event["state"])
+        if event.get("event") == "started":
+            simulator.failure_rate = 1.0 if event["psChildName"] == flaky and event["pass"] == 1 else 0.0
+
+    records = {record["psChildName"]: record for record in uninstall_products(ids, on_event=fail_first_attempt)}
+
+    assert len(ids) > 1
+    assert records[flaky]["state"] == REMOVED
+    assert records[flaky]["attempts"] == 2
+    # A final state is never reported before the product is done with
+    assert FAILED not in states
+    assert all(record["state"] == REMOVED for record in records.values())
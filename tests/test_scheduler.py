@@ -0,0 +1,21 @@
+import pytest
+
+from utils.scheduler import MSI_LANE, PARALLEL_LANE, classify_product
+
+GUID = "{21DE6405-91DE-4A69-A8FB-483847F702C6}"
+
+@pytest.mark.parametrize("display_name, expected", [
+    ("AUTODESK GENUINE SERVICE", ("special", MSI_LANE)),
+    ("autodesk access", ("special", PARALLEL_LANE)),
+    ("Autodesk IDENTITY Manager", ("special", PARALLEL_LANE)),
+    ("Carbon Insights For Revit 2025", ("special", PARALLEL_LANE)),
+    # The script tests Access before Genuine Service
+    ("Autodesk Access for Autodesk Genuine Service", ("special", PARALLEL_LANE)),
+])
+def test_special_cases_match_like_the_script(display_name, expected):
+    product = {"psChildName": GUID, "displayName": display_name, "uninstallString": "MsiExec.exe /X" + GUID}
+    assert classify_product(product, path_exists=lambda path: False) == expected
+
+def test_other_msi_products_use_the_msi_lane():
+    product = {"psChildName": GUID, "displayName": "Autodesk Revit 2025", "uninstallString": "MsiExec.exe /X" + GUID}
+    assert classify_product(product, path_exists=lambda path: False) == ("msi", MSI_LANE)
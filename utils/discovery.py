@@ -0,0 +1,69 @@
+import logging
+
+from utils.matching import get_default_matcher
+from utils.registry import UNINSTALL_KEY_PATHS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The only values discovery needs from each uninstall key
+DISCOVERY_VALUES = ("DisplayName", "Publisher", "UninstallString", "InstallLocation")
+
+def _product(name, values):
+    """Build a product dict from an uninstall key's values, or None without a DisplayName"""
+    if not values:
+        return None
+    display_name = values.get("DisplayName")
+    if not display_name:  # Skip any entries without a DisplayName
+        return None
+    publisher = str(values.get("Publisher") or "")
+    return {
+        'displayName': str(display_name),
+        'publisher': publisher or 'Unknown Publisher',
+        'psChildName': name,
+        'uninstallString': str(values.get("UninstallString") or ""),
+        'installLocation': str(values.get("InstallLocation") or "")
+    }
+
+def discover_products(registry, paths=UNINSTALL_KEY_PATHS, matcher=None):
+    """Read the Uninstall hives directly and return the installed Autodesk products
+
+    Returns the same product dicts as the PowerShell query: displayName,
+    publisher, psChildName, uninstallString and installLocation, with exact duplicates
+    dropped the way Select-Object -Unique does. Records are selected by
+    matcher (the configured product rules by default).
+    """
+    matcher = matcher or get_default_matcher()
+    products = []
+    seen = set()
+    for path in paths:
+        for name in registry.subkeys(path):
+            product = _product(name, registry.values(path, name, DISCOVERY_VALUES))
+            if product is None:
+                continue
+            if not matcher.matches(product['displayName'], product['publisher'], name):
+                continue
+
+            identity = tuple(product.values())
+            if identity in seen:
+                continue
+            seen.add(identity)
+            products.append(product)
+
+    logger.debug(f"Native discovery found {len(products)} Autodesk products")
+    return products
+
+def lookup_products(registry, product_ids, paths=UNINSTALL_KEY_PATHS):
+    """Read only the named uninstall keys and return the products that exist
+
+    Opens each key directly in every hive instead of enumerating the
+    hives, so the cost depends on the number of ids, not on how many
+    applications are installed. Product rules are not applied.
+    """
+    products = {}
+    for name in product_ids:
+        for path in paths:
+            product = _product(name, registry.values(path, name, DISCOVERY_VALUES))
+            if product is not None:
+                products.setdefault(name, product)
+    return list(products.values())
@@ -0,0 +1,110 @@
+import threading
+import ntpath
+import os
+
+from utils.footprint import get_default_scanner
+from utils.fs_delete import delete_tree, long_path
+
+class LocalFilesystem:
+    """The machine's own disk, in the interface the residue sweeper uses"""
+
+    def listdir(self, path):
+        """Return (name, is_dir) for every entry of path (empty if it doesn't exist)"""
+        try:
+            with os.scandir(long_path(path)) as entries:
+                return [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in entries]
+        except OSError:
+            return []
+
+    def exists(self, path):
+        """Return True if path exists"""
+        return os.path.lexists(long_path(path))
+
+    def measure(self, path):
+        """Return (files, bytes) under path"""
+        if os.path.isfile(long_path(path)):
+            return 1, os.path.getsize(long_path(path))
+        result = get_default_scanner().measure(path)
+        return result["files"], result["bytes"]
+
+    def delete(self, path):
+        """Delete a file or folder; return True once it is gone"""
+        if os.path.isfile(long_path(path)) or os.path.islink(long_path(path)):
+            try:
+                os.unlink(long_path(path))
+            except OSError:
+                return False
+            return True
+        return delete_tree(path)["complete"]
+
+class InMemoryFilesystem:
+    """Dict-backed stand-in for LocalFilesystem, used by tests and the simulator.
+
+    Paths are Windows paths and compare case-insensitively; folders exist
+    implicitly above every file.
+    """
+
+    def __init__(self, files=None, directories=()):
+        self._files = {}
+        self._directories = {}
+        self._lock = threading.Lock()
+        for path, size in (files or {}).items():
+            self.add_file(path, size)
+        for path in directories:
+            self.add_directory(path)
+
+    def _add_parents(self, path):
+        """Register every folder above path"""
+        parent = ntpath.dirname(path)
+        while parent and ntpath.normcase(parent) not in self._directories and parent != ntpath.dirname(parent):
+            self._directories[ntpath.normcase(parent)] = parent
+            parent = ntpath.dirname(parent)
+
+    def add_file(self, path, size=0):
+        """Create or replace a file of size bytes"""
+        with self._lock:
+            self._files[ntpath.normcase(path)] = (path, size)
+            self._add_parents(path)
+
+    def add_directory(self, path):
+        """Create an empty folder"""
+        with self._lock:
+            self._directories[ntpath.normcase(path)] = path
+            self._add_parents(path)
+
+    def listdir(self, path):
+        """Return (name, is_dir) for every entry of path"""
+        parent = ntpath.normcase(path).rstrip("\\")
+        with self._lock:
+            entries = [(ntpath.basename(name), False) for key, (name, _) in self._files.items()
+                       if ntpath.dirname(key) == parent]
+            entries += [(ntpath.basename(name), True) for key, name in self._directories.items()
+                        if ntpath.dirname(key) == parent]
+        return entries
+
+    def exists(self, path):
+        """Return True if path is a file or folder"""
+        key = ntpath.normcase(path).rstrip("\\")
+        with self._lock:
+            return key in self._files or key in self._directories
+
+    def _below(self, key, mapping):
+        """Return the keys of mapping at or below key"""
+        return [candidate for candidate in mapping if candidate == key or candidate.startswith(key + "\\")]
+
+    def measure(self, path):
+        """Return (files, bytes) under path"""
+        key = ntpath.normcase(path).rstrip("\\")
+        with self._lock:
+            sizes = [self._files[candidate][1] for candidate in self._below(key, self._files)]
+        return len(sizes), sum(sizes)
+
+    def delete(self, path):
+        """Delete a file or folder and everything below it"""
+        key = ntpath.normcase(path).rstrip("\\")
+        with self._lock:
+            for candidate in self._below(key, self._files):
+                del self._files[candidate]
+            for candidate in self._below(key, self._directories):
+                del self._directories[candidate]
+        return True
@@ -0,0 +1,420 @@
+import concurrent.futures
+import collections
+import contextlib
+import threading
+import logging
+import zlib
+import time
+import os
+
+from utils.ps_scripts import (
+    PowerShellBackend,
+    library_script_path,
+    run_powershell_process,
+    uninstall_products
+)
+from utils.results import FINAL_STATES, FAILED, REMOVED
+from utils.scheduler import classify_product
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Host states
+HOST_QUEUED = "queued"
+HOST_RUNNING = "running"
+HOST_RETRYING = "retrying"
+HOST_SUCCEEDED = "succeeded"
+HOST_INCOMPLETE = "incomplete"
+HOST_FAILED = "failed"
+HOST_TIMED_OUT = "timed_out"
+
+HOST_FINAL_STATES = (HOST_SUCCEEDED, HOST_INCOMPLETE, HOST_FAILED, HOST_TIMED_OUT)
+
+# Printed by the remoting wrapper when the remote command could not run
+REMOTE_ERROR_PREFIX = "##ADU-REMOTE-ERROR "
+
+def fleet_concurrency():
+    """Return the number of hosts worked on at the same time"""
+    try:
+        return max(1, int(os.environ.get("AUTODESK_UNINSTALLER_FLEET_CONCURRENCY", "16")))
+    except ValueError:
+        return 16
+
+class RemoteHostError(Exception):
+    """A host could not be reached or the remote command could not run"""
+
+class HostTimeout(Exception):
+    """A host did not finish within the per-host timeout"""
+
+def _ps_quote(text):
+    """Quote text as a single-quoted PowerShell string"""
+    return "'" + text.replace("'", "''") + "'"
+
+class RemotePowerShellBackend(PowerShellBackend):
+    """PowerShellBackend whose commands run on another machine through PowerShell remoting.
+
+    Every command is sent with Invoke-Command together with the function
+    library, so nothing has to be installed on the target beyond WinRM.
+    The registry is read with PowerShell queries, the Windows Installer
+    idle check and folder deletion run remotely, and because ODIS bundle
+    manifests cannot be checked locally, products that could be MSI
+    removals are scheduled on the serial MSI lane. cancel() stops the
+    command in flight and makes every later one fail.
+    """
+
+    name = "remote"
+
+    def __init__(self, host):
+        super().__init__(native_discovery=False)
+        self.host = host
+        self.registry = None
+        self._processes = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def open_session(self):
+        """Remote commands carry their own connection; no session is kept"""
+        return contextlib.nullcontext(self)
+
+    def cancel(self):
+        """Stop the command running on the host and refuse any more
+
+        Killing the local Invoke-Command process closes the remoting
+        connection; an installer the command already started on the host
+        may still run to completion.
+        """
+        with self._lock:
+            self._cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def _track(self, process):
+        """Remember a running Invoke-Command process so cancel() can kill it"""
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self._cancelled
+        if cancelled:
+            process.kill()
+
+    def _run_command(self, command, capture_output=True, on_line=None, max_lines=None):
+        """Run a command, with the library loaded, on the remote host"""
+        if self._cancelled:
+            raise RemoteHostError(f"{self.host}: cancelled")
+        errors = []
+        started = []
+
+        def track(process):
+            started.append(process)
+            self._track(process)
+
+        def handle_line(line):
+            if line.startswith(REMOTE_ERROR_PREFIX):
+                errors.append(line[len(REMOTE_ERROR_PREFIX):])
+            elif on_line is not None:
+                on_line(line)
+
+        script = (
+            "try { Invoke-Command -ComputerName " + _ps_quote(self.host) + " -ErrorAction Stop "
+            "-ScriptBlock { param($Library, $Command) . ([ScriptBlock]::Create($Library)); "
+            ". ([ScriptBlock]::Create($Command)) } "
+            "-ArgumentList (Get-Content -Raw -LiteralPath " + _ps_quote(library_script_path()) + "), "
+            + _ps_quote(command) + " } "
+            "catch { Write-Output ('" + REMOTE_ERROR_PREFIX + "' + $_.Exception.Message); exit 1 }"
+        )
+        try:
+            output = run_powershell_process(script, capture_output=True, on_line=handle_line, max_lines=max_lines,
+                                            on_process=track)
+        finally:
+            with self._lock:
+                self._processes.difference_update(started)
+        if self._cancelled:
+            raise RemoteHostError(f"{self.host}: cancelled")
+        if errors:
+            raise RemoteHostError(f"{self.host}: {errors[0]}")
+        return output if capture_output else None
+
+    _run_library_command = _run_command
+
+    def check_admin_rights(self):
+        """Remoting already requires administrator rights on the target"""
+        return True
+
+    def removal_method(self, product):
+        """Classify without the manifest check, so ODIS-or-MSI products stay on the MSI lane"""
+        return classify_product(product, path_exists=lambda path: False)
+
+    def wait_until_idle(self, timeout):
+        """Wait on the remote host for Windows Installer to go idle"""
+        start = time.monotonic()
+        self._run_command(
+            f"$deadline = (Get-Date).AddSeconds({float(timeout)}); "
+            "do { $mutex = $null; $busy = [System.Threading.Mutex]::TryOpenExisting('Global\\_MSIExecute', [ref]$mutex); "
+            "if ($mutex) { $mutex.Dispose() }; if (-not $busy) { break }; Start-Sleep -Milliseconds 250 } "
+            "while ((Get-Date) -lt $deadline)")
+        return time.monotonic() - start
+
+    def delete_autodesk_folder(self, on_event=None):
+        """Delete C:\\Autodesk on the remote host"""
+        output = self._run_command(
+            "Remove-Item -LiteralPath 'C:\\Autodesk' -Recurse -Force -ErrorAction SilentlyContinue; "
+            "Test-Path -LiteralPath 'C:\\Autodesk'")
+        complete = output.strip().lower().endswith("false")
+        if on_event is not None:
+            on_event({"event": "folder_finished", "path": "C:\\Autodesk", "complete": complete})
+        return complete
+
+    def inventory_fingerprint(self):
+        """Remote inventories are never cached"""
+        return None
+
+class PowerShellRemotingExecutor:
+    """Reaches hosts through PowerShell remoting (WinRM)"""
+
+    def connect(self, host):
+        """Return a backend for host; connection errors surface on its first command"""
+        return RemotePowerShellBackend(host)
+
+class SimulatedExecutor:
+    """Gives every host its own simulated machine, in-process.
+
+    Used for tests and benchmarks. Each host keeps its machine across
+    retries. connect_latency models the cost of opening a remote
+    connection; hosts in unreachable never connect, and hosts in flaky
+    fail that many connections before succeeding.
+    """
+
+    def __init__(self, connect_latency=0.0, unreachable=(), flaky=None, seed=0, **backend_options):
+        self.connect_latency = connect_latency
+        self.unreachable = set(unreachable)
+        self.flaky = dict(flaky or {})
+        self.seed = seed
+        self.backend_options = backend_options
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def connect(self, host):
+        """Return the simulated machine for host"""
+        from utils.simulator import SimulatedBackend
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        with self._lock:
+            if host in self.unreachable:
+                raise RemoteHostError(f"{host}: the WinRM client cannot complete the operation")
+            if self.flaky.get(host, 0) > 0:
+                self.flaky[host] -= 1
+                raise RemoteHostError(f"{host}: connection reset")
+            if host not in self._backends:
+                self._backends[host] = SimulatedBackend(seed=(self.seed or 0) ^ zlib.crc32(host.encode("utf-8")),
+                                                        **self.backend_options)
+            return self._backends[host]
+
+class FleetOrchestrator:
+    """Runs inventory and uninstall operations across many hosts.
+
+    At most concurrency hosts are worked on at once, so a run takes about
+    hosts / concurrency times the time of one host. Each attempt has
+    timeout seconds; hosts whose connection or command fails are retried
+    up to retries times with a growing delay. A host that times out is
+    cancelled (backends with a cancel() method stop their remote command)
+    and keeps its slot until the attempt has stopped, so no more than
+    concurrency hosts are ever being worked on. It is not retried, because
+    the installers it started may still be running there.
+    on_progress receives an aggregate snapshot whenever a host changes
+    state, and at most every progress_interval seconds as products change.
+    Inventories are also recorded in store (an InventoryStore) when given.
+    """
+
+    def __init__(self, executor, concurrency=None, timeout=3600.0, retries=1, retry_delay=5.0,
+                 on_progress=None, on_host=None, progress_interval=0.5, store=None):
+        self.executor = executor
+        self.concurrency = fleet_concurrency() if concurrency is None else max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.on_progress = on_progress
+        self.on_host = on_host
+        self.progress_interval = progress_interval
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._hosts = collections.OrderedDict()
+        self._products = {}
+        self._started = None
+        self._last_progress = 0.0
+
+    # -- state ---------------------------------------------------------------
+
+    def _reset(self, hosts):
+        """Start tracking a new run"""
+        with self._lock:
+            self._started = time.monotonic()
+            self._hosts = collections.OrderedDict(
+                (host, {"host": host, "state": HOST_QUEUED, "attempts": 0, "error": None,
+                        "startedAt": None, "finishedAt": None, "durationSeconds": None, "result": None})
+                for host in dict.fromkeys(hosts))
+            self._products = {host: {} for host in self._hosts}
+
+    def _update_host(self, host, **fields):
+        """Change a host's record and report it"""
+        with self._lock:
+            record = self._hosts[host]
+            record.update(fields)
+            snapshot = {"event": "host", **{key: value for key, value in record.items() if key != "result"}}
+        if self.on_host is not None:
+            self.on_host(snapshot)
+        self._report(force=True)
+
+    def _product_event(self, host, event):
+        """Track a host's product states from its uninstall events"""
+        if event.get("event") != "product":
+            return
+        with self._lock:
+            self._products[host][event["psChildName"]] = event["state"]
+        self._report()
+
+    def progress(self):
+        """Return the aggregate state of the run"""
+        with self._lock:
+            states = collections.Counter(record["state"] for record in self._hosts.values())
+            products = collections.Counter(state for host_products in self._products.values()
+                                           for state in host_products.values())
+            return {
+                "event": "fleet_progress",
+                "hosts": len(self._hosts),
+                "done": sum(states[state] for state in HOST_FINAL_STATES),
+                "states": dict(states),
+                "products": {
+                    "total": sum(products.values()),
+                    "removed": products[REMOVED],
+                    "failed": products[FAILED],
+                    "finished": sum(products[state] for state in FINAL_STATES)
+                },
+                "elapsedSeconds": round(time.monotonic() - self._started, 1) if self._started else 0.0
+            }
+
+    def _report(self, force=False):
+        """Send a progress snapshot, throttled unless forced"""
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+        self.on_progress(self.progress())
+
+    # -- execution -----------------------------------------------------------
+
+    def _attempt(self, host, operation):
+        """Run one attempt on a host, giving up on it after timeout seconds
+
+        An attempt that times out is cancelled, and this only returns once
+        its thread has finished, so the caller's slot stays taken until then.
+        """
+        outcome = {}
+        done = threading.Event()
+        stopping = threading.Event()
+
+        def target():
+            try:
+                outcome["backend"] = self.executor.connect(host)
+                # Timed out while connecting, before there was anything to cancel
+                if stopping.is_set():
+                    return
+                outcome["result"] = operation(host, outcome["backend"])
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=target, name=f"fleet-{host}", daemon=True).start()
+        if not done.wait(self.timeout):
+            logger.warning(f"{host}: no result after {self.timeout:g} seconds, stopping the attempt")
+            stopping.set()
+            cancel = getattr(outcome.get("backend"), "cancel", None)
+            if cancel is not None:
+                cancel()
+            done.wait()
+            raise HostTimeout(f"{host}: no result after {self.timeout:g} seconds")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def _run_host(self, host, operation):
+        """Work on one host until it succeeds, runs out of retries or times out"""
+        started = time.time()
+        for attempt in range(1, self.retries + 2):
+            self._update_host(host, state=HOST_RUNNING, attempts=attempt, startedAt=started)
+            try:
+                result = self._attempt(host, operation)
+            except HostTimeout as e:
+                logger.warning(str(e))
+                self._finish_host(host, HOST_TIMED_OUT, started, error=str(e))
+                return
+            except Exception as e:
+                if attempt <= self.retries:
+                    logger.info(f"{host}: attempt {attempt} failed, retrying: {str(e)}")
+                    self._update_host(host, state=HOST_RETRYING, error=str(e))
+                    time.sleep(self.retry_delay * attempt)
+                    continue
+                logger.warning(f"{host}: failed after {attempt} attempts: {str(e)}")
+                self._finish_host(host, HOST_FAILED, started, error=str(e))
+                return
+
+            state = HOST_INCOMPLETE if result.get("incomplete") else HOST_SUCCEEDED
+            self._finish_host(host, state, started, error=None, result=result)
+            return
+
+    def _finish_host(self, host, state, started, **fields):
+        """Record a host's final state"""
+        finished = time.time()
+        self._update_host(host, state=state, finishedAt=finished,
+                          durationSeconds=round(finished - started, 3), **fields)
+
+    def run(self, hosts, operation):
+        """Run operation(host, backend) on every host and return the per-host records"""
+        self._reset(hosts)
+        self._report(force=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency,
+                                                   thread_name_prefix="fleet") as pool:
+            for future in [pool.submit(self._run_host, host, operation) for host in self._hosts]:
+                future.result()
+
+        summary = self.progress()
+        summary["event"] = "fleet_complete"
+        with self._lock:
+            records = [dict(record) for record in self._hosts.values()]
+        return {"hosts": records, "summary": summary}
+
+    def inventory(self, hosts):
+        """List the Autodesk products installed on every host"""
+        def operation(host, backend):
+            products = backend.get_installed_autodesk_products()
+            if self.store is not None:
+                self.store.record(host, products)
+            return {"products": products, "total": len(products)}
+        run = self.run(hosts, operation)
+        if self.store is not None:
+            self.store.flush()
+        return run
+
+    def uninstall(self, hosts, product_ids=None, delete_folder=False):
+        """Uninstall product_ids (every Autodesk product if None) on every host"""
+        def operation(host, backend):
+            ids = product_ids
+            if ids is None:
+                ids = [product['psChildName'] for product in backend.get_installed_autodesk_products()]
+            folder_deleted = None
+            with backend.open_session():
+                results = uninstall_products(ids, on_event=lambda event: self._product_event(host, event),
+                                             backend=backend) if ids else []
+                if delete_folder:
+                    folder_deleted = backend.delete_autodesk_folder()
+            failed = sum(1 for record in results if record["state"] == FAILED)
+            return {"results": results, "failed": failed, "folderDeleted": folder_deleted,
+                    "incomplete": bool(failed) or folder_deleted is False}
+        return self.run(hosts, operation)
@@ -0,0 +1,270 @@
+import concurrent.futures
+import threading
+import logging
+import ntpath
+import time
+import os
+
+from utils.fs_delete import is_link, long_path, display_path
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ROOTS_ENV_VAR = "AUTODESK_UNINSTALLER_FOOTPRINT_ROOTS"
+
+# Install locations never measured, because a product registered against
+# them would turn a footprint into a scan of the whole drive
+SYSTEM_FOLDERS = ("program files", "program files (x86)", "programdata", "users", "windows")
+
+def footprint_workers():
+    """Return the number of threads used to scan folders"""
+    try:
+        return max(1, int(os.environ.get("AUTODESK_UNINSTALLER_FOOTPRINT_WORKERS", "8")))
+    except ValueError:
+        return 8
+
+def footprint_roots(filesystem, environ=None):
+    """Return the folders Autodesk software writes to, as (label, path) pairs
+
+    Covers C:\\Autodesk, Program Files (both views), ProgramData and every
+    user profile's roaming and local AppData, with profiles listed through
+    filesystem. environ defaults to os.environ; in it,
+    AUTODESK_UNINSTALLER_FOOTPRINT_ROOTS replaces the list with
+    os.pathsep-separated paths.
+    """
+    environ = os.environ if environ is None else environ
+    configured = environ.get(ROOTS_ENV_VAR)
+    if configured:
+        return [(path, path) for path in configured.split(os.pathsep) if path]
+
+    # Windows paths, whatever the platform the scan runs on
+    system_drive = environ.get("SystemDrive", "C:") + "\\"
+    roots = [("C:\\Autodesk", ntpath.join(system_drive, "Autodesk"))]
+    for variable, default in (("ProgramFiles", "Program Files"), ("ProgramFiles(x86)", "Program Files (x86)"),
+                              ("ProgramData", "ProgramData")):
+        base = environ.get(variable, ntpath.join(system_drive, default))
+        roots.append((f"{default}\\Autodesk", ntpath.join(base, "Autodesk")))
+
+    users = ntpath.dirname(environ.get("PUBLIC", ntpath.join(system_drive, "Users", "Public")))
+    for user in sorted(name for name, is_dir in filesystem.listdir(users) if is_dir):
+        profile = ntpath.join(users, user)
+        for folder in ("Roaming", "Local"):
+            roots.append((f"{user}\\AppData\\{folder}\\Autodesk",
+                          ntpath.join(profile, "AppData", folder, "Autodesk")))
+    return roots
+
+def measurable_location(path):
+    """Return a product's InstallLocation cleaned up, or None if it should not be measured"""
+    path = (path or "").strip().strip('"').rstrip("\\/")
+    if not path:
+        return None
+    # InstallLocation is always a Windows path, whatever the platform
+    drive, rest = ntpath.splitdrive(path)
+    rest = rest.strip("\\/")
+    if not rest or rest.lower() in SYSTEM_FOLDERS:
+        return None
+    return path
+
+class FootprintScanner:
+    """Measures folder trees in parallel, remembering every directory it has listed.
+
+    Each directory's own file count and byte total are cached together
+    with its modification time. A directory whose mtime is unchanged is
+    not listed again, only its subdirectories are checked, so a repeat
+    scan of an unchanged tree costs one stat per directory. Files that
+    change size in place without being added, removed or renamed do not
+    touch their directory's mtime and keep their cached size until then.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = footprint_workers() if workers is None else max(1, workers)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Forget every cached directory"""
+        with self._lock:
+            self._cache.clear()
+
+    def _list(self, path, mtime):
+        """Return (files, bytes, subdirectories, cached) for one directory
+
+        Unchanged directories come from the cache, with subdirectory names
+        only; freshly listed ones give (name, mtime) pairs.
+        """
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2], cached[3], True
+
+        files = 0
+        size = 0
+        subdirectories = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    stat_result = entry.stat(follow_symlinks=False)
+                    # Junctions under ProgramData and AppData often loop back up the tree
+                    if is_link(entry, stat_result):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append((entry.path, stat_result.st_mtime_ns))
+                    else:
+                        files += 1
+                        size += stat_result.st_size
+                except OSError:
+                    continue
+
+        # Subdirectory mtimes are read fresh every scan, so only names are cached
+        names = tuple(subdirectory for subdirectory, _ in subdirectories)
+        with self._lock:
+            self._cache[path] = (mtime, files, size, names)
+        return files, size, subdirectories, False
+
+    def _subdirectory_mtimes(self, names):
+        """Stat cached subdirectories to check whether they changed"""
+        subdirectories = []
+        for name in names:
+            try:
+                subdirectories.append((name, os.stat(name, follow_symlinks=False).st_mtime_ns))
+            except OSError:
+                continue
+        return subdirectories
+
+    def measure(self, path):
+        """Return the size of everything below path
+
+        The result has path, exists, bytes, files, directories, plus
+        scannedDirectories and cachedDirectories showing how much of the
+        tree had to be listed again, and seconds.
+        """
+        start = time.monotonic()
+        root = long_path(path)
+        totals = {"bytes": 0, "files": 0, "directories": 0, "scannedDirectories": 0, "cachedDirectories": 0}
+        try:
+            root_mtime = os.stat(root).st_mtime_ns
+        except OSError:
+            return dict(totals, path=display_path(root), exists=False, seconds=0.0)
+
+        visited = set()
+        outstanding = [0]
+        idle = threading.Condition()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="footprint") as executor:
+            def submit(directory, mtime):
+                with idle:
+                    outstanding[0] += 1
+                executor.submit(run, directory, mtime)
+
+            def run(directory, mtime):
+                try:
+                    files, size, subdirectories, cached = self._list(directory, mtime)
+                    if cached:
+                        subdirectories = self._subdirectory_mtimes(subdirectories)
+                    with idle:
+                        visited.add(directory)
+                        totals["files"] += files
+                        totals["bytes"] += size
+                        totals["directories"] += 1
+                        totals["cachedDirectories" if cached else "scannedDirectories"] += 1
+                    for subdirectory, subdirectory_mtime in subdirectories:
+                        submit(subdirectory, subdirectory_mtime)
+                except OSError as e:
+                    logger.debug(f"Could not scan {display_path(directory)}: {str(e)}")
+                finally:
+                    with idle:
+                        outstanding[0] -= 1
+                        if not outstanding[0]:
+                            idle.notify_all()
+
+            submit(root, root_mtime)
+            with idle:
+                while outstanding[0]:
+                    idle.wait()
+
+        self._prune(root, visited)
+        return dict(totals, path=display_path(root), exists=True, seconds=round(time.monotonic() - start, 3))
+
+    def _prune(self, root, visited):
+        """Drop cached directories below root that no longer exist"""
+        prefix = root.rstrip("\\/") + os.sep
+        with self._lock:
+            for cached in [cached for cached in self._cache if cached.startswith(prefix) and cached not in visited]:
+                del self._cache[cached]
+
+class FilesystemScanner:
+    """Measures folder trees through a filesystem object such as InMemoryFilesystem.
+
+    Gives the same results as FootprintScanner for disks that are not
+    the local one; nothing is cached, so every directory counts as scanned.
+    """
+
+    def __init__(self, filesystem):
+        self.filesystem = filesystem
+
+    def clear(self):
+        """Nothing is cached"""
+
+    def _count_directories(self, path):
+        """Return the number of folders at and below path"""
+        count = 1
+        for name, is_dir in self.filesystem.listdir(path):
+            if is_dir:
+                count += self._count_directories(ntpath.join(path, name))
+        return count
+
+    def measure(self, path):
+        """Return the size of everything below path, like FootprintScanner.measure"""
+        start = time.monotonic()
+        totals = {"bytes": 0, "files": 0, "directories": 0, "scannedDirectories": 0, "cachedDirectories": 0}
+        if not self.filesystem.exists(path):
+            return dict(totals, path=path, exists=False, seconds=0.0)
+        totals["files"], totals["bytes"] = self.filesystem.measure(path)
+        totals["directories"] = totals["scannedDirectories"] = self._count_directories(path)
+        return dict(totals, path=path, exists=True, seconds=round(time.monotonic() - start, 3))
+
+_default_scanner = None
+_default_scanner_lock = threading.Lock()
+
+def get_default_scanner():
+    """Return the process-wide footprint scanner, whose cache lasts as long as the process"""
+    global _default_scanner
+    with _default_scanner_lock:
+        if _default_scanner is None:
+            _default_scanner = FootprintScanner()
+        return _default_scanner
+
+def scan_footprint(roots, scanner=None):
+    """Measure every Autodesk folder and return the per-folder results and totals"""
+    scanner = scanner or get_default_scanner()
+    start = time.monotonic()
+    results = []
+    for label, path in roots:
+        result = scanner.measure(path)
+        result["label"] = label
+        results.append(result)
+    return {
+        "roots": results,
+        "totalBytes": sum(result["bytes"] for result in results),
+        "totalFiles": sum(result["files"] for result in results),
+        "seconds": round(time.monotonic() - start, 3)
+    }
+
+def product_footprints(products, scanner=None):
+    """Return {psChildName: footprint or None} measured from each product's InstallLocation"""
+    scanner = scanner or get_default_scanner()
+    footprints = {}
+    measured = {}
+    for product in products:
+        location = measurable_location(product.get('installLocation'))
+        if location is None:
+            footprints[product['psChildName']] = None
+            continue
+        # Components often share their suite's install location
+        if location.lower() not in measured:
+            result = scanner.measure(location)
+            measured[location.lower()] = ({"bytes": result["bytes"], "files": result["files"]}
+                                          if result["exists"] else None)
+        footprints[product['psChildName']] = measured[location.lower()]
+    return footprints
@@ -0,0 +1,269 @@
+import concurrent.futures
+import threading
+import logging
+import errno
+import stat
+import time
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Windows error codes that mean another process has the file open
+ERROR_ACCESS_DENIED = 5
+ERROR_SHARING_VIOLATION = 32
+ERROR_LOCK_VIOLATION = 33
+
+# Locked paths listed in a report; the count is always exact
+MAX_LOCKED_REPORTED = 1000
+
+# Reparse tag of a junction; the stat module only defines it on Windows
+IO_REPARSE_TAG_MOUNT_POINT = getattr(stat, "IO_REPARSE_TAG_MOUNT_POINT", 0xA0000003)
+
+def delete_workers():
+    """Return the number of threads used to delete a folder"""
+    try:
+        return max(1, int(os.environ.get("AUTODESK_UNINSTALLER_DELETE_WORKERS", "8")))
+    except ValueError:
+        return 8
+
+def long_path(path):
+    """Return path in the \\\\?\\ form on Windows, so paths over 260 characters work"""
+    if os.name != "nt":
+        return path
+    path = os.path.abspath(path)
+    if path.startswith("\\\\?\\"):
+        return path
+    if path.startswith("\\\\"):
+        return "\\\\?\\UNC\\" + path[2:]
+    return "\\\\?\\" + path
+
+def display_path(path):
+    """Strip the \\\\?\\ prefix again for messages"""
+    if path.startswith("\\\\?\\UNC\\"):
+        return "\\\\" + path[8:]
+    if path.startswith("\\\\?\\"):
+        return path[4:]
+    return path
+
+def _is_locked(error):
+    """True if an OSError means the file is in use rather than something worse"""
+    if getattr(error, "winerror", None) in (ERROR_ACCESS_DENIED, ERROR_SHARING_VIOLATION, ERROR_LOCK_VIOLATION):
+        return True
+    return isinstance(error, PermissionError) or error.errno in (errno.EACCES, errno.EPERM, errno.EBUSY)
+
+def is_link(entry, stat_result=None):
+    """True if a DirEntry is a symlink, junction or other reparse point, which must never be followed
+
+    DirEntry.is_junction only exists from Python 3.12, and before that a
+    junction is neither a symlink nor told apart from a folder by is_dir,
+    so this reads the reparse attributes the way shutil.rmtree does.
+    stat_result, if given, is the entry's stat(follow_symlinks=False).
+    """
+    if entry.is_symlink():
+        return True
+    if stat_result is None:
+        stat_result = entry.stat(follow_symlinks=False)
+    if getattr(stat_result, "st_file_attributes", 0) & stat.FILE_ATTRIBUTE_REPARSE_POINT:
+        return True
+    return getattr(stat_result, "st_reparse_tag", 0) == IO_REPARSE_TAG_MOUNT_POINT
+
+class FolderDeleter:
+    """Deletes a directory tree with a pool of threads walking it with os.scandir.
+
+    Each worker lists one directory, unlinks its files (clearing read-only
+    attributes when needed) and queues its subdirectories; directories are
+    removed deepest first once their files are gone. Symlinks, junctions
+    and other reparse points are removed without following them. Files another process has open are
+    collected as "locked" instead of failing the whole deletion, and
+    on_progress receives running totals at most every progress_interval
+    seconds.
+    """
+
+    def __init__(self, workers=8, on_progress=None, progress_interval=2.0):
+        self.workers = max(1, workers)
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes = 0
+        self._locked = []
+        self._locked_count = 0
+        self._errors = []
+        self._directories = []
+        self._last_progress = 0.0
+
+    def _progress(self, force=False):
+        """Report running totals, throttled to progress_interval"""
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+            progress = {"filesRemoved": self._files, "bytesRemoved": self._bytes, "locked": self._locked_count}
+        self.on_progress(progress)
+
+    def _record_locked(self, path):
+        """Remember a file or directory that could not be removed because it is in use"""
+        with self._lock:
+            self._locked_count += 1
+            if len(self._locked) < MAX_LOCKED_REPORTED:
+                self._locked.append(display_path(path))
+
+    def _record_error(self, path, error):
+        """Remember an unexpected failure"""
+        logger.debug(f"Could not delete {display_path(path)}: {str(error)}")
+        with self._lock:
+            if len(self._errors) < MAX_LOCKED_REPORTED:
+                self._errors.append(f"{display_path(path)}: {error.strerror or str(error)}")
+
+    def _unlink(self, path, size):
+        """Delete one file, clearing the read-only attribute if that is what stops it"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        except PermissionError:
+            try:
+                os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+                os.unlink(path)
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if _is_locked(e):
+                    self._record_locked(path)
+                else:
+                    self._record_error(path, e)
+                return
+        except OSError as e:
+            if _is_locked(e):
+                self._record_locked(path)
+            else:
+                self._record_error(path, e)
+            return
+
+        with self._lock:
+            self._files += 1
+            self._bytes += size
+
+    def _remove_link(self, entry):
+        """Remove a symlink or junction itself, never what it points to"""
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                os.rmdir(entry.path)
+            else:
+                os.unlink(entry.path)
+        except OSError as e:
+            self._record_error(entry.path, e)
+
+    def _scan(self, path, depth, submit):
+        """Empty one directory of files and queue its subdirectories"""
+        with self._lock:
+            self._directories.append((depth, path))
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            if _is_locked(e):
+                self._record_locked(path)
+            else:
+                self._record_error(path, e)
+            return
+
+        for entry in entries:
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+                if is_link(entry, stat_result):
+                    self._remove_link(entry)
+                elif entry.is_dir(follow_symlinks=False):
+                    submit(entry.path, depth + 1)
+                else:
+                    self._unlink(entry.path, stat_result.st_size)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self._record_error(entry.path, e)
+        self._progress()
+
+    def _remove_directories(self):
+        """Remove the emptied directories, deepest first"""
+        for _, path in sorted(self._directories, reverse=True):
+            try:
+                os.rmdir(path)
+            except FileNotFoundError:
+                continue
+            except PermissionError:
+                try:
+                    os.chmod(path, stat.S_IWRITE | stat.S_IREAD | stat.S_IEXEC)
+                    os.rmdir(path)
+                except OSError:
+                    pass
+            except OSError:
+                # Still holds a locked file, which was already reported
+                pass
+
+    def delete(self, root):
+        """Delete root and everything below it and return a report
+
+        The report has filesRemoved, bytesRemoved, locked (paths, capped),
+        lockedCount, errors, seconds and complete, which is True when root
+        no longer exists.
+        """
+        start = time.monotonic()
+        root = long_path(root)
+        if not os.path.lexists(root):
+            return self._report(root, start)
+
+        outstanding = [0]
+        idle = threading.Condition()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="folder-delete") as executor:
+            def submit(path, depth):
+                with idle:
+                    outstanding[0] += 1
+                executor.submit(run, path, depth)
+
+            def run(path, depth):
+                try:
+                    self._scan(path, depth, submit)
+                except Exception as e:
+                    self._record_error(path, e if isinstance(e, OSError) else OSError(str(e)))
+                finally:
+                    with idle:
+                        outstanding[0] -= 1
+                        if not outstanding[0]:
+                            idle.notify_all()
+
+            submit(root, 0)
+            with idle:
+                while outstanding[0]:
+                    idle.wait()
+
+        self._remove_directories()
+        return self._report(root, start)
+
+    def _report(self, root, start):
+        """Summarize a finished deletion"""
+        self._progress(force=True)
+        with self._lock:
+            return {
+                "path": display_path(root),
+                "filesRemoved": self._files,
+                "bytesRemoved": self._bytes,
+                "locked": list(self._locked),
+                "lockedCount": self._locked_count,
+                "errors": list(self._errors),
+                "seconds": round(time.monotonic() - start, 3),
+                "complete": not os.path.lexists(root)
+            }
+
+def delete_tree(root, workers=None, on_progress=None, progress_interval=2.0):
+    """Delete a directory tree in parallel and return the report from FolderDeleter.delete"""
+    workers = delete_workers() if workers is None else workers
+    return FolderDeleter(workers=workers, on_progress=on_progress,
+                         progress_interval=progress_interval).delete(root)
@@ -0,0 +1,197 @@
+import collections
+import threading
+import hashlib
+import base64
+import gzip
+import json
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = 1000
+
+def parse_fields():
+    """Return the field names requested with ?fields=a,b, or None for all fields"""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    return tuple(sorted({field.strip() for field in value.split(',') if field.strip()}))
+
+def project(items, fields):
+    """Keep only the requested fields of each item"""
+    if not fields:
+        return items
+    return [{field: item[field] for field in fields if field in item} for item in items]
+
+def parse_page_size():
+    """Return the ?limit= page size, or None when pagination wasn't requested"""
+    value = request.args.get('limit')
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {value}")
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {value}")
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_cursor(key):
+    """Make an opaque cursor from the key of the last item on a page"""
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Recover the key from a cursor made by encode_cursor"""
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def paginate(items, key, cursor=None, limit=None):
+    """Return (page, next_cursor) for items ordered by key
+
+    Cursors hold the key of the last item returned, so pages stay stable
+    when items before the cursor are added or removed between requests.
+    """
+    if limit is None:
+        return items, None
+
+    ordered = sorted(items, key=key)
+    if cursor:
+        after = decode_cursor(cursor)
+        ordered = [item for item in ordered if key(item) > after]
+
+    page = ordered[:limit]
+    next_cursor = encode_cursor(key(page[-1])) if len(ordered) > limit else None
+    return page, next_cursor
+
+def _accepted_encodings():
+    """Parse Accept-Encoding into the set of codings with a non-zero q-value"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
+
+def negotiate_encoding():
+    """Pick the best content coding the client accepts: br, then gzip, else None"""
+    accepted = _accepted_encodings()
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+def _compress(body, encoding):
+    """Compress a body with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+class _RepresentationCache:
+    """Small LRU of serialized (and compressed) bodies keyed by ETag"""
+
+    def __init__(self, size=32):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag, encoding):
+        """Return a cached body, or None"""
+        with self._lock:
+            variants = self._entries.get(etag)
+            if variants is None:
+                return None
+            self._entries.move_to_end(etag)
+            return variants.get(encoding)
+
+    def put(self, etag, encoding, body):
+        """Remember a body for later requests"""
+        with self._lock:
+            self._entries.setdefault(etag, {})[encoding] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+_representations = _RepresentationCache()
+
+def _not_modified(etag):
+    """Return the tag of ours the client's If-None-Match names, or None"""
+    tags = request.if_none_match
+    if not tags:
+        return None
+    return next((candidate for candidate in (etag, f"{etag}-gzip", f"{etag}-br")
+                 if tags.contains(candidate)), None)
+
+def json_response(payload, etag_key=None, status=200):
+    """Build a JSON response with a strong ETag and negotiated compression
+
+    payload may be a callable so it is only built when actually needed. With
+    etag_key (anything JSON-serializable that identifies the content, such as
+    an inventory digest plus the query parameters) the ETag is known up front:
+    a matching If-None-Match is answered with 304 before the payload is
+    built, and serialized bodies are reused between requests. Without it the
+    ETag is a hash of the serialized body.
+    """
+    if etag_key is not None:
+        key = json.dumps(etag_key, sort_keys=True, separators=(",", ":"), default=str)
+        etag = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        matched = _not_modified(etag)
+        if matched:
+            return _not_modified_response(matched)
+        body = _representations.get(etag, None)
+        if body is None:
+            body = current_app.json.dumps(payload() if callable(payload) else payload).encode("utf-8")
+            _representations.put(etag, None, body)
+    else:
+        body = current_app.json.dumps(payload() if callable(payload) else payload).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        matched = _not_modified(etag)
+        if matched:
+            return _not_modified_response(matched)
+
+    encoding = negotiate_encoding()
+    if encoding is not None and len(body) >= MIN_COMPRESS_SIZE:
+        compressed = _representations.get(etag, encoding) if etag_key is not None else None
+        if compressed is None:
+            compressed = _compress(body, encoding)
+            if etag_key is not None:
+                _representations.put(etag, encoding, compressed)
+        response = Response(compressed, status=status, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        # Each coding is a different representation, so it gets its own strong tag
+        response.set_etag(f"{etag}-{encoding}")
+    else:
+        response = Response(body, status=status, mimetype='application/json')
+        response.set_etag(etag)
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _not_modified_response(etag):
+    """Answer a conditional request whose representation hasn't changed"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,170 @@
+import collections
+import threading
+import hashlib
+import logging
+import json
+import time
+
+from utils.registry import UNINSTALL_KEY_PATHS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def uninstall_keys_fingerprint(registry):
+    """Return the last-write timestamps of the Uninstall keys, or None without a registry
+
+    Windows updates a key's last-write time whenever a subkey is created or
+    deleted, so this changes whenever a product is installed or removed.
+    """
+    if registry is None:
+        return None
+    return tuple(registry.last_write(path) for path in UNINSTALL_KEY_PATHS)
+
+class InventoryCache:
+    """Caches the installed product list until the registry says it changed.
+
+    A cached list is reused while the fingerprint (cheap to compute) is
+    unchanged and it is younger than ttl seconds. Without a fingerprint only
+    the TTL applies. Concurrent misses share a single load.
+    """
+
+    def __init__(self, loader, fingerprint=None, ttl=300.0):
+        self.loader = loader
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+
+        self._products = None
+        self._fingerprint = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _current_fingerprint(self):
+        """Compute the fingerprint, treating failures as 'unknown'"""
+        if self.fingerprint is None:
+            return None
+        try:
+            return self.fingerprint()
+        except Exception as e:
+            logger.debug(f"Could not read inventory fingerprint: {str(e)}")
+            return None
+
+    def _cached(self, fingerprint):
+        """Return the cached products if they are still valid, else None"""
+        with self._lock:
+            if self._products is None:
+                return None
+            if time.monotonic() - self._loaded_at >= self.ttl:
+                return None
+            if fingerprint != self._fingerprint:
+                return None
+            return list(self._products)
+
+    def get(self, force_refresh=False):
+        """Return the installed products, loading them only when needed"""
+        fingerprint = self._current_fingerprint()
+        if not force_refresh:
+            products = self._cached(fingerprint)
+            if products is not None:
+                return products
+
+        with self._load_lock:
+            with self._lock:
+                generation = self._generation
+            # Another thread may have loaded while we waited for the lock
+            if not force_refresh:
+                products = self._cached(fingerprint)
+                if products is not None:
+                    return products
+
+            products = self.loader()
+            with self._lock:
+                # Don't store a result an invalidate() raced with
+                if generation == self._generation:
+                    self._products = products
+                    self._fingerprint = fingerprint
+                    self._loaded_at = time.monotonic()
+            return list(products)
+
+    def invalidate(self):
+        """Drop the cached products so the next read rescans"""
+        with self._lock:
+            self._products = None
+            self._generation += 1
+
+class InventorySnapshots:
+    """Numbered snapshots of the inventory for answering "what changed since token T".
+
+    Tokens look like "<epoch>.<n>": n increases every time the recorded
+    products differ from the previous snapshot, and the epoch changes with
+    every process so tokens from before a restart are never misread.
+    Each snapshot also has a content digest, identical across processes for
+    identical inventories, that HTTP responses use as their ETag.
+    """
+
+    def __init__(self, history=32):
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._counter = 0
+        self._current = None
+        self._digest = None
+        self._history = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def _token(self, counter):
+        """Format a counter as a token"""
+        return f"{self.epoch}.{counter}"
+
+    def record(self, products):
+        """Record the latest products and return the token that identifies them"""
+        index = {product['psChildName']: product for product in products}
+        with self._lock:
+            if index != self._current:
+                self._counter += 1
+                self._current = index
+                self._digest = None
+                self._history.append((self._counter, index))
+            return self._token(self._counter)
+
+    def current_digest(self):
+        """Return a hash of the latest snapshot's content, or None before the first"""
+        with self._lock:
+            if self._current is None:
+                return None
+            if self._digest is None:
+                # Computed once per snapshot, on first use
+                canonical = json.dumps([self._current[key] for key in sorted(self._current)],
+                                       sort_keys=True, separators=(",", ":"))
+                self._digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+            return self._digest
+
+    def current_token(self):
+        """Return the token of the latest snapshot, or None before the first"""
+        with self._lock:
+            return self._token(self._counter) if self._counter else None
+
+    def delta(self, since):
+        """Return (token, added, removed, changed) relative to since, or None if unknown
+
+        added and changed are product dicts; removed lists psChildNames. None
+        means the client must resync with a full product list.
+        """
+        epoch, _, counter = (since or "").partition(".")
+        with self._lock:
+            if epoch != self.epoch or not counter.isdigit():
+                return None
+            counter = int(counter)
+            old = next((index for number, index in self._history if number == counter), None)
+            if old is None:
+                return None
+            current = self._current
+            token = self._token(self._counter)
+
+        if old is current:
+            return token, [], [], []
+
+        added = [product for key, product in current.items() if key not in old]
+        removed = [key for key in old if key not in current]
+        changed = [product for key, product in current.items()
+                   if key in old and old[key] != product]
+        return token, added, removed, changed
@@ -0,0 +1,348 @@
+import collections
+import threading
+import logging
+import queue
+import time
+import uuid
+
+from utils.ps_scripts import get_backend, uninstall_products, delete_autodesk_folder, restart_computer, job_session
+from utils.results import FINAL_STATES, PENDING, REMOVED, SKIPPED
+from utils.journal import open_default_journal
+from utils import tracing
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around for status queries
+JOB_HISTORY = 50
+
+class Job:
+    """One uninstall request and everything that has happened to it so far.
+
+    Progress events are appended to an in-memory log that any number of
+    subscribers can read from any position, and per-product state records
+    and counters are updated as "product" events arrive, so status reads
+    never have to replay the log. With a journal, the job's state changes
+    and each product's state transitions are also written to it. With a
+    trace (a tracing.Trace), the job's passes, removals and PowerShell
+    calls are recorded as spans.
+    """
+
+    def __init__(self, product_ids, delete_folder=False, restart_computer=False, journal=None, job_id=None,
+                 trace=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.product_ids = list(product_ids)
+        self.delete_folder = delete_folder
+        self.restart_computer = restart_computer
+        self.journal = journal
+        self.trace = trace
+        # Products this run uninstalls; a resumed job skips the ones already settled
+        self.remaining_ids = list(self.product_ids)
+        self.resumed = False
+        self.restarted = False
+        self._attempted = set()
+
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.message = None
+        self.error = None
+        self.results = None
+        self.folder_deleted = False
+        self.folder = None
+
+        self.products = collections.OrderedDict(
+            (product_id, {"psChildName": product_id, "state": PENDING}) for product_id in self.product_ids)
+        self.counts = collections.Counter({PENDING: len(self.products)})
+        self._journaled = {}
+
+        self.events = []
+        self._cond = threading.Condition()
+
+    @classmethod
+    def resume(cls, entry, journal=None):
+        """Rebuild a job the journal shows was cut short (an entry from Journal.replay)"""
+        # The journal already holds the restored records, so it is attached afterwards
+        job = cls(entry["productIds"], delete_folder=entry["deleteFolder"],
+                  restart_computer=entry["restartComputer"], job_id=entry["job"],
+                  trace=tracing.Trace(f"job {entry['job']}") if tracing.trace_all_jobs() else None)
+        job.resumed = True
+        job.restarted = entry.get("restarted", False)
+        job.created_at = entry.get("createdAt") or job.created_at
+        for record in entry["products"].values():
+            job._update_product(record)
+            if record.get("attempts"):
+                job._attempted.add(record["psChildName"])
+        job.journal = journal
+        settled = FINAL_STATES
+        if job.restarted:
+            # The job got as far as restarting the computer. Anything not removed
+            # may have been waiting for that restart, so it is checked again, and
+            # the computer is not restarted a second time.
+            job.restart_computer = False
+            settled = (REMOVED, SKIPPED)
+        job.remaining_ids = [product_id for product_id, product in job.products.items()
+                             if product["state"] not in settled]
+        return job
+
+    def _journal(self, record):
+        """Write a record to the journal, if there is one"""
+        if self.journal is not None:
+            self.journal.append({**record, "job": self.id, "at": time.time()})
+
+    def journal_queued(self):
+        """Journal the job's creation, with what is needed to resume it"""
+        self._journal({"type": "job", "state": "queued", "productIds": self.product_ids,
+                       "deleteFolder": self.delete_folder, "restartComputer": self.restart_computer,
+                       "backend": get_backend().name, "createdAt": self.created_at})
+
+    @property
+    def done(self):
+        """True once the job has completed or failed"""
+        return self.state in ("completed", "failed")
+
+    def _update_product(self, record):
+        """Replace a product's state record, keeping the counters in step"""
+        product = self.products.get(record.get("psChildName"))
+        if product is None:
+            return
+        self.counts[product["state"]] -= 1
+        self.counts[record["state"]] += 1
+        product.update(record)
+        # Only transitions are journaled, not every message or method update
+        transition = (record["state"], record.get("attempts"))
+        if self._journaled.get(product["psChildName"]) != transition:
+            self._journaled[product["psChildName"]] = transition
+            self._journal({"type": "product", **product})
+
+    def publish(self, event):
+        """Record a progress event and wake up subscribers"""
+        with self._cond:
+            if event.get("event") == "product":
+                self._update_product({key: value for key, value in event.items() if key != "event"})
+            elif event.get("event") in ("folder_progress", "folder_finished"):
+                self.folder = {key: value for key, value in event.items() if key != "event"}
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def _start(self):
+        """Mark the job as running"""
+        with self._cond:
+            self.state = "running"
+            self.started_at = time.time()
+        self._journal({"type": "job", "state": "running"})
+
+    def _finish(self, state, event, journal_state=None):
+        """Mark the job as finished and publish its final event
+
+        journal_state, if given, is journaled instead of state, for a job
+        that is finished here but must still be picked up by the next start.
+        """
+        # On disk before anyone can see the job finished
+        self._checkpoint(journal_state or state)
+        with self._cond:
+            self.state = state
+            self.finished_at = time.time()
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def _checkpoint(self, state):
+        """Journal a job state and wait until it is on disk"""
+        self._journal({"type": "job", "state": state})
+        # What happens next (a restart, or the process exiting) must not lose it
+        if self.journal is not None and not self.journal.sync():
+            logger.warning(f"Job {self.id}: the {state} state may not have reached the journal: "
+                           f"{self.journal.error or 'timed out'}")
+
+    def settle_resumed(self, results):
+        """Combine a resumed run's results with the products settled before it
+
+        A product that was being removed when the job was cut short and is
+        no longer installed was removed by that earlier attempt.
+        """
+        by_id = {record["psChildName"]: record for record in results}
+        for product_id in self.remaining_ids:
+            record = by_id.get(product_id)
+            if record is not None and record["state"] == SKIPPED and product_id in self._attempted:
+                self.publish({"event": "product", **record, "state": REMOVED,
+                              "message": ("Removed by the restart" if self.restarted
+                                          else "Removed before the interruption")})
+        return self.product_states()
+
+    def events_since(self, index, timeout=None):
+        """Return (events after index, done), waiting up to timeout for something new"""
+        with self._cond:
+            if len(self.events) <= index and not self.done:
+                self._cond.wait(timeout)
+            return self.events[index:], self.done
+
+    def status(self):
+        """Return a summary of the job; cost does not grow with the event log"""
+        with self._cond:
+            return {
+                "jobId": self.id,
+                "state": self.state,
+                "inProgress": not self.done,
+                "createdAt": self.created_at,
+                "startedAt": self.started_at,
+                "finishedAt": self.finished_at,
+                "total": len(self.products),
+                "counts": {state: count for state, count in self.counts.items() if count},
+                "message": self.message,
+                "error": self.error,
+                "folderDeleted": self.folder_deleted,
+                "folder": self.folder,
+                "resumed": self.resumed
+            }
+
+    def product_states(self):
+        """Return the state of every product in the job"""
+        with self._cond:
+            return [dict(product) for product in self.products.values()]
+
+def run_uninstall_job(job):
+    """Uninstall a job's products, then delete the folder and restart if asked"""
+    logger.info(f"Job {job.id}: uninstalling {len(job.remaining_ids)} products")
+    results = uninstall_products(job.remaining_ids, on_event=job.publish) if job.remaining_ids else []
+    job.results = job.settle_resumed(results) if job.resumed else results
+
+    if job.delete_folder:
+        job.publish({"event": "folder_started"})
+        job.folder_deleted = delete_autodesk_folder(on_event=job.publish)
+
+    job.message = ('Uninstallation complete. System is restarting...' if job.restart_computer
+                   else 'Uninstallation completed successfully')
+
+class JobEngine:
+    """Runs uninstall jobs one at a time on a background worker thread.
+
+    Jobs never run concurrently because they all act on the same machine;
+    submit() only queues the job and returns it straight away. With a
+    journal, resume() requeues the jobs a crash or restart cut short.
+    """
+
+    def __init__(self, runner=run_uninstall_job, history=JOB_HISTORY, journal=None):
+        self.runner = runner
+        self.history = history
+        self.journal = journal
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def submit(self, product_ids, delete_folder=False, restart_computer=False, trace=None):
+        """Queue an uninstall job and return it
+
+        trace is a tracing.Trace to record the job in; every job gets one
+        when AUTODESK_UNINSTALLER_TRACE is set.
+        """
+        if trace is None and tracing.trace_all_jobs():
+            trace = tracing.Trace("uninstall job")
+        job = Job(product_ids, delete_folder=delete_folder, restart_computer=restart_computer, journal=self.journal,
+                  trace=trace)
+        job.journal_queued()
+        self._enqueue(job)
+        logger.info(f"Queued job {job.id} for {len(job.product_ids)} products")
+        return job
+
+    def _enqueue(self, job):
+        """Track a job and hand it to the worker thread"""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="uninstall-jobs", daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+
+    def resume(self):
+        """Requeue the unfinished products of jobs the journal shows were cut short
+
+        Jobs recorded under another backend (such as the simulator) are kept
+        in the journal but not resumed. The journal is compacted to the
+        unfinished jobs first, so it does not grow from one start to the next.
+        """
+        if self.journal is None:
+            return []
+        try:
+            unfinished = self.journal.replay()
+            self.journal.checkpoint(unfinished)
+        except Exception as e:
+            logger.error(f"Failed to read the uninstall journal: {str(e)}")
+            return []
+
+        backend = get_backend().name
+        resumed = []
+        for entry in unfinished:
+            if entry["backend"] != backend:
+                logger.info(f"Not resuming job {entry['job']}, it ran on the {entry['backend']} backend")
+                continue
+            job = Job.resume(entry, journal=self.journal)
+            self._enqueue(job)
+            resumed.append(job)
+            logger.info(f"Resuming job {job.id}: {len(job.remaining_ids)} of {len(job.product_ids)} "
+                        f"products unfinished")
+        return resumed
+
+    def get(self, job_id):
+        """Return a job by ID, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        """Return the most recently submitted job, or None"""
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        """Run queued jobs forever"""
+        while True:
+            job = self._queue.get()
+            job._start()
+            # Every pass, the folder deletion and the restart share one session
+            with job_session(), tracing.activate(job.trace):
+                try:
+                    with tracing.span("job", category="job", jobId=job.id, products=len(job.remaining_ids)):
+                        self.runner(job)
+                except Exception as e:
+                    logger.error(f"Job {job.id} failed: {str(e)}")
+                    job.error = str(e)
+                    job._finish("failed", {"event": "error", "error": str(e)})
+                    continue
+
+                event = {
+                    "event": "complete",
+                    "success": True,
+                    "message": job.message,
+                    "results": job.results,
+                    "folderDeleted": job.folder_deleted,
+                    "folder": job.folder
+                }
+                if not job.restart_computer:
+                    job._finish("completed", event)
+                    continue
+
+                # Until the next start has checked the products the restart was
+                # meant to finish off, the journal keeps the job open
+                job._finish("completed", event, journal_state="restarting")
+                if not restart_computer():
+                    job._checkpoint("completed")
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_default_engine():
+    """Return the process-wide job engine"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = JobEngine(journal=open_default_journal())
+            _default_engine.resume()
+        return _default_engine
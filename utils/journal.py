@@ -0,0 +1,189 @@
+import collections
+import threading
+import logging
+import json
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+JOURNAL_ENV_VAR = "AUTODESK_UNINSTALLER_JOURNAL"
+
+# Job states after which a job is never resumed
+JOB_FINAL_STATES = ("completed", "failed")
+
+# Fields of a product record that are not part of its state
+RECORD_ENVELOPE = ("type", "job", "event", "at")
+
+# Seconds the writer waits before retrying a failed write
+RETRY_SECONDS = 1.0
+
+class Journal:
+    """Append-only JSON-lines log of job and product state transitions.
+
+    append() only queues a record. A writer thread writes everything queued
+    since its last write and then fsyncs once, so a burst of transitions
+    from parallel uninstalls costs a single fsync. sync() waits until every
+    record appended so far is on disk; it is called before anything that
+    may end the process, such as restarting the computer. Records that
+    could not be written stay queued and are retried, and sync() returns
+    False while the journal cannot be written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._pending = []
+        self._appended = 0
+        self._durable = 0
+        self._failures = 0
+        self.error = None
+        self._cond = threading.Condition()
+        self._writer = None
+        self._file = None
+
+    def append(self, record):
+        """Queue a record for the writer thread"""
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._cond:
+            self._pending.append(line)
+            self._appended += 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, name="uninstall-journal", daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+
+    def sync(self, timeout=10.0):
+        """Wait until every record appended so far is on disk; False on timeout or a write error"""
+        with self._cond:
+            target = self._appended
+            failures = self._failures
+            # A write attempt that fails after this call answers it as well as one that succeeds
+            self._cond.wait_for(lambda: self._durable >= target or self._failures > failures, timeout)
+            return self._durable >= target
+
+    def _write_forever(self):
+        """Write and fsync queued records, one batch at a time"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                lines, self._pending = self._pending, []
+                target = self._appended
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                logger.error(f"Failed to write {len(lines)} journal records: {str(e)}")
+                self._close_file()
+                with self._cond:
+                    # Back in front of anything appended since, to be retried in order
+                    self._pending = lines + self._pending
+                    self._failures += 1
+                    self.error = str(e)
+                    self._cond.notify_all()
+                    self._cond.wait(RETRY_SECONDS)
+                continue
+            with self._cond:
+                self._durable = target
+                self.error = None
+                self._cond.notify_all()
+
+    def _close_file(self):
+        """Drop the file handle so the next write opens the journal again"""
+        try:
+            if self._file is not None:
+                self._file.close()
+        except Exception:
+            pass
+        self._file = None
+
+    def replay(self):
+        """Return the jobs the journal leaves unfinished, oldest first
+
+        The journal is read one line at a time and only the latest record
+        of each product is kept, so memory grows with the products of the
+        unfinished jobs, not with the length of the journal. A job is
+        forgotten as soon as its final record is read.
+        """
+        jobs = collections.OrderedDict()
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be torn if the machine went down mid-write
+                    continue
+                job_id = record.get("job")
+                if record.get("type") == "job":
+                    if record.get("state") == "queued":
+                        if job_id in jobs:
+                            # Written twice by a retried write
+                            continue
+                        jobs[job_id] = {
+                            "job": job_id,
+                            "state": "queued",
+                            "productIds": record.get("productIds", []),
+                            "deleteFolder": record.get("deleteFolder", False),
+                            "restartComputer": record.get("restartComputer", False),
+                            "backend": record.get("backend"),
+                            "createdAt": record.get("createdAt"),
+                            "restarted": record.get("restarted", False),
+                            "products": {}
+                        }
+                    elif job_id in jobs:
+                        if record.get("state") in JOB_FINAL_STATES:
+                            del jobs[job_id]
+                        else:
+                            jobs[job_id]["state"] = record.get("state")
+                            # Sticks, so a crash while checking the job after the restart
+                            # does not lead to restarting again
+                            if record.get("state") == "restarting":
+                                jobs[job_id]["restarted"] = True
+                elif record.get("type") == "product" and job_id in jobs:
+                    jobs[job_id]["products"][record.get("psChildName")] = {
+                        key: value for key, value in record.items() if key not in RECORD_ENVELOPE}
+        return list(jobs.values())
+
+    def checkpoint(self, jobs):
+        """Replace the journal with just the records of jobs (as returned by replay)
+
+        Called at startup, before anything else is appended, so the journal
+        only holds the jobs carried over and those run since the last start.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for job in jobs:
+                header = {key: value for key, value in job.items() if key not in ("products", "state")}
+                f.write(json.dumps({"type": "job", "state": "queued", **header}, separators=(",", ":")) + "\n")
+                for record in job["products"].values():
+                    f.write(json.dumps({"type": "product", "job": job["job"], **record},
+                                       separators=(",", ":"), default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+def default_journal_path():
+    """Return the configured journal path, or None when journaling is disabled"""
+    path = os.environ.get(JOURNAL_ENV_VAR)
+    if path is not None:
+        return path or None
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "AutodeskUninstaller", "journal.jsonl")
+
+def open_default_journal():
+    """Open the configured journal, or return None when it is disabled or unusable"""
+    path = default_journal_path()
+    if path is None:
+        return None
+    try:
+        return Journal(path)
+    except OSError as e:
+        logger.warning(f"Uninstall journal disabled, {path} is not writable: {str(e)}")
+        return None
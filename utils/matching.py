@@ -0,0 +1,194 @@
+import threading
+import logging
+import json
+import os
+import re
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Fields a rule can test. displayName and publisher take PowerShell -like
+# wildcards; productCode takes prefixes of the uninstall key name.
+RULE_FIELDS = ("displayName", "publisher", "productCode")
+
+# What counts as an Autodesk product, formerly hardcoded as four -like tests
+# in both the discovery query and Uninstall-AutodeskProductsByPSChildName
+DEFAULT_RULES = {
+    "include": {
+        "displayName": ["*Autodesk*", "*AutoCAD*", "*Revit*"],
+        "publisher": ["*Autodesk*"],
+    },
+    "exclude": {},
+}
+
+RULES_ENV_VAR = "AUTODESK_UNINSTALLER_MATCH_RULES"
+
+_WILDCARD_CHARS = re.compile(r"[*?\[]")
+
+def wildcard_to_regex(pattern):
+    """Translate a PowerShell -like wildcard into an anchored regex body"""
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append(".")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                parts.append("[" + pattern[index + 1:end].replace("\\", "\\\\") + "]")
+                index = end
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+def _compile_text_patterns(patterns):
+    """Compile -like patterns for one field into a single test function
+
+    "*literal*" patterns, by far the common case, become one alternation
+    searched in a single pass; the rest become one anchored alternation.
+    """
+    literals = []
+    wildcards = []
+    for pattern in patterns:
+        inner = pattern[1:-1] if len(pattern) >= 2 and pattern[0] == "*" and pattern[-1] == "*" else None
+        if inner and not _WILDCARD_CHARS.search(inner):
+            literals.append(re.escape(inner))
+        else:
+            wildcards.append(wildcard_to_regex(pattern))
+
+    tests = []
+    if literals:
+        tests.append(re.compile("|".join(literals), re.IGNORECASE | re.DOTALL).search)
+    if wildcards:
+        tests.append(re.compile("(?:" + "|".join(wildcards) + r")\Z", re.IGNORECASE | re.DOTALL).match)
+
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+    return lambda value: any(test(value) for test in tests)
+
+def _validate_patterns(name, patterns):
+    """Raise ValueError unless patterns is a list of non-empty strings that all compile"""
+    if not isinstance(patterns, list) or not all(isinstance(pattern, str) and pattern for pattern in patterns):
+        raise ValueError(f"{name} must be a list of non-empty strings")
+    if name.endswith(".productCode"):
+        return
+    for pattern in patterns:
+        try:
+            re.compile(wildcard_to_regex(pattern))
+        except re.error as e:
+            raise ValueError(f"{name} has an invalid pattern {pattern!r}: {str(e)}")
+
+def _compile_prefixes(prefixes):
+    """Compile product-code prefixes into a single case-insensitive test"""
+    if not prefixes:
+        return None
+    prefixes = tuple(prefix.upper() for prefix in prefixes)
+    return lambda value: value.upper().startswith(prefixes)
+
+class ProductMatcher:
+    """A compiled set of include/exclude rules for uninstall registry records.
+
+    A record matches when any include rule matches and no exclude rule does.
+    Each field's patterns are compiled once, so a record costs at most one
+    regex scan per field instead of one comparison per pattern.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        for kind, section in (("include", include), ("exclude", exclude)):
+            if section is not None and not isinstance(section, dict):
+                raise ValueError(f"{kind} must be an object of field patterns")
+        self.rules = {"include": dict(include or {}), "exclude": dict(exclude or {})}
+        for kind, section in self.rules.items():
+            unknown = set(section) - set(RULE_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown product rule fields: {', '.join(sorted(unknown))}")
+            for field, patterns in section.items():
+                _validate_patterns(f"{kind}.{field}", patterns)
+
+        self._include = self._compile(self.rules["include"])
+        self._exclude = self._compile(self.rules["exclude"])
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Create a matcher from a {"include": ..., "exclude": ...} dict
+
+        Rules without any include pattern are refused, since they would
+        select no product at all.
+        """
+        if not isinstance(rules, dict):
+            raise ValueError("Product rules must be an object with include and exclude sections")
+        unknown = set(rules) - {"include", "exclude"}
+        if unknown:
+            raise ValueError(f"Unknown product rule sections: {', '.join(sorted(unknown))}")
+        matcher = cls(include=rules.get("include"), exclude=rules.get("exclude"))
+        if not any(matcher.rules["include"].values()):
+            raise ValueError("include has no patterns, so no product would match")
+        return matcher
+
+    @classmethod
+    def from_file(cls, path):
+        """Create a matcher from a JSON rules file, raising ValueError that names the file"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_rules(json.load(f))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Invalid product matching rules in {path}: {str(e)}")
+
+    def _compile(self, section):
+        """Compile one section into (field index, test) pairs"""
+        compiled = []
+        for index, field in enumerate(RULE_FIELDS):
+            patterns = section.get(field) or []
+            test = _compile_prefixes(patterns) if field == "productCode" else _compile_text_patterns(patterns)
+            if test is not None:
+                compiled.append((index, test))
+        return compiled
+
+    def matches(self, display_name, publisher="", product_code=""):
+        """Return True if a registry record is selected by the rules"""
+        values = (display_name or "", publisher or "", product_code or "")
+        for index, test in self._include:
+            if test(values[index]):
+                break
+        else:
+            return False
+        for index, test in self._exclude:
+            if test(values[index]):
+                return False
+        return True
+
+    def filter_products(self, products):
+        """Return the product dicts selected by the rules"""
+        return [product for product in products
+                if self.matches(product.get('displayName'), product.get('publisher'),
+                                product.get('psChildName'))]
+
+_default_matcher = None
+_default_matcher_lock = threading.Lock()
+
+def get_default_matcher():
+    """Return the process-wide matcher, loading custom rules from the environment"""
+    global _default_matcher
+    with _default_matcher_lock:
+        if _default_matcher is None:
+            rules_path = os.environ.get(RULES_ENV_VAR)
+            if rules_path:
+                logger.info(f"Loading product matching rules from {rules_path}")
+                _default_matcher = ProductMatcher.from_file(rules_path)
+            else:
+                _default_matcher = ProductMatcher.from_rules(DEFAULT_RULES)
+        return _default_matcher
+
+def set_default_matcher(matcher):
+    """Replace the process-wide matcher"""
+    global _default_matcher
+    with _default_matcher_lock:
+        _default_matcher = matcher
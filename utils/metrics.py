@@ -0,0 +1,214 @@
+import contextlib
+import threading
+import bisect
+import time
+
+# Seconds; spans a registry read (milliseconds) to a Revit uninstall (many minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                   600.0, 1800.0)
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names, values, extra=()):
+    """Render {name="value",...}, or nothing without labels"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    """A monotonically increasing count, one series per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        # A metric without labels has exactly one series, reported from the start
+        self._values = {} if self.labels else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the series named by labels"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value of one series"""
+        with self._lock:
+            return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def samples(self):
+        """Return the exposition lines for every series"""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Counter):
+    """A value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        """Replace the value of the series named by labels"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram:
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} if self.labels else {(): [0] * (len(self.buckets) + 1) + [0.0]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, +Inf last, then the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe how long the with block takes, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        """Return the number of observations in one series"""
+        with self._lock:
+            series = self._series.get(tuple(labels.get(name, "") for name in self.labels))
+            return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        """Return the exposition lines for every series"""
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    """The set of metrics exposed by /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, returning the one already registered under its name if any"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, help_text, labels=()):
+    """Create (or return the existing) counter in the default registry"""
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+def gauge(name, help_text, labels=()):
+    """Create (or return the existing) gauge in the default registry"""
+    return REGISTRY.register(Gauge(name, help_text, labels))
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    """Create (or return the existing) histogram in the default registry"""
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+# What the tool measures, declared in one place so /metrics lists every
+# metric from the first scrape
+
+POWERSHELL_SPAWNS = counter(
+    "autodesk_uninstaller_powershell_spawns_total",
+    "PowerShell processes started, as warm pool hosts or one-off processes", ("kind",))
+POWERSHELL_SPAWN_SECONDS = histogram(
+    "autodesk_uninstaller_powershell_spawn_seconds",
+    "Time from starting a PowerShell process until it is ready (pool host) or first writes output (process)",
+    ("kind",))
+POWERSHELL_COMMANDS = counter(
+    "autodesk_uninstaller_powershell_commands_total",
+    "PowerShell commands run, by where they ran: a pool host, a job's session or a new process", ("mode",))
+POWERSHELL_COMMAND_SECONDS = histogram(
+    "autodesk_uninstaller_powershell_command_seconds",
+    "Wall time of PowerShell commands, including any process startup", ("mode",))
+POWERSHELL_STDOUT_BYTES = counter(
+    "autodesk_uninstaller_powershell_stdout_bytes_total",
+    "Bytes of PowerShell standard output read and parsed")
+INVENTORY_REQUESTS = counter(
+    "autodesk_uninstaller_inventory_requests_total",
+    "Requests for the installed product list, served from the cache or by a discovery")
+DISCOVERY_SECONDS = histogram(
+    "autodesk_uninstaller_discovery_seconds",
+    "Time to enumerate the Uninstall registry keys and match Autodesk products", ("backend",))
+DISCOVERED_PRODUCTS = gauge(
+    "autodesk_uninstaller_discovered_products",
+    "Autodesk products found by the latest discovery")
+PASS_SECONDS = histogram(
+    "autodesk_uninstaller_pass_seconds",
+    "Duration of one uninstallation pass, including the wait for Windows Installer to settle")
+UNINSTALL_SECONDS = histogram(
+    "autodesk_uninstaller_uninstall_seconds",
+    "Duration of one product uninstall attempt, by removal method and outcome", ("method", "status"))
+WAIT_SECONDS = counter(
+    "autodesk_uninstaller_wait_seconds_total",
+    "Time spent waiting for Windows Installer to become idle", ("phase",))
+WAIT_SAVED_SECONDS = counter(
+    "autodesk_uninstaller_wait_saved_seconds_total",
+    "Time the idle waits saved compared with the fixed sleeps they replaced", ("phase",))
+FOLDER_DELETE_SECONDS = histogram(
+    "autodesk_uninstaller_folder_delete_seconds",
+    "Time to delete the C:\\Autodesk folder")
+FOLDER_DELETE_FILES = counter(
+    "autodesk_uninstaller_folder_delete_files_total",
+    "Files removed from the C:\\Autodesk folder")
+FOLDER_DELETE_BYTES = counter(
+    "autodesk_uninstaller_folder_delete_bytes_total",
+    "Bytes removed from the C:\\Autodesk folder")
+FOLDER_LOCKED_FILES = counter(
+    "autodesk_uninstaller_folder_locked_files_total",
+    "Files left in the C:\\Autodesk folder because another process held them open")
+
+def render():
+    """Return the default registry in the Prometheus text format"""
+    return REGISTRY.render()
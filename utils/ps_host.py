@@ -0,0 +1,382 @@
+import subprocess
+import threading
+import logging
+import atexit
+import collections
+import base64
+import queue
+import shlex
+import time
+import uuid
+import os
+
+from utils.metrics import POWERSHELL_SPAWNS, POWERSHELL_SPAWN_SECONDS, POWERSHELL_STDOUT_BYTES
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Script run by every warm host. It reads one framed request per line from
+# stdin ("ADU-REQ <id> <base64 utf-8 command>"), streams the command's output
+# to stdout and terminates the response with "ADU-END <nonce> <id> <exit code>".
+# The nonce is generated per host so command output can never forge the marker.
+HOST_BOOTSTRAP = r"""
+$ErrorActionPreference = 'Continue'
+$ProgressPreference = 'SilentlyContinue'
+$aduNonce = $env:ADU_HOST_NONCE
+[Console]::Out.WriteLine("ADU-READY $aduNonce")
+[Console]::Out.Flush()
+while ($true) {
+    $aduLine = [Console]::In.ReadLine()
+    if ($aduLine -eq $null) { break }
+    $aduParts = $aduLine.Split(' ')
+    if ($aduParts.Count -lt 3 -or $aduParts[0] -ne 'ADU-REQ') { continue }
+    $aduId = $aduParts[1]
+    $aduCode = 0
+    $global:LASTEXITCODE = 0
+    try {
+        $aduScript = [System.Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($aduParts[2]))
+        Invoke-Expression $aduScript 2>&1 | ForEach-Object {
+            if ($_ -is [System.Management.Automation.ErrorRecord]) {
+                [Console]::Error.WriteLine(($_ | Out-String).TrimEnd())
+            } else {
+                $_ | Out-String -Stream -Width 4096 | ForEach-Object { [Console]::Out.WriteLine($_) }
+                [Console]::Out.Flush()
+            }
+        }
+        if ($global:LASTEXITCODE) { $aduCode = $global:LASTEXITCODE }
+    } catch {
+        [Console]::Error.WriteLine(($_ | Out-String).TrimEnd())
+        $aduCode = 1
+    }
+    [Console]::Out.WriteLine("ADU-END $aduNonce $aduId $aduCode")
+    [Console]::Out.Flush()
+}
+"""
+
+PING_COMMAND = "Write-Output ADU-PONG"
+
+class PowerShellHostError(Exception):
+    """Raised when a pooled PowerShell host fails while running a command"""
+
+class PowerShellHostUnavailable(PowerShellHostError):
+    """Raised when no host could be started; the command was never sent"""
+
+def default_host_argv():
+    """Return the command line used to start a warm host"""
+    override = os.environ.get("AUTODESK_UNINSTALLER_PS_HOST")
+    if override:
+        return shlex.split(override, posix=(os.name != "nt"))
+
+    encoded = base64.b64encode(HOST_BOOTSTRAP.encode("utf-16-le")).decode("ascii")
+    return ["powershell", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass",
+            "-EncodedCommand", encoded]
+
+class PowerShellHost:
+    """A single long-lived PowerShell process speaking the framed protocol"""
+
+    def __init__(self, argv, startup_timeout=30.0):
+        self.nonce = uuid.uuid4().hex
+        self.commands_run = 0
+        self.last_used = time.monotonic()
+        self._next_id = 0
+        self._lines = queue.Queue()
+
+        env = dict(os.environ, ADU_HOST_NONCE=self.nonce)
+        creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        started = time.perf_counter()
+        try:
+            self.process = subprocess.Popen(
+                argv,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                env=env,
+                creationflags=creationflags
+            )
+        except OSError as e:
+            raise PowerShellHostUnavailable(f"Could not start PowerShell host: {str(e)}")
+        POWERSHELL_SPAWNS.inc(kind="pool")
+
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+        # Wait for the host to announce itself before handing it out
+        ready = f"ADU-READY {self.nonce}"
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                line = False
+            if line is None or line is False:
+                self.close()
+                reason = "exited during startup" if line is None else "did not become ready in time"
+                raise PowerShellHostUnavailable(f"PowerShell host {reason}")
+            if line == ready:
+                break
+
+        POWERSHELL_SPAWN_SECONDS.observe(time.perf_counter() - started, kind="pool")
+        logger.debug(f"Started PowerShell host (pid {self.process.pid})")
+
+    def _read_stdout(self):
+        """Forward stdout lines to the response queue; None marks EOF"""
+        try:
+            for line in self.process.stdout:
+                self._lines.put(line.rstrip("\r\n"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._lines.put(None)
+
+    def _read_stderr(self):
+        """Log anything the host writes to stderr"""
+        try:
+            for line in self.process.stderr:
+                line = line.rstrip()
+                if line:
+                    logger.warning(f"PowerShell host {self.process.pid}: {line}")
+        except (OSError, ValueError):
+            pass
+
+    def is_alive(self):
+        """Return True while the host process is running"""
+        return self.process.poll() is None
+
+    def execute(self, command, timeout=None, on_line=None, max_lines=None):
+        """Run a command in this host and return (exit_code, stdout)
+
+        Each output line is passed to on_line as soon as it arrives. With
+        max_lines set only the last max_lines lines are kept for the result.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        payload = base64.b64encode(command.encode("utf-8")).decode("ascii")
+
+        try:
+            self.process.stdin.write(f"ADU-REQ {request_id} {payload}\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise PowerShellHostUnavailable(f"PowerShell host is not accepting commands: {str(e)}")
+
+        end_marker = f"ADU-END {self.nonce} {request_id} "
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output = collections.deque(maxlen=max_lines) if max_lines else []
+        received = 0
+        while True:
+            try:
+                if deadline is None:
+                    line = self._lines.get()
+                else:
+                    line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self.close()
+                raise PowerShellHostError(f"PowerShell command timed out after {timeout} seconds")
+
+            if line is None:
+                raise PowerShellHostError("PowerShell host exited while running a command")
+            if line.startswith(end_marker):
+                exit_code = int(line[len(end_marker):] or 0)
+                break
+            received += len(line) + 1
+            output.append(line)
+            if on_line is not None:
+                on_line(line)
+
+        POWERSHELL_STDOUT_BYTES.inc(received)
+        self.commands_run += 1
+        self.last_used = time.monotonic()
+        return exit_code, "".join(f"{line}\n" for line in output)
+
+    def ping(self, timeout=5.0):
+        """Health check: return True if the host answers a trivial command"""
+        try:
+            exit_code, output = self.execute(PING_COMMAND, timeout=timeout)
+        except PowerShellHostError:
+            return False
+        return exit_code == 0 and output.strip() == "ADU-PONG"
+
+    def close(self):
+        """Stop the host process"""
+        try:
+            self.process.stdin.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+class PowerShellHostPool:
+    """A bounded pool of warm PowerShell hosts
+
+    init_command, if given, runs once in every host as it starts (to load a
+    function library, say), so commands can rely on what it defines.
+    """
+
+    def __init__(self, argv=None, size=3, max_commands=50, health_check_interval=30.0,
+                 startup_timeout=30.0, retry_delay=60.0, init_command=None):
+        self.argv = argv or default_host_argv()
+        self.init_command = init_command
+        self.size = max(1, size)
+        self.max_commands = max_commands
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self.retry_delay = retry_delay
+
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._unavailable_until = 0.0
+        self._cond = threading.Condition()
+
+    def _spawn(self):
+        """Start a new host, remembering failures so we don't retry every call"""
+        if time.monotonic() < self._unavailable_until:
+            raise PowerShellHostUnavailable("PowerShell host pool recently failed to start a host")
+        try:
+            host = PowerShellHost(self.argv, startup_timeout=self.startup_timeout)
+        except PowerShellHostUnavailable:
+            self._unavailable_until = time.monotonic() + self.retry_delay
+            raise
+        if self.init_command:
+            try:
+                host.execute(self.init_command, timeout=self.startup_timeout, max_lines=20)
+            except PowerShellHostError as e:
+                host.close()
+                self._unavailable_until = time.monotonic() + self.retry_delay
+                raise PowerShellHostUnavailable(f"PowerShell host failed to initialize: {str(e)}")
+        return host
+
+    def acquire(self, timeout=None):
+        """Take a healthy host out of the pool, starting one if there is room"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PowerShellHostUnavailable("PowerShell host pool is closed")
+                while not self._idle and self._total >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise PowerShellHostUnavailable("Timed out waiting for a PowerShell host")
+                    self._cond.wait(remaining)
+                host = self._idle.pop() if self._idle else None
+                if host is None:
+                    self._total += 1
+
+            if host is None:
+                try:
+                    return self._spawn()
+                except PowerShellHostUnavailable:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+
+            # Hosts that sat idle for a while get a health check before reuse
+            idle_for = time.monotonic() - host.last_used
+            if host.is_alive() and (idle_for < self.health_check_interval or host.ping()):
+                return host
+            logger.info("Discarding unhealthy PowerShell host")
+            self._discard(host)
+
+    def release(self, host, broken=False):
+        """Return a host to the pool, recycling it if it is spent or broken"""
+        if broken or not host.is_alive() or host.commands_run >= self.max_commands:
+            self._discard(host)
+            if not broken and host.commands_run >= self.max_commands:
+                logger.debug(f"Recycled PowerShell host after {host.commands_run} commands")
+            return
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(host)
+                self._cond.notify()
+        if closed:
+            host.close()
+
+    def _discard(self, host):
+        """Close a host and start a replacement in the background"""
+        host.close()
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+            closed = self._closed
+        if not closed:
+            threading.Thread(target=self.warm, kwargs={"count": 1}, daemon=True).start()
+
+    def warm(self, count=None):
+        """Start idle hosts until the pool is full (or count hosts were added)"""
+        started = 0
+        while count is None or started < count:
+            with self._cond:
+                if self._closed or self._total >= self.size:
+                    return started
+                self._total += 1
+            try:
+                host = self._spawn()
+            except PowerShellHostUnavailable as e:
+                logger.debug(f"Could not warm PowerShell host: {str(e)}")
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                return started
+            self.release(host)
+            started += 1
+        return started
+
+    def run(self, command, timeout=None, on_line=None, max_lines=None):
+        """Run a command on a pooled host and return (exit_code, stdout)"""
+        host = self.acquire()
+        try:
+            result = host.execute(command, timeout=timeout, on_line=on_line, max_lines=max_lines)
+        except BaseException:
+            self.release(host, broken=True)
+            raise
+        self.release(host)
+        return result
+
+    def close(self):
+        """Stop every idle host and refuse further work"""
+        with self._cond:
+            self._closed = True
+            hosts, self._idle = self._idle, []
+            self._total -= len(hosts)
+            self._cond.notify_all()
+        for host in hosts:
+            host.close()
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def pool_enabled():
+    """Return True unless the pool was switched off through the environment"""
+    return os.environ.get("AUTODESK_UNINSTALLER_PS_POOL", "1").lower() not in ("0", "false", "no", "off")
+
+def get_default_pool():
+    """Return the process-wide host pool, creating it on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = PowerShellHostPool(
+                size=int(os.environ.get("AUTODESK_UNINSTALLER_PS_POOL_SIZE", "3")),
+                max_commands=int(os.environ.get("AUTODESK_UNINSTALLER_PS_MAX_COMMANDS", "50"))
+            )
+        return _default_pool
+
+def shutdown_default_pool():
+    """Close the process-wide host pool if it was created"""
+    global _default_pool
+    with _default_pool_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close()
+
+atexit.register(shutdown_default_pool)
@@ -0,0 +1,64 @@
+"""Stand-in for a warm PowerShell host, for exercising the pool without PowerShell.
+
+Speaks the same framed protocol as ps_host.HOST_BOOTSTRAP. Each line of a
+command is echoed back, except:
+
+    Write-Output <text>   prints <text> (surrounding quotes stripped)
+    #stub:sleep <secs>    sleeps before continuing
+    #stub:exit <code>     sets the exit code reported for the command
+    #stub:stderr <text>   writes <text> to stderr
+    #stub:crash           exits the process immediately
+
+Point the pool at it with:
+    AUTODESK_UNINSTALLER_PS_HOST="python utils/ps_host_stub.py"
+
+Set ADU_STUB_STARTUP_DELAY to a number of seconds to model how long a real
+interpreter takes to start.
+"""
+import base64
+import sys
+import time
+import os
+
+def run_command(script):
+    """Execute a stub script and return its exit code"""
+    exit_code = 0
+    for line in script.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#stub:sleep"):
+            time.sleep(float(stripped.split()[1]))
+        elif stripped.startswith("#stub:exit"):
+            exit_code = int(stripped.split()[1])
+        elif stripped.startswith("#stub:stderr"):
+            sys.stderr.write(stripped[len("#stub:stderr"):].strip() + "\n")
+            sys.stderr.flush()
+        elif stripped == "#stub:crash":
+            sys.stdout.flush()
+            os._exit(3)
+        elif stripped.startswith("Write-Output "):
+            sys.stdout.write(stripped[len("Write-Output "):].strip("'\"") + "\n")
+        elif stripped:
+            sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+    return exit_code
+
+def main():
+    """Serve framed requests from stdin until it is closed"""
+    nonce = os.environ.get("ADU_HOST_NONCE", "")
+    startup_delay = float(os.environ.get("ADU_STUB_STARTUP_DELAY") or 0)
+    if startup_delay:
+        time.sleep(startup_delay)
+    sys.stdout.write(f"ADU-READY {nonce}\n")
+    sys.stdout.flush()
+
+    for line in sys.stdin:
+        parts = line.split()
+        if len(parts) < 2 or parts[0] != "ADU-REQ":
+            continue
+        script = base64.b64decode(parts[2] if len(parts) > 2 else "").decode("utf-8")
+        exit_code = run_command(script)
+        sys.stdout.write(f"ADU-END {nonce} {parts[1]} {exit_code}\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
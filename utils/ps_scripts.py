@@ -7,93 +7,208 @@ import re
 import tempfile
 import time
 import json
+import threading
+import hashlib
+import functools
+import collections
+import contextlib
+
+from utils.discovery import discover_products, lookup_products
+from utils.matching import get_default_matcher
+from utils.inventory import InventoryCache, InventorySnapshots, uninstall_keys_fingerprint
+from utils.registry import WinRegistry, native_registry_available
+from utils.scheduler import UninstallScheduler, classify_product, parallel_workers, wait_until
+from utils.results import UninstallResults
+from utils.fs_delete import delete_tree
+from utils.filesystem import LocalFilesystem
+from utils.footprint import footprint_roots, get_default_scanner, product_footprints, scan_footprint
+from utils.residue import ResidueSweeper
+from utils.store import history_store, local_host
+from utils import metrics, tracing
+from utils.ps_host import (
+    PowerShellHostError,
+    PowerShellHostPool,
+    PowerShellHostUnavailable,
+    get_default_pool,
+    pool_enabled
+)
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def check_admin_rights():
-    """Check if the script is running with administrative privileges"""
+# Prefix of the progress lines written by Write-AduEvent
+EVENT_PREFIX = "##ADU-EVENT "
+
+# Lines of raw uninstaller output kept for error reporting
+RAW_OUTPUT_LINES = 200
+
+# Access right needed to open the Windows Installer mutex
+SYNCHRONIZE = 0x00100000
+
+# Upper bound on uninstall passes; the loop normally stops much earlier
+MAX_PASSES = int(os.environ.get("AUTODESK_UNINSTALLER_MAX_PASSES", "5"))
+
+# Longest wait for Windows Installer to go idle between passes (the fixed
+# sleep this replaced)
+PASS_SETTLE_TIMEOUT = 5.0
+
+# Folder left behind by Autodesk installers
+AUTODESK_FOLDER = "C:\\Autodesk"
+
+def run_powershell_command(command, capture_output=True, use_pool=None, on_line=None, max_lines=None):
+    """Run a PowerShell command and return the output
+
+    Commands go to a warm host from the pool unless the pool is disabled or
+    no host can be started, in which case a fresh process is spawned. Output
+    is read line by line: each line is passed to on_line as it arrives, and
+    with max_lines set only the most recent lines are kept in memory.
+    """
+    if use_pool is None:
+        use_pool = pool_enabled()
+
+    with tracing.span("powershell", category="powershell", command=tracing.summarize_command(command)) as span:
+        if use_pool:
+            try:
+                output = _run_on_host(get_default_pool(), "pool", command, span, on_line, max_lines)
+                return output if capture_output else None
+            except PowerShellHostUnavailable as e:
+                logger.debug(f"PowerShell host pool unavailable, spawning a process instead: {str(e)}")
+
+        span.annotate(mode="process")
+        return run_powershell_process(command, capture_output=capture_output, on_line=on_line,
+                                      max_lines=max_lines)
+
+def _count_command(mode, started):
+    """Count one PowerShell command, and its wall time, under the mode that ran it"""
+    metrics.POWERSHELL_COMMANDS.inc(mode=mode)
+    metrics.POWERSHELL_COMMAND_SECONDS.observe(time.perf_counter() - started, mode=mode)
+
+def _run_on_host(pool, mode, command, span, on_line=None, max_lines=None):
+    """Run a command on a warm host of pool and return its output
+
+    Pool and session commands both run here, so they are counted the same
+    way. PowerShellHostUnavailable means no host took the command; it is
+    not counted, since the caller falls back to another way of running it.
+    """
+    started = time.perf_counter()
     try:
-        return ctypes.windll.shell32.IsUserAnAdmin() != 0
-    except AttributeError:
-        # Not running on Windows
-        return False
-    except Exception as e:
-        logger.error(f"Error checking admin rights: {str(e)}")
-        return False
+        exit_code, output = pool.run(command, on_line=on_line, max_lines=max_lines)
+    except PowerShellHostUnavailable:
+        raise
+    except PowerShellHostError as e:
+        _count_command(mode, started)
+        logger.error(f"Error running PowerShell command: {str(e)}")
+        raise Exception(f"Failed to execute PowerShell command: {str(e)}")
+    _count_command(mode, started)
+    span.annotate(mode=mode, exitCode=exit_code)
+    if exit_code != 0:
+        logger.warning(f"PowerShell command exited with code {exit_code}")
+    return output
+
+def run_powershell_process(command, capture_output=True, on_line=None, max_lines=None, on_process=None):
+    """Run a PowerShell command in a dedicated process and return the output
+
+    on_process, if given, receives the subprocess.Popen as soon as it has
+    started, so the caller can kill it.
+    """
+    with tracing.span("powershell process", category="powershell", command=tracing.summarize_command(command)):
+        return _run_powershell_process(command, capture_output, on_line, max_lines, on_process)
 
-def run_powershell_command(command, capture_output=True):
-    """Run a PowerShell command and return the output"""
+def _run_powershell_process(command, capture_output, on_line, max_lines, on_process=None):
+    """Spawn powershell.exe for one command; see run_powershell_process"""
     try:
         # Create a full PowerShell command
         full_command = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", command]
+        started = time.perf_counter()
+        metrics.POWERSHELL_SPAWNS.inc(kind="process")
         
-        # Run the command
-        result = subprocess.run(
+        if not capture_output:
+            process = subprocess.Popen(full_command)
+            if on_process is not None:
+                on_process(process)
+            process.wait()
+            _count_command("process", started)
+            return None
+        
+        # Run the command, reading stdout as it is produced
+        process = subprocess.Popen(
             full_command,
-            capture_output=capture_output,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            check=False  # Don't raise exception on non-zero exit code
+            bufsize=1
         )
+        if on_process is not None:
+            on_process(process)
+        
+        # Drain stderr on the side so a chatty command can't block on a full pipe
+        stderr_lines = collections.deque(maxlen=100)
+        stderr_thread = threading.Thread(target=stderr_lines.extend, args=(process.stderr,), daemon=True)
+        stderr_thread.start()
+        
+        output = collections.deque(maxlen=max_lines) if max_lines else []
+        received = 0
+        for line in process.stdout:
+            # Startup dominates a one-off process, so time to first output approximates it
+            if not received:
+                metrics.POWERSHELL_SPAWN_SECONDS.observe(time.perf_counter() - started, kind="process")
+            received += len(line)
+            line = line.rstrip("\r\n")
+            output.append(line)
+            if on_line is not None:
+                on_line(line)
+        
+        returncode = process.wait()
+        stderr_thread.join()
+        metrics.POWERSHELL_STDOUT_BYTES.inc(received)
+        _count_command("process", started)
         
-        if result.returncode != 0 and result.stderr:
-            logger.warning(f"PowerShell command exited with code {result.returncode}: {result.stderr}")
+        if returncode != 0 and stderr_lines:
+            logger.warning(f"PowerShell command exited with code {returncode}: {''.join(stderr_lines)}")
         
-        return result.stdout if capture_output else None
+        return "".join(f"{line}\n" for line in output)
     except Exception as e:
         logger.error(f"Error running PowerShell command: {str(e)}")
         raise Exception(f"Failed to execute PowerShell command: {str(e)}")
 
-def get_installed_autodesk_products():
-    """Get a list of installed Autodesk products"""
-    ps_command = """
-    $allInstalledApps = @()
-    $allInstalledApps = Get-ItemProperty -Path "HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
-    $allInstalledApps += Get-ItemProperty -Path "HKLM:\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
-    
-    $autodeskApps = $allInstalledApps | Where-Object {
-        $_.DisplayName -like "*Autodesk*" -or 
-        $_.Publisher -like "*Autodesk*" -or 
-        $_.DisplayName -like "*AutoCAD*" -or 
-        $_.DisplayName -like "*Revit*"
-    } | Select-Object DisplayName, Publisher, PSChildName, UninstallString -Unique
+def parse_event_line(line):
+    """Return the progress event carried by an output line, or None"""
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        event = json.loads(line[len(EVENT_PREFIX):])
+    except json.JSONDecodeError:
+        logger.warning(f"Could not parse progress event: {line}")
+        return None
+    return event if isinstance(event, dict) and event.get("event") else None
+
+def parse_product_json(output):
+    """Turn the JSON of a Select-Object DisplayName, Publisher, PSChildName, UninstallString, InstallLocation query into product dicts"""
+    if not output or output.strip() == "":
+        return []
     
-    $autodeskApps | ConvertTo-Json
-    """
+    products = json.loads(output)
     
-    try:
-        output = run_powershell_command(ps_command)
-        if not output or output.strip() == "":
-            return []
-        
-        products = json.loads(output)
+    # Ensure we have a list even if only one product is found
+    if not isinstance(products, list):
+        products = [products]
         
-        # Ensure we have a list even if only one product is found
-        if not isinstance(products, list):
-            products = [products]
-            
-        # Process the products to ensure all fields exist
-        processed_products = []
-        for product in products:
-            if product.get('DisplayName'):  # Skip any entries without a DisplayName
-                processed_products.append({
-                    'displayName': product.get('DisplayName', 'Unknown Product'),
-                    'publisher': product.get('Publisher', 'Unknown Publisher'),
-                    'psChildName': product.get('PSChildName', ''),
-                    'uninstallString': product.get('UninstallString', '')
-                })
-        
-        return processed_products
-    except Exception as e:
-        logger.error(f"Error getting installed Autodesk products: {str(e)}")
-        raise Exception(f"Failed to retrieve installed Autodesk products: {str(e)}")
+    # Process the products to ensure all fields exist
+    processed_products = []
+    for product in products:
+        if product.get('DisplayName'):  # Skip any entries without a DisplayName
+            processed_products.append({
+                'displayName': product.get('DisplayName', 'Unknown Product'),
+                'publisher': product.get('Publisher', 'Unknown Publisher'),
+                'psChildName': product.get('PSChildName', ''),
+                'uninstallString': product.get('UninstallString', ''),
+                'installLocation': product.get('InstallLocation') or ''
+            })
+    return processed_products
 
-def create_temp_ps_script():
-    """Create a temporary PowerShell script file with the uninstallation functions"""
-    try:
-        # Get the path to Autodesk-Uninstaller.ps1
-        script_content = """
+# Function library used by every uninstall command
+PS_LIBRARY = """
 function Get-AutodeskProductSelection {
     param (
         [Parameter(Mandatory=$true)]
@@ -104,6 +219,79 @@ function Get-AutodeskProductSelection {
     return $TargetPSChildNames
 }
 
+# Emit a progress event as a single line the caller can parse while the pass runs
+function Write-AduEvent {
+    param(
+        [Parameter(Mandatory=$true)]
+        [hashtable]$Event
+    )
+
+    Write-Output ("##ADU-EVENT " + ($Event | ConvertTo-Json -Compress))
+}
+
+$UninstallKeyPaths = @(
+    "HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall",
+    "HKLM:\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+)
+
+# Read the uninstall keys of the given products from both hives, without
+# enumerating everything else that is installed
+function Get-AduUninstallEntries {
+    param(
+        [Parameter(Mandatory=$true)]
+        [string[]]$PSChildNames
+    )
+
+    foreach ($psChildName in $PSChildNames) {
+        foreach ($uninstallKeyPath in $UninstallKeyPaths) {
+            Get-ItemProperty -LiteralPath "$uninstallKeyPath\\$psChildName" -ErrorAction SilentlyContinue
+        }
+    }
+}
+
+# True while a product's uninstall key exists in either hive
+function Test-AduUninstallKey {
+    param(
+        [Parameter(Mandatory=$true)]
+        [string]$PSChildName
+    )
+
+    foreach ($uninstallKeyPath in $UninstallKeyPaths) {
+        if (Test-Path -LiteralPath "$uninstallKeyPath\\$PSChildName") {
+            return $true
+        }
+    }
+    return $false
+}
+
+# Wait until a removal has settled: its uninstall key is gone and no Windows
+# Installer transaction is running. Replaces a fixed Start-Sleep; never waits
+# longer than the sleep it replaced.
+function Wait-AduRemoval {
+    param(
+        [Parameter(Mandatory=$true)]
+        [string]$PSChildName,
+        [int]$TimeoutMilliseconds = 3000
+    )
+
+    $stopwatch = [System.Diagnostics.Stopwatch]::StartNew()
+    while ($stopwatch.ElapsedMilliseconds -lt $TimeoutMilliseconds) {
+        $keyGone = -not (Test-AduUninstallKey -PSChildName $PSChildName)
+        $msiBusy = $false
+        $mutex = $null
+        if ([System.Threading.Mutex]::TryOpenExisting("Global\\_MSIExecute", [ref]$mutex)) {
+            $mutex.Dispose()
+            $msiBusy = $true
+        }
+        if ($keyGone -and -not $msiBusy) {
+            break
+        }
+        Start-Sleep -Milliseconds 250
+    }
+    $waited = [Math]::Min($stopwatch.ElapsedMilliseconds, $TimeoutMilliseconds)
+    Write-AduEvent @{ "event" = "waited"; "psChildName" = $PSChildName; "waitedMs" = $waited; "savedMs" = $TimeoutMilliseconds - $waited }
+}
+
 function Uninstall-AutodeskProductsByPSChildName {
     param(
         [Parameter(Mandatory=$true)]
@@ -112,27 +300,20 @@ function Uninstall-AutodeskProductsByPSChildName {
 
     if ($TargetPSChildNames.Count -eq 0) {
         Write-Output "No target products specified for uninstallation in this pass."
+        Write-AduEvent @{ "event" = "pass"; "status" = "warning"; "message" = "No target products specified" }
         return @{
             "status" = "warning"
             "message" = "No target products specified"
         }
     }
 
-    $currentAppsRaw = @()
-    $currentAppsRaw = Get-ItemProperty -Path "HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
-    $currentAppsRaw += Get-ItemProperty -Path "HKLM:\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
-    
-    $currentAutodeskApps = $currentAppsRaw | Where-Object {
-        $_.DisplayName -like "*Autodesk*" -or 
-        $_.Publisher -like "*Autodesk*" -or 
-        $_.DisplayName -like "*AutoCAD*" -or 
-        $_.DisplayName -like "*Revit*"
-    } | Select-Object DisplayName, Publisher, PSChildName, UninstallString -Unique
-
-    $appsToUninstallThisPass = $currentAutodeskApps | Where-Object { $TargetPSChildNames -contains $_.PSChildName }
+    # Targets were already checked against the product rules by the caller,
+    # so only their own keys are read
+    $appsToUninstallThisPass = @(Get-AduUninstallEntries -PSChildNames $TargetPSChildNames | Select-Object DisplayName, Publisher, PSChildName, UninstallString -Unique)
 
     if ($appsToUninstallThisPass.Count -eq 0) {
         Write-Output "All selected Autodesk products appear to be uninstalled, or were not found in this pass."
+        Write-AduEvent @{ "event" = "pass"; "status" = "info"; "message" = "All selected products appear to be uninstalled or were not found" }
         return @{
             "status" = "info"
             "message" = "All selected products appear to be uninstalled or were not found"
@@ -149,11 +330,13 @@ function Uninstall-AutodeskProductsByPSChildName {
             "status" = "unknown"
             "message" = ""
         }
+        Write-AduEvent @{ "event" = "started"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName }
         
         try {
             # Uninstall Autodesk Access
             if ($app.DisplayName -match "Autodesk Access"){
                 Write-Output "Uninstalling $($app.DisplayName)..."
+                Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "special" }
                 Start-Process -FilePath "C:\\Program Files\\Autodesk\\AdODIS\\V1\\Installer.exe" -ArgumentList "-q -i uninstall --trigger_point system -m C:\\ProgramData\\Autodesk\\ODIS\\metadata\\{A3158B3E-5F28-358A-BF1A-9532D8EBC811}\\pkg.access.xml -x `"C:\\Program Files\\Autodesk\\AdODIS\\V1\\SetupRes\\manifest.xsd`" --manifest_type package" -NoNewWindow -Wait
                 $uninstallResult.status = "success"
                 $uninstallResult.message = "Successfully uninstalled"
@@ -161,6 +344,7 @@ function Uninstall-AutodeskProductsByPSChildName {
             # Uninstall Autodesk Identity Manager
             elseif ($app.DisplayName -match "Autodesk Identity Manager"){
                 Write-Output "Uninstalling $($app.DisplayName)..."
+                Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "special" }
                 Start-Process -FilePath "C:\\Program Files\\Autodesk\\AdskIdentityManager\\uninstall.exe" -ArgumentList "--mode unattended" -NoNewWindow -Wait
                 $uninstallResult.status = "success"
                 $uninstallResult.message = "Successfully uninstalled"
@@ -168,16 +352,18 @@ function Uninstall-AutodeskProductsByPSChildName {
             # Uninstall Autodesk Genuine Service
             elseif ($app.DisplayName -match "Autodesk Genuine Service"){
                 Write-Output "Uninstalling $($app.DisplayName)..."
+                Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "special" }
                 Remove-Item "$Env:ALLUSERSPROFILE\\Autodesk\\Adlm\\ProductInformation.pit" -Force -ErrorAction:SilentlyContinue
                 Remove-Item "$Env:userprofile\\AppData\\Local\\Autodesk\\Genuine Autodesk Service\\id.dat" -Force -ErrorAction:SilentlyContinue
                 msiexec.exe /x "{21DE6405-91DE-4A69-A8FB-483847F702C6}" /qn /norestart
-                Start-Sleep -Seconds 3
+                Wait-AduRemoval -PSChildName $app.PSChildName
                 $uninstallResult.status = "success"
                 $uninstallResult.message = "Successfully uninstalled"
             }
             # Uninstall Carbon Insights for Revit
             elseif ($app.DisplayName -like "*Carbon Insights for Revit*"){
                 Write-Output "Uninstalling $($app.DisplayName)..."
+                Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "special" }
                 Start-Process -FilePath "C:\\Program Files\\Autodesk\\AdODIS\\V1\\Installer.exe" -ArgumentList "-q -i uninstall --trigger_point system -m C:\\ProgramData\\Autodesk\\ODIS\\metadata\\{006E0C25-2C15-39A8-8590-AA5AD7D395D4}\\pkg.RTCA.xml -x `"C:\\Program Files\\Autodesk\\AdODIS\\V1\\SetupRes\\manifest.xsd`" --manifest_type package" -NoNewWindow -Wait
                 $uninstallResult.status = "success"
                 $uninstallResult.message = "Successfully uninstalled"
@@ -199,9 +385,10 @@ function Uninstall-AutodeskProductsByPSChildName {
 
                 if ((Test-Path $bundleManifestPath) -and (Test-Path $setupResManifestPath)) {
                     Write-Output "Uninstalling $($app.DisplayName) using ODIS (bundle)..."
+                    Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "odis" }
                     $argumentList = "-q -i uninstall --trigger_point system -m `"$bundleManifestPath`" -x `"$setupResManifestPath`""
                     Start-Process -FilePath $installerPath -ArgumentList $argumentList -NoNewWindow -Wait
-                    Start-Sleep -Seconds 3
+                    Wait-AduRemoval -PSChildName $app.PSChildName
                     $uninstallResult.status = "success"
                     $uninstallResult.message = "Successfully uninstalled using ODIS bundle"
                 } else {
@@ -209,8 +396,9 @@ function Uninstall-AutodeskProductsByPSChildName {
                     # Fall through to MSIEXEC if PSChildName is a GUID
                     if ($app.PSChildName -match '^{([0-9A-Fa-f]{8}-([0-9A-Fa-f]{4}-){3}[0-9A-Fa-f]{12})}$') {
                         Write-Output "Attempting to uninstall $($app.DisplayName) using msiexec (Product Code as fallback)..."
+                        Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "msi" }
                         Start-Process -FilePath msiexec.exe -ArgumentList "/x `"$($app.PSChildName)`" /qn /norestart" -NoNewWindow -Wait
-                        Start-Sleep -Seconds 3
+                        Wait-AduRemoval -PSChildName $app.PSChildName
                         $uninstallResult.status = "success"
                         $uninstallResult.message = "Successfully uninstalled using MSI fallback"
                     } else {
@@ -223,8 +411,9 @@ function Uninstall-AutodeskProductsByPSChildName {
             else {
                 if ($app.PSChildName -match '^{([0-9A-Fa-f]{8}-([0-9A-Fa-f]{4}-){3}[0-9A-Fa-f]{12})}$') {
                     Write-Output "Uninstalling $($app.DisplayName) using msiexec (Product Code)..."
+                    Write-AduEvent @{ "event" = "method"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "method" = "msi" }
                     Start-Process -FilePath msiexec.exe -ArgumentList "/x `"$($app.PSChildName)`" /qn /norestart" -NoNewWindow -Wait
-                    Start-Sleep -Seconds 3
+                    Wait-AduRemoval -PSChildName $app.PSChildName
                     $uninstallResult.status = "success"
                     $uninstallResult.message = "Successfully uninstalled using MSI"
                 } else {
@@ -237,6 +426,9 @@ function Uninstall-AutodeskProductsByPSChildName {
             $uninstallResult.status = "error"
             $uninstallResult.message = "Error: $($_.Exception.Message)"
         }
+        # Check the product's own keys rather than rescanning the hives
+        $uninstallResult.removed = -not (Test-AduUninstallKey -PSChildName $app.PSChildName)
+        Write-AduEvent @{ "event" = "finished"; "psChildName" = $app.PSChildName; "displayName" = $app.DisplayName; "status" = $uninstallResult.status; "message" = $uninstallResult.message; "removed" = $uninstallResult.removed }
         
         $results += $uninstallResult
     }
@@ -244,138 +436,743 @@ function Uninstall-AutodeskProductsByPSChildName {
     return $results | ConvertTo-Json -Depth 3
 }
 
-# Expose a function to delete the Autodesk folder
-function Remove-AutodeskFolder {
-    if (Test-Path 'C:\\Autodesk') {
-        try {
-            Remove-Item -Path 'C:\\Autodesk' -Recurse -Force -ErrorAction Stop
-            return $true
-        } catch {
-            Write-Error "Failed to delete C:\\Autodesk folder: $_"
-            return $false
-        }
-    } else {
-        Write-Output "C:\\Autodesk folder does not exist."
-        return $true # Return true since there's nothing to delete
-    }
-}
-
 # Expose a function to restart the computer
 function Restart-ComputerForced {
     Restart-Computer -Force
 }
 """
-        
-        # Create a temporary file and write the script content
-        fd, script_path = tempfile.mkstemp(suffix='.ps1')
-        with os.fdopen(fd, 'w') as f:
-            f.write(script_content)
-        
-        logger.debug(f"Created temporary PowerShell script at {script_path}")
-        return script_path
-    except Exception as e:
-        logger.error(f"Error creating temporary PowerShell script: {str(e)}")
-        raise Exception(f"Failed to create temporary PowerShell script: {str(e)}")
 
-def uninstall_products(product_ids):
-    """Uninstall selected Autodesk products"""
+# Where the function library is written, named after a hash of its content
+LIBRARY_DIR = (os.environ.get("AUTODESK_UNINSTALLER_SCRIPT_DIR")
+               or os.path.join(tempfile.gettempdir(), "AutodeskUninstaller"))
+LIBRARY_PREFIX = "ps-library-"
+
+# First line of the per-operation temp scripts older releases left behind
+LEGACY_SCRIPT_SIGNATURE = "\nfunction Get-AutodeskProductSelection {"
+
+_library_path = None
+_library_lock = threading.Lock()
+
+def _file_digest(path):
+    """Return the SHA-256 of a file's content, or None if it can't be read"""
     try:
-        # Create temporary script file
-        script_path = create_temp_ps_script()
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def _materialize_library():
+    """Write the function library to its content-addressed path unless a verified copy is there"""
+    content = PS_LIBRARY.encode("utf-8")
+    digest = hashlib.sha256(content).hexdigest()
+    path = os.path.join(LIBRARY_DIR, f"{LIBRARY_PREFIX}{digest[:16]}.ps1")
+    
+    if _file_digest(path) == digest:
+        logger.debug(f"Reusing PowerShell function library at {path}")
+        return path
+    
+    # Write to a temporary name and rename, so no process ever sees half a file
+    os.makedirs(LIBRARY_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=LIBRARY_DIR, prefix=LIBRARY_PREFIX, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    logger.debug(f"Wrote PowerShell function library to {path}")
+    return path
+
+def library_script_path():
+    """Return the path of the PowerShell function library, writing it on first use
+
+    The file is written once per process at most, and is reused across runs
+    when its content hash checks out, so operations do no script I/O.
+    """
+    global _library_path
+    with _library_lock:
+        if _library_path is None:
+            try:
+                _library_path = _materialize_library()
+            except Exception as e:
+                logger.error(f"Error writing PowerShell function library: {str(e)}")
+                raise Exception(f"Failed to write PowerShell function library: {str(e)}")
+        return _library_path
+
+def cleanup_library_scripts():
+    """Delete stale library versions and temp scripts left by older releases; return how many"""
+    try:
+        current = library_script_path()
+    except Exception as e:
+        logger.warning(f"Skipping PowerShell script cleanup: {str(e)}")
+        return 0
+    removed = 0
+    
+    stale = []
+    for entry in os.scandir(LIBRARY_DIR):
+        if not entry.name.startswith(LIBRARY_PREFIX) or entry.path == current:
+            continue
+        # A .tmp file may be another instance's write in progress; only old ones are leftovers
+        if entry.name.endswith(".ps1") or (entry.name.endswith(".tmp")
+                                           and os.path.getmtime(entry.path) < time.time() - 3600):
+            stale.append(entry.path)
+    
+    # Older releases wrote a fresh tmp*.ps1 for every operation and could leak them
+    signature = LEGACY_SCRIPT_SIGNATURE.encode("utf-8")
+    try:
+        entries = list(os.scandir(tempfile.gettempdir()))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if entry.name.startswith("tmp") and entry.name.endswith(".ps1") and entry.is_file():
+            try:
+                with open(entry.path, 'rb') as f:
+                    if f.read(len(signature)) == signature:
+                        stale.append(entry.path)
+            except OSError:
+                pass
+    
+    for path in stale:
+        try:
+            os.unlink(path)
+            removed += 1
+        except OSError as e:
+            # Probably in use by another instance
+            logger.debug(f"Could not delete stale script {path}: {str(e)}")
+    
+    if removed:
+        logger.info(f"Removed {removed} stale PowerShell scripts")
+    return removed
+
+def run_library_command(command, capture_output=True, on_line=None, max_lines=None):
+    """Run a command that needs the function library in its own interpreter
+
+    The cached library script is dot-sourced first.
+    """
+    script_path = library_script_path().replace("'", "''")
+    return run_powershell_command(f". '{script_path}'; {command}", capture_output=capture_output,
+                                  on_line=on_line, max_lines=max_lines)
+
+class PowerShellSession:
+    """PowerShell interpreters dedicated to one uninstall job.
+
+    The function library is loaded into each interpreter once, as it
+    starts, and every command of the job (all uninstall passes, folder
+    deletion and restart) runs there instead of in a fresh process that
+    dot-sources a new temporary script. Parallel uninstall lanes each get
+    their own interpreter, so a session holds up to size of them. close()
+    stops them all. If the pool is disabled or no interpreter can be
+    started, commands fall back to run_library_command.
+    """
+
+    def __init__(self, size=1, argv=None):
+        self.size = size
+        self._pool = None
+        if pool_enabled():
+            self._pool = PowerShellHostPool(argv=argv, size=size, init_command=PS_LIBRARY)
+
+    def run(self, command, capture_output=True, on_line=None, max_lines=None):
+        """Run a library command in the session and return its output"""
+        if self._pool is not None:
+            try:
+                with tracing.span("powershell", category="powershell",
+                                  command=tracing.summarize_command(command)) as span:
+                    output = _run_on_host(self._pool, "session", command, span, on_line, max_lines)
+                return output if capture_output else None
+            except PowerShellHostUnavailable as e:
+                logger.debug(f"PowerShell session unavailable, spawning a process instead: {str(e)}")
         
-        # Format the product IDs as a PowerShell array
-        product_ids_str = ",".join([f'"{id}"' for id in product_ids])
+        return run_library_command(command, capture_output=capture_output, on_line=on_line,
+                                   max_lines=max_lines)
+
+    def close(self):
+        """Stop the session's interpreters"""
+        if self._pool is not None:
+            self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PowerShellBackend:
+    """Execution backend that drives the local Windows machine through PowerShell"""
+
+    name = "powershell"
+
+    def __init__(self, native_discovery=None):
+        if native_discovery is None:
+            native_discovery = os.environ.get("AUTODESK_UNINSTALLER_NATIVE_DISCOVERY", "1") != "0"
+        self.native_discovery = native_discovery
+        # In-process registry access, when winreg is available
+        self.registry = WinRegistry() if native_registry_available() else None
+        # Job-scoped session that library commands run in, while one is open
+        self.session = None
+
+    @contextlib.contextmanager
+    def open_session(self):
+        """Run library commands in one PowerShell session until the block exits"""
+        workers = parallel_workers()
+        session = PowerShellSession(size=workers + 1 if workers else 1)
+        self.session = session
+        try:
+            yield session
+        finally:
+            self.session = None
+            session.close()
+
+    def _run_command(self, command, **options):
+        """Run a plain PowerShell command"""
+        return run_powershell_command(command, **options)
+
+    def _run_library_command(self, command, **options):
+        """Run a library command in the open session, or in a fresh interpreter"""
+        session = self.session
+        if session is not None:
+            return session.run(command, **options)
+        return run_library_command(command, **options)
+
+    def check_admin_rights(self):
+        """Check if the script is running with administrative privileges"""
+        try:
+            return ctypes.windll.shell32.IsUserAnAdmin() != 0
+        except AttributeError:
+            # Not running on Windows
+            return False
+        except Exception as e:
+            logger.error(f"Error checking admin rights: {str(e)}")
+            return False
+
+    def msi_busy(self):
+        """Return True while a Windows Installer transaction holds the _MSIExecute mutex"""
+        try:
+            kernel32 = ctypes.windll.kernel32
+        except AttributeError:
+            # Not running on Windows
+            return False
+        handle = kernel32.OpenMutexW(SYNCHRONIZE, False, "Global\\_MSIExecute")
+        if not handle:
+            return False
+        kernel32.CloseHandle(handle)
+        return True
+
+    def wait_until_idle(self, timeout):
+        """Wait up to timeout seconds for Windows Installer to go idle; return seconds waited"""
+        return wait_until(lambda: not self.msi_busy(), timeout)
+
+    def get_installed_autodesk_products(self):
+        """Get a list of installed Autodesk products"""
+        if self.native_discovery and self.registry is not None:
+            try:
+                return discover_products(self.registry)
+            except Exception as e:
+                logger.warning(f"Native registry discovery failed, falling back to PowerShell: {str(e)}")
+        return self.get_installed_autodesk_products_powershell()
+
+    def get_installed_autodesk_products_powershell(self):
+        """Get a list of installed Autodesk products with a PowerShell registry query"""
+        ps_command = """
+        $allInstalledApps = @()
+        $allInstalledApps = Get-ItemProperty -Path "HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
+        $allInstalledApps += Get-ItemProperty -Path "HKLM:\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\*" -ErrorAction SilentlyContinue
         
-        # Create the PowerShell command to run the uninstallation
-        ps_command = f". {script_path}; "
-        ps_command += f"$productIds = @({product_ids_str}); "
+        # Product rules are applied in Python; only drop keys without a name here
+        $allInstalledApps | Where-Object { $_.DisplayName } | Select-Object DisplayName, Publisher, PSChildName, UninstallString, InstallLocation -Unique | ConvertTo-Json
+        """
         
+        return get_default_matcher().filter_products(parse_product_json(self._run_command(ps_command)))
+
+    def lookup_products(self, product_ids):
+        """Return the products among product_ids that are still installed, reading only their keys"""
+        if self.native_discovery and self.registry is not None:
+            try:
+                return lookup_products(self.registry, product_ids)
+            except Exception as e:
+                logger.warning(f"Native registry lookup failed, falling back to PowerShell: {str(e)}")
+        return self.lookup_products_powershell(product_ids)
+
+    def lookup_products_powershell(self, product_ids):
+        """Read the named uninstall keys in both hives with PowerShell"""
+        if not product_ids:
+            return []
+        product_ids_str = ",".join(["'" + id.replace("'", "''") + "'" for id in product_ids])
+        ps_command = f"""
+        $uninstallKeyPaths = @("HKLM:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall", "HKLM:\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall")
+        $found = foreach ($psChildName in @({product_ids_str})) {{
+            foreach ($uninstallKeyPath in $uninstallKeyPaths) {{
+                Get-ItemProperty -LiteralPath "$uninstallKeyPath\\$psChildName" -ErrorAction SilentlyContinue
+            }}
+        }}
+        $found | Where-Object {{ $_.DisplayName }} | Select-Object DisplayName, Publisher, PSChildName, UninstallString, InstallLocation -Unique | ConvertTo-Json
+        """
+        products = {}
+        for product in parse_product_json(self._run_command(ps_command)):
+            products.setdefault(product['psChildName'], product)
+        return list(products.values())
+
+    def inventory_fingerprint(self):
+        """Return a cheap token that changes when products are added or removed"""
+        return uninstall_keys_fingerprint(self.registry)
+
+    def run_uninstall_pass(self, product_ids, pass_number, on_event=None):
+        """Run one uninstallation pass and return its results
+
+        Progress events are parsed from the output as it streams and passed
+        to on_event; only the tail of the raw output is kept.
+        """
         results = []
+        summary = {}
         
-        # Run 3 passes to handle dependencies
-        for i in range(3):
-            logger.info(f"Running uninstallation pass {i+1} of 3")
-            
-            # Run the uninstallation for this pass
-            pass_command = ps_command + f"Uninstall-AutodeskProductsByPSChildName -TargetPSChildNames $productIds"
-            output = run_powershell_command(pass_command)
-            
-            try:
-                # Parse results if possible
-                pass_results = json.loads(output)
-                if isinstance(pass_results, list):
-                    results.extend(pass_results)
-                elif isinstance(pass_results, dict):
-                    # Single result or status message
-                    results.append(pass_results)
-                
-                logger.debug(f"Pass {i+1} results: {pass_results}")
-            except json.JSONDecodeError:
-                # If we can't parse as JSON, just add the raw output
-                logger.warning(f"Could not parse uninstallation output as JSON: {output}")
+        def handle_line(line):
+            event = parse_event_line(line)
+            if event is None:
+                return
+            event["pass"] = pass_number
+            if event["event"] == "finished":
                 results.append({
-                    "status": "unknown", 
-                    "message": f"Uninstallation pass {i+1} completed with unparseable output",
-                    "rawOutput": output
+                    "displayName": event.get("displayName"),
+                    "status": event.get("status", "unknown"),
+                    "message": event.get("message", ""),
+                    "removed": event.get("removed")
                 })
-            
-            # Wait a bit before next pass
-            if i < 2:  # Don't wait after the last pass
-                time.sleep(5)
+            elif event["event"] == "pass":
+                summary.update(status=event.get("status"), message=event.get("message"))
+            if on_event is not None:
+                on_event(event)
+        
+        # Format the product IDs as a PowerShell array
+        product_ids_str = ",".join([f'"{id}"' for id in product_ids])
+        
+        # Create the PowerShell command to run the uninstallation
+        ps_command = f"$productIds = @({product_ids_str}); "
+        ps_command += f"Uninstall-AutodeskProductsByPSChildName -TargetPSChildNames $productIds"
+        output = self._run_library_command(ps_command, on_line=handle_line, max_lines=RAW_OUTPUT_LINES)
+        
+        if results:
+            return results
+        if summary:
+            return summary
         
-        # Clean up the temporary script file
         try:
-            os.unlink(script_path)
-        except Exception as e:
-            logger.warning(f"Could not delete temporary script file {script_path}: {str(e)}")
+            # Parse results if possible
+            return json.loads(output)
+        except json.JSONDecodeError:
+            # If we can't parse as JSON, just return the tail of the raw output
+            logger.warning(f"Could not parse uninstallation output as JSON: {output}")
+            return {
+                "status": "unknown", 
+                "message": f"Uninstallation pass {pass_number} completed with unparseable output",
+                "rawOutput": output
+            }
+
+    def removal_method(self, product):
+        """Return (method, lane) for a product"""
+        return classify_product(product)
+
+    def uninstall_product(self, product, pass_number, on_event=None):
+        """Uninstall a single product and return its result"""
+        results = self.run_uninstall_pass([product['psChildName']], pass_number, on_event=on_event)
+        if isinstance(results, list):
+            return results[0] if results else {
+                "displayName": product.get('displayName'),
+                "status": "unknown",
+                "message": "Uninstaller reported no result"
+            }
+        return dict(results, displayName=product.get('displayName'))
+
+    def delete_autodesk_folder(self, on_event=None):
+        """Delete the C:\\Autodesk folder in-process, reporting progress as events
+
+        Returns True once the folder is gone. Files held open by another
+        process are left in place and listed in the folder_finished event.
+        """
+        def on_progress(progress):
+            if on_event is not None:
+                on_event(dict(progress, event="folder_progress"))
         
-        return results
+        report = delete_tree(AUTODESK_FOLDER, on_progress=on_progress)
+        if on_event is not None:
+            on_event(dict(report, event="folder_finished"))
+        
+        if report["complete"]:
+            return True
+        logger.warning(f"Failed to delete Autodesk folder: {report['lockedCount']} locked files, "
+                       f"{len(report['errors'])} errors")
+        return False
+
+    def residue_sweeper(self):
+        """Return a sweeper over the local disk and registry"""
+        if self.registry is None:
+            raise Exception("Finding leftovers needs access to the Windows registry")
+        return ResidueSweeper(LocalFilesystem(), self.registry)
+
+    def footprint_roots(self):
+        """Return the local Autodesk folders as (label, path) pairs"""
+        return footprint_roots(LocalFilesystem())
+
+    def footprint_scanner(self):
+        """Return the process-wide scanner of the local disk"""
+        return get_default_scanner()
+
+    def restart_computer(self):
+        """Restart the computer"""
+        # Run the command without capturing output
+        self._run_library_command("Restart-ComputerForced", capture_output=False)
+        
+        # We'll never reach here if the restart is successful
+        return True
+
+BACKEND_ENV_VAR = "AUTODESK_UNINSTALLER_BACKEND"
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name, **options):
+    """Create an execution backend by name ("powershell" or "simulator")"""
+    name = (name or "powershell").strip().lower()
+    if name == "powershell":
+        return PowerShellBackend()
+    if name == "simulator":
+        # Imported lazily so production runs never load the simulator
+        from utils.simulator import SimulatedBackend
+        if options:
+            return SimulatedBackend(**options)
+        return SimulatedBackend.from_environment()
+    raise ValueError(f"Unknown execution backend: {name}")
+
+def get_backend():
+    """Return the active execution backend, selected by environment on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(os.environ.get(BACKEND_ENV_VAR, "powershell"))
+            logger.info(f"Using {_backend.name} execution backend")
+        return _backend
+
+def set_backend(backend, **options):
+    """Select the execution backend by name or instance and return it"""
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend, **options)
+    with _backend_lock:
+        _backend = backend
+    invalidate_inventory()
+    return backend
+
+def _load_inventory():
+    """Run a full product discovery on the active backend and snapshot it"""
+    backend = get_backend()
+    with metrics.DISCOVERY_SECONDS.time(backend=backend.name), tracing.span("discovery", category="inventory"):
+        products = backend.get_installed_autodesk_products()
+    metrics.DISCOVERED_PRODUCTS.set(len(products))
+    _inventory_snapshots.record(products)
+    try:
+        store = history_store(simulated=backend.name != "powershell")
+        if store is not None:
+            store.record(local_host(), products)
     except Exception as e:
-        logger.error(f"Error uninstalling products: {str(e)}")
-        raise Exception(f"Failed to uninstall products: {str(e)}")
+        logger.warning(f"Failed to record inventory history: {str(e)}")
+    return products
+
+def _inventory_fingerprint():
+    """Fingerprint of the active backend's uninstall registry"""
+    return get_backend().inventory_fingerprint()
+
+_inventory_snapshots = InventorySnapshots()
+
+_inventory_cache = InventoryCache(
+    _load_inventory,
+    fingerprint=_inventory_fingerprint,
+    ttl=float(os.environ.get("AUTODESK_UNINSTALLER_INVENTORY_TTL", "300"))
+)
+
+def invalidate_inventory():
+    """Forget the cached product list so the next lookup rescans"""
+    _inventory_cache.invalidate()
+
+def get_inventory_token():
+    """Return the token of the latest inventory snapshot"""
+    return _inventory_snapshots.current_token()
+
+def get_inventory_digest():
+    """Return a content hash of the latest inventory snapshot"""
+    return _inventory_snapshots.current_digest()
+
+def get_inventory_changes(since, force_refresh=False):
+    """Return what changed in the inventory since the snapshot identified by since
+
+    The result has the new token plus added and changed products and the
+    psChildNames of removed ones. If since is unknown (too old, or from a
+    previous run) the full product list is returned with full=True.
+    """
+    try:
+        products = _inventory_cache.get(force_refresh=force_refresh)
+    except Exception as e:
+        logger.error(f"Error getting installed Autodesk products: {str(e)}")
+        raise Exception(f"Failed to retrieve installed Autodesk products: {str(e)}")
+
+    delta = _inventory_snapshots.delta(since)
+    if delta is None:
+        return {'full': True, 'token': get_inventory_token(), 'products': products}
+
+    token, added, removed, changed = delta
+    return {'full': False, 'token': token, 'added': added, 'removed': removed, 'changed': changed}
+
+def job_session():
+    """Return a context manager that runs a job's commands in one PowerShell session"""
+    return get_backend().open_session()
+
+def check_admin_rights():
+    """Check if the script is running with administrative privileges"""
+    return get_backend().check_admin_rights()
+
+def get_installed_autodesk_products(force_refresh=False):
+    """Get a list of installed Autodesk products
+
+    Results are cached until the Uninstall keys change or the cache TTL
+    expires; force_refresh=True always rescans.
+    """
+    metrics.INVENTORY_REQUESTS.inc()
+    try:
+        return _inventory_cache.get(force_refresh=force_refresh)
+    except Exception as e:
+        logger.error(f"Error getting installed Autodesk products: {str(e)}")
+        raise Exception(f"Failed to retrieve installed Autodesk products: {str(e)}")
+
+def _lookup_installed(backend, product_ids):
+    """Read just the given products' uninstall keys; return the installed ones keyed by psChildName"""
+    return {product['psChildName']: product for product in backend.lookup_products(product_ids)}
 
-def delete_autodesk_folder():
-    """Delete the C:\Autodesk folder"""
+def _uninstall_one(backend, tracker, product, method, pass_number, on_event=None):
+    """Uninstall one product, keeping its state record up to date"""
+    tracker.start(product, method)
+    result = None
+    started = time.perf_counter()
+    with tracing.span(product['displayName'], category="product", psChildName=product['psChildName'],
+                      method=method, attempt=pass_number) as span:
+        try:
+            result = backend.uninstall_product(product, pass_number, on_event=on_event)
+        except Exception as e:
+            logger.error(f"Error uninstalling {product['displayName']}: {str(e)}")
+            result = {"status": "error", "message": f"Error: {str(e)}"}
+        finally:
+            tracker.finish(product['psChildName'], result)
+            status = result.get("status", "unknown") if isinstance(result, dict) else "unknown"
+            metrics.UNINSTALL_SECONDS.observe(time.perf_counter() - started, method=method or "none", status=status)
+            span.annotate(status=status)
+    return result
+
+def _run_uninstall_pass(backend, scheduler, tracker, targets, pass_number, on_event=None):
+    """Uninstall the target products in lanes"""
+    tasks = []
+    for product in targets:
+        method, lane = backend.removal_method(product)
+        logger.debug(f"{product['displayName']}: {method or 'no'} removal method, {lane} lane")
+        tasks.append((lane, tracing.bind(functools.partial(_uninstall_one, backend, tracker, product, method,
+                                                           pass_number, on_event=on_event))))
+    scheduler.run(tasks)
+
+def uninstall_products(product_ids, on_event=None, backend=None):
+    """Uninstall selected Autodesk products and return one state record per product
+
+    Passes repeat until every selected product is gone, a pass removes
+    nothing, or MAX_PASSES is reached. Each pass removes the products that
+    are still installed, with MSI removals serialized on one lane and the
+    rest running in parallel. Waits poll for the removal to settle instead
+    of sleeping a fixed time; the time this saved is logged and reported in
+    a final "converged" event.
+
+    Each record moves from pending to running and ends up removed, failed
+    or skipped, with the removal method, attempts and time spent.
+
+    on_event, if given, receives a dict for every progress event: pass
+    boundaries, each product's started, method, waited and finished events,
+    and a "product" event with the record whenever it changes.
+    
+    backend defaults to the active one; the fleet orchestrator passes the
+    backend of a remote host.
+    """
     try:
-        # Create temporary script file
-        script_path = create_temp_ps_script()
+        backend = backend or get_backend()
+        scheduler = UninstallScheduler()
+        waits = {"waited": 0.0, "saved": 0.0}
+        waits_lock = threading.Lock()
         
-        # Create the PowerShell command
-        ps_command = f". {script_path}; Remove-AutodeskFolder"
+        def publish_record(record):
+            if on_event is not None:
+                on_event({"event": "product", **record})
         
-        # Run the command
-        output = run_powershell_command(ps_command)
+        tracker = UninstallResults(product_ids, on_change=publish_record)
         
-        # Clean up the temporary script file
-        try:
-            os.unlink(script_path)
-        except Exception as e:
-            logger.warning(f"Could not delete temporary script file {script_path}: {str(e)}")
+        def handle_event(event):
+            if event.get("event") == "waited":
+                with waits_lock:
+                    waits["waited"] += event.get("waitedMs", 0) / 1000.0
+                    waits["saved"] += event.get("savedMs", 0) / 1000.0
+                metrics.WAIT_SECONDS.inc(event.get("waitedMs", 0) / 1000.0, phase="uninstall")
+                metrics.WAIT_SAVED_SECONDS.inc(event.get("savedMs", 0) / 1000.0, phase="uninstall")
+            tracker.handle_event(event)
+            if on_event is not None:
+                on_event(event)
         
-        # Parse the result
-        if output.strip().lower() == "true":
-            return True
-        else:
-            logger.warning(f"Failed to delete Autodesk folder: {output}")
-            return False
+        # Only products that are installed and selected by the product rules
+        # are ever handed to the uninstaller
+        with tracing.span("lookup", category="inventory", products=len(product_ids)):
+            installed = {product['psChildName']: product for product in get_default_matcher().filter_products(
+                backend.lookup_products(list(dict.fromkeys(product_ids))))}
+        skipped = [id for id in product_ids if id not in installed]
+        if skipped:
+            logger.warning(f"Skipping {len(skipped)} products that are not installed or not matched "
+                           f"by the product rules: {', '.join(skipped)}")
+            for id in skipped:
+                tracker.skip(id, "Not installed or not matched by the product rules")
+        remaining = [id for id in dict.fromkeys(product_ids) if id in installed]
+        
+        pass_number = 0
+        while remaining and pass_number < MAX_PASSES:
+            pass_number += 1
+            logger.info(f"Running uninstallation pass {pass_number} for {len(remaining)} products")
+            if on_event is not None:
+                on_event({"event": "pass_started", "pass": pass_number, "of": MAX_PASSES,
+                          "remaining": len(remaining)})
+            
+            with tracing.span(f"pass {pass_number}", category="pass", remaining=len(remaining)):
+                # Run the uninstallation for this pass
+                pass_started = time.perf_counter()
+                targets = [installed[id] for id in remaining]
+                _run_uninstall_pass(backend, scheduler, tracker, targets, pass_number, on_event=handle_event)
+                
+                # Let Windows Installer finish before checking what is left
+                with tracing.span("settle", category="wait"):
+                    waited = backend.wait_until_idle(PASS_SETTLE_TIMEOUT)
+                waits["waited"] += waited
+                waits["saved"] += PASS_SETTLE_TIMEOUT - waited
+                metrics.WAIT_SECONDS.inc(waited, phase="pass_settle")
+                metrics.WAIT_SAVED_SECONDS.inc(PASS_SETTLE_TIMEOUT - waited, phase="pass_settle")
+                metrics.PASS_SECONDS.observe(time.perf_counter() - pass_started)
+                
+                with tracing.span("verify", category="inventory"):
+                    installed = _lookup_installed(backend, remaining)
+                tracker.verify(installed)
+            still_installed = [id for id in remaining if id in installed]
+            if len(still_installed) == len(remaining):
+                logger.info(f"Pass {pass_number} removed nothing, stopping")
+                break
+            remaining = still_installed
+        
+        tracker.close(pass_number)
+        
+        if pass_number:
+            logger.info(f"Uninstallation finished after {pass_number} passes with {len(remaining)} products left; "
+                        f"waited {waits['waited']:.1f}s, saved {waits['saved']:.1f}s of fixed sleeps")
+            if on_event is not None:
+                on_event({
+                    "event": "converged",
+                    "passes": pass_number,
+                    "remaining": remaining,
+                    "waitedSeconds": round(waits["waited"], 1),
+                    "waitSavedSeconds": round(waits["saved"], 1)
+                })
+        
+        return tracker.records()
+    except Exception as e:
+        logger.error(f"Error uninstalling products: {str(e)}")
+        raise Exception(f"Failed to uninstall products: {str(e)}")
+    finally:
+        # Whatever happened, the installed products have likely changed
+        invalidate_inventory()
+
+def plan_uninstall(product_ids):
+    """Return what uninstall_products would do with each product, without changing anything
+
+    Every id gets a record with action "uninstall" (plus the removal method
+    and scheduling lane) or "skip" with the reason.
+    """
+    try:
+        backend = get_backend()
+        installed = {product['psChildName']: product for product in
+                     get_default_matcher().filter_products(backend.lookup_products(list(dict.fromkeys(product_ids))))}
+        plan = []
+        for id in dict.fromkeys(product_ids):
+            product = installed.get(id)
+            if product is None:
+                plan.append({"psChildName": id, "displayName": None, "action": "skip",
+                             "reason": "Not installed or not matched by the product rules"})
+                continue
+            method, lane = backend.removal_method(product)
+            plan.append({"psChildName": id, "displayName": product['displayName'], "action": "uninstall",
+                         "method": method, "lane": lane})
+        return plan
+    except Exception as e:
+        logger.error(f"Error planning uninstallation: {str(e)}")
+        raise Exception(f"Failed to plan uninstallation: {str(e)}")
+
+def delete_autodesk_folder(on_event=None):
+    """Delete the C:\\Autodesk folder, passing progress events to on_event"""
+    def record(event):
+        if event.get("event") == "folder_finished":
+            metrics.FOLDER_DELETE_FILES.inc(event.get("filesRemoved", 0))
+            metrics.FOLDER_DELETE_BYTES.inc(event.get("bytesRemoved", 0))
+            metrics.FOLDER_LOCKED_FILES.inc(event.get("lockedCount", 0))
+        if on_event is not None:
+            on_event(event)
+    
+    try:
+        with metrics.FOLDER_DELETE_SECONDS.time(), tracing.span("delete folder", category="folder"):
+            return get_backend().delete_autodesk_folder(on_event=record)
     except Exception as e:
         logger.error(f"Error deleting Autodesk folder: {str(e)}")
         return False
 
+def find_residue(candidate_ids=()):
+    """Return the orphaned files, folders and registry keys Autodesk products left behind"""
+    try:
+        return get_backend().residue_sweeper().scan(candidate_ids)
+    except Exception as e:
+        logger.error(f"Error finding leftovers: {str(e)}")
+        raise Exception(f"Failed to find leftovers: {str(e)}")
+
+def measure_footprint(refresh=False):
+    """Return the disk space used by the Autodesk folders of the active backend's machine"""
+    try:
+        backend = get_backend()
+        scanner = backend.footprint_scanner()
+        if refresh:
+            scanner.clear()
+        return scan_footprint(backend.footprint_roots(), scanner)
+    except Exception as e:
+        logger.error(f"Error measuring Autodesk folders: {str(e)}")
+        raise Exception(f"Failed to measure Autodesk folders: {str(e)}")
+
+def measure_product_footprints(products):
+    """Return {psChildName: footprint or None} for products on the active backend's machine"""
+    try:
+        return product_footprints(products, get_backend().footprint_scanner())
+    except Exception as e:
+        logger.error(f"Error measuring install locations: {str(e)}")
+        raise Exception(f"Failed to measure install locations: {str(e)}")
+
+def clean_residue(item_ids=None, candidate_ids=()):
+    """Remove orphaned leftovers, all of them or those with the given ids"""
+    try:
+        return get_backend().residue_sweeper().clean(item_ids, candidate_ids)
+    except Exception as e:
+        logger.error(f"Error removing leftovers: {str(e)}")
+        raise Exception(f"Failed to remove leftovers: {str(e)}")
+    finally:
+        # Removing uninstall keys changes the registry fingerprint
+        invalidate_inventory()
+
 def restart_computer():
     """Restart the computer"""
     try:
-        # Create temporary script file
-        script_path = create_temp_ps_script()
-        
-        # Create the PowerShell command
-        ps_command = f". {script_path}; Restart-ComputerForced"
-        
-        # Run the command without capturing output
-        run_powershell_command(ps_command, capture_output=False)
-        
-        # We'll never reach here if the restart is successful
-        return True
+        return get_backend().restart_computer()
     except Exception as e:
         logger.error(f"Error restarting computer: {str(e)}")
         return False
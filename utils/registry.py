@@ -0,0 +1,129 @@
+import threading
+
+# Uninstall keys under HKEY_LOCAL_MACHINE: 64-bit view first, then WOW6432Node
+UNINSTALL_KEY_PATHS = (
+    "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall",
+    "SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall",
+)
+
+def native_registry_available():
+    """Return True if winreg can be used on this machine"""
+    try:
+        import winreg  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class WinRegistry:
+    """Access to HKEY_LOCAL_MACHINE through winreg; keys are only ever deleted, never written"""
+
+    def __init__(self):
+        import winreg
+        self._winreg = winreg
+        # Always read the 64-bit view; WOW6432Node is addressed explicitly
+        self._access = winreg.KEY_READ | winreg.KEY_WOW64_64KEY
+
+    def _open(self, path):
+        """Open a key under HKLM"""
+        return self._winreg.OpenKey(self._winreg.HKEY_LOCAL_MACHINE, path, 0, self._access)
+
+    def subkeys(self, path):
+        """Return the names of the subkeys of path (empty if it doesn't exist)"""
+        try:
+            key = self._open(path)
+        except OSError:
+            return []
+        with key:
+            count = self._winreg.QueryInfoKey(key)[0]
+            names = []
+            for index in range(count):
+                try:
+                    names.append(self._winreg.EnumKey(key, index))
+                except OSError:
+                    # Key was removed while we were enumerating
+                    break
+            return names
+
+    def values(self, path, name, value_names):
+        """Return the requested values of subkey name, or None if it doesn't exist"""
+        try:
+            key = self._open(f"{path}\\{name}")
+        except OSError:
+            return None
+        with key:
+            found = {}
+            for value_name in value_names:
+                try:
+                    found[value_name] = self._winreg.QueryValueEx(key, value_name)[0]
+                except OSError:
+                    pass
+            return found
+
+    def last_write(self, path):
+        """Return the last-write timestamp of path, or None if it doesn't exist"""
+        try:
+            key = self._open(path)
+        except OSError:
+            return None
+        with key:
+            return self._winreg.QueryInfoKey(key)[2]
+
+    def delete_key(self, path, name):
+        """Remove subkey name, which must have no subkeys; return True if it existed"""
+        try:
+            self._winreg.DeleteKeyEx(self._winreg.HKEY_LOCAL_MACHINE, f"{path}\\{name}",
+                                     self._winreg.KEY_WOW64_64KEY, 0)
+        except FileNotFoundError:
+            return False
+        return True
+
+class InMemoryRegistry:
+    """Dict-backed stand-in for WinRegistry, used by tests and the simulator"""
+
+    def __init__(self, keys=None):
+        self._keys = {}
+        self._stamps = {}
+        self._lock = threading.Lock()
+        for path, subkeys in (keys or {}).items():
+            for name, values in subkeys.items():
+                self.set_key(path, name, values)
+
+    def subkeys(self, path):
+        """Return the names of the subkeys of path"""
+        with self._lock:
+            return list(self._keys.get(path, ()))
+
+    def values(self, path, name, value_names):
+        """Return the requested values of subkey name, or None if it doesn't exist"""
+        with self._lock:
+            entry = self._keys.get(path, {}).get(name)
+            if entry is None:
+                return None
+            return {value_name: entry[value_name] for value_name in value_names if value_name in entry}
+
+    def last_write(self, path):
+        """Return a counter that increases whenever a subkey of path is added or removed"""
+        with self._lock:
+            return self._stamps.get(path)
+
+    def get_key(self, path, name):
+        """Return a copy of every value of subkey name, or None"""
+        with self._lock:
+            entry = self._keys.get(path, {}).get(name)
+            return dict(entry) if entry is not None else None
+
+    def set_key(self, path, name, values):
+        """Create or replace subkey name"""
+        with self._lock:
+            subkeys = self._keys.setdefault(path, {})
+            if name not in subkeys:
+                self._stamps[path] = self._stamps.get(path, 0) + 1
+            subkeys[name] = dict(values)
+
+    def delete_key(self, path, name):
+        """Remove subkey name; return True if it existed"""
+        with self._lock:
+            if self._keys.get(path, {}).pop(name, None) is None:
+                return False
+            self._stamps[path] = self._stamps.get(path, 0) + 1
+            return True
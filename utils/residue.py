@@ -0,0 +1,217 @@
+import concurrent.futures
+import logging
+import ntpath
+import time
+
+from utils.matching import get_default_matcher
+from utils.registry import UNINSTALL_KEY_PATHS
+from utils.scheduler import ODIS_METADATA
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Licensing data shared by every Autodesk product
+ADLM_FOLDERS = (
+    "C:\\ProgramData\\Autodesk\\Adlm",
+    "C:\\Program Files (x86)\\Common Files\\Autodesk Shared\\AdLM",
+)
+
+# Left behind when Autodesk Identity Manager is removed
+IDENTITY_MANAGER_FOLDERS = (
+    "C:\\Program Files\\Autodesk\\AdskIdentityManager",
+    "C:\\ProgramData\\Autodesk\\AdskIdentityManager",
+)
+
+# ODIS metadata folders named after something other than their product's
+# uninstall key, with the product that owns them (as in the uninstall script)
+KNOWN_ODIS_METADATA = {
+    "{a3158b3e-5f28-358a-bf1a-9532d8ebc811}": "Autodesk Access",
+    "{006e0c25-2c15-39a8-8590-aa5ad7d395d4}": "Carbon Insights for Revit",
+}
+
+# Uninstall key values read to decide what is still installed
+RESIDUE_VALUES = ("DisplayName", "Publisher", "UninstallString", "InstallLocation")
+
+# Kinds of residue
+ODIS_METADATA_KIND = "odis_metadata"
+ADLM_KIND = "adlm"
+IDENTITY_MANAGER_KIND = "identity_manager"
+UNINSTALL_KEY_KIND = "uninstall_key"
+
+def residue_item(kind, path, reason, hive=None, name=None):
+    """Build one residue record; its id is what /residue/clean is given back"""
+    item = {"id": f"{kind}:{path}", "kind": kind, "path": path, "reason": reason, "files": 0, "bytes": 0}
+    if hive is not None:
+        item["hive"] = hive
+        item["name"] = name
+    return item
+
+class ResidueSweeper:
+    """Finds what Autodesk uninstallers leave behind and removes it on request.
+
+    Known leftover locations (ODIS metadata folders, Adlm licensing data,
+    AdskIdentityManager folders and Uninstall keys without a DisplayName)
+    are checked concurrently against the uninstall keys still present, and
+    only entries no remaining product refers to are reported. filesystem is
+    a LocalFilesystem or InMemoryFilesystem; registry a WinRegistry or
+    InMemoryRegistry.
+    """
+
+    def __init__(self, filesystem, registry, matcher=None, workers=4):
+        self.filesystem = filesystem
+        self.registry = registry
+        self.matcher = matcher or get_default_matcher()
+        self.workers = max(1, workers)
+
+    def _installed(self):
+        """Return {(hive, name): values} for every uninstall key"""
+        installed = {}
+        for hive in UNINSTALL_KEY_PATHS:
+            for name in self.registry.subkeys(hive):
+                values = self.registry.values(hive, name, RESIDUE_VALUES)
+                if values is not None:
+                    installed[(hive, name)] = values
+        return installed
+
+    def _autodesk_installed(self, installed):
+        """Return the display names of the Autodesk products still installed"""
+        return [str(values["DisplayName"]) for (_, name), values in installed.items()
+                if values.get("DisplayName")
+                and self.matcher.matches(str(values["DisplayName"]), str(values.get("Publisher") or ""), name)]
+
+    def _odis_metadata(self, installed, autodesk):
+        """ODIS metadata folders whose product is no longer installed
+
+        A folder is still in use when it is named after a remaining uninstall
+        key, when a remaining product's UninstallString or InstallLocation
+        refers to it, or when it is a known folder of a product still installed.
+        """
+        products = [(name, values) for (_, name), values in installed.items() if values.get("DisplayName")]
+        names = {name.lower() for name, _ in products}
+        references = "\n".join(str(values.get(value) or "") for _, values in products
+                               for value in ("UninstallString", "InstallLocation")).lower()
+        owners = [product.lower() for product in autodesk]
+
+        def in_use(folder):
+            folder = folder.lower()
+            if folder in names or folder in references:
+                return True
+            owner = KNOWN_ODIS_METADATA.get(folder)
+            return owner is not None and any(owner.lower() in product for product in owners)
+
+        return [residue_item(ODIS_METADATA_KIND, ntpath.join(ODIS_METADATA, name),
+                             f"No uninstall entry {name} remains")
+                for name, is_dir in self.filesystem.listdir(ODIS_METADATA)
+                if is_dir and not in_use(name)]
+
+    def _adlm(self, installed, autodesk):
+        """Licensing data, once no Autodesk product is left to use it"""
+        if autodesk:
+            return []
+        return [residue_item(ADLM_KIND, ntpath.join(folder, name), "No Autodesk products remain installed")
+                for folder in ADLM_FOLDERS for name, _ in self.filesystem.listdir(folder)]
+
+    def _identity_manager(self, installed, autodesk):
+        """AdskIdentityManager folders, once Identity Manager is uninstalled"""
+        if any("identity manager" in name.lower() for name in autodesk):
+            return []
+        return [residue_item(IDENTITY_MANAGER_KIND, folder, "Autodesk Identity Manager is not installed")
+                for folder in IDENTITY_MANAGER_FOLDERS if self.filesystem.exists(folder)]
+
+    def _uninstall_keys(self, installed, autodesk, candidate_ids=()):
+        """Uninstall keys with no DisplayName that belonged to Autodesk products
+
+        A key qualifies when its remaining values mention Autodesk, or when
+        it has no values at all and was an Autodesk product key: one with
+        ODIS metadata or one of candidate_ids.
+        """
+        candidates = {name.lower() for name in candidate_ids}
+        candidates.update(name.lower() for name, is_dir in self.filesystem.listdir(ODIS_METADATA) if is_dir)
+        items = []
+        for (hive, name), values in installed.items():
+            if values.get("DisplayName"):
+                continue
+            if any("autodesk" in str(value).lower() for value in values.values()):
+                reason = "Uninstall key has no DisplayName but still points at Autodesk files"
+            elif not any(values.values()) and name.lower() in candidates:
+                reason = "Empty uninstall key left by an Autodesk product"
+            else:
+                continue
+            items.append(residue_item(UNINSTALL_KEY_KIND, f"HKLM\\{hive}\\{name}", reason, hive=hive, name=name))
+        return items
+
+    def _measure(self, item):
+        """Fill in the files and bytes an item takes up"""
+        if item["kind"] != UNINSTALL_KEY_KIND:
+            item["files"], item["bytes"] = self.filesystem.measure(item["path"])
+        return item
+
+    def scan(self, candidate_ids=()):
+        """Return every orphaned leftover with its size, and the totals"""
+        start = time.monotonic()
+        installed = self._installed()
+        autodesk = self._autodesk_installed(installed)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="residue") as executor:
+            rules = [executor.submit(rule, installed, autodesk)
+                     for rule in (self._odis_metadata, self._adlm, self._identity_manager)]
+            rules.append(executor.submit(self._uninstall_keys, installed, autodesk, candidate_ids))
+            items = [item for rule in rules for item in rule.result()]
+            items = list(executor.map(self._measure, items))
+
+        logger.info(f"Found {len(items)} orphaned Autodesk leftovers")
+        return {
+            "items": items,
+            "totalFiles": sum(item["files"] for item in items),
+            "totalBytes": sum(item["bytes"] for item in items),
+            "seconds": round(time.monotonic() - start, 3)
+        }
+
+    def _remove(self, item):
+        """Delete one leftover; return True once it is gone"""
+        if item["kind"] == UNINSTALL_KEY_KIND:
+            return self.registry.delete_key(item["hive"], item["name"])
+        return self.filesystem.delete(item["path"])
+
+    def clean(self, item_ids=None, candidate_ids=()):
+        """Delete orphaned leftovers in bulk
+
+        The leftovers are found again first and only those still orphaned
+        are removed, so a stale or hand-written id can never delete
+        anything else. Without item_ids everything found is removed.
+        """
+        start = time.monotonic()
+        items = self.scan(candidate_ids)["items"]
+        if item_ids is not None:
+            wanted = set(item_ids)
+            items = [item for item in items if item["id"] in wanted]
+
+        removed = []
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="residue") as executor:
+            outcomes = executor.map(self._safe_remove, items)
+            for item, error in zip(items, outcomes):
+                if error is None:
+                    removed.append(item)
+                else:
+                    failed.append({"id": item["id"], "path": item["path"], "error": error})
+
+        logger.info(f"Removed {len(removed)} Autodesk leftovers, {len(failed)} failed")
+        return {
+            "removed": [item["id"] for item in removed],
+            "failed": failed,
+            "freedBytes": sum(item["bytes"] for item in removed),
+            "seconds": round(time.monotonic() - start, 3)
+        }
+
+    def _safe_remove(self, item):
+        """Remove an item, returning None on success or an error message"""
+        try:
+            if self._remove(item):
+                return None
+            return "Could not be removed completely"
+        except Exception as e:
+            logger.warning(f"Failed to remove {item['path']}: {str(e)}")
+            return str(e)
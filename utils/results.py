@@ -0,0 +1,133 @@
+import collections
+import threading
+import logging
+import time
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Product states. pending and running can repeat across passes; removed,
+# failed and skipped are final once the run is over.
+PENDING = "pending"
+RUNNING = "running"
+REMOVED = "removed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+FINAL_STATES = (REMOVED, FAILED, SKIPPED)
+
+class UninstallResults:
+    """One compact state record per selected product, updated in place by every pass.
+
+    Records carry the removal method, the number of attempts, the time
+    spent removing and the latest message, so a run's result is the same
+    size however many passes it took. on_change, if given, receives a copy
+    of a record whenever it changes.
+    """
+
+    def __init__(self, product_ids, on_change=None):
+        self.on_change = on_change
+        self._records = collections.OrderedDict()
+        self._started = {}
+        self._last_status = {}
+        self._lock = threading.Lock()
+        for product_id in product_ids:
+            self._records.setdefault(product_id, {
+                "psChildName": product_id,
+                "displayName": None,
+                "state": PENDING,
+                "method": None,
+                "attempts": 0,
+                "message": "",
+                "startedAt": None,
+                "finishedAt": None,
+                "durationSeconds": 0.0
+            })
+
+    def _update(self, product_id, **fields):
+        """Change a record and report the change"""
+        with self._lock:
+            record = self._records.get(product_id)
+            if record is None:
+                return
+            record.update(fields)
+            snapshot = dict(record)
+        if self.on_change is not None:
+            self.on_change(snapshot)
+
+    def skip(self, product_id, message):
+        """Mark a product that will not be attempted"""
+        self._update(product_id, state=SKIPPED, message=message)
+
+    def start(self, product, method=None):
+        """Mark a product as being removed"""
+        product_id = product['psChildName']
+        with self._lock:
+            record = self._records.get(product_id)
+            if record is None:
+                return
+            now = time.time()
+            self._started[product_id] = time.monotonic()
+            attempts = record["attempts"] + 1
+            started_at = record["startedAt"] or now
+        self._update(product_id, state=RUNNING, displayName=product.get('displayName'),
+                     method=method, attempts=attempts, startedAt=started_at)
+
+    def handle_event(self, event):
+        """Pick up the method the uninstaller actually used"""
+        if event.get("event") == "method":
+            self._update(event.get("psChildName"), method=event.get("method"))
+
+    def finish(self, product_id, result):
+        """Record the outcome an uninstaller reported for one attempt
+
+        A product the uninstaller confirmed gone is removed straight away;
+        otherwise it stays running until verify() checks whether it is gone.
+        """
+        result = result if isinstance(result, dict) else {}
+        with self._lock:
+            record = self._records.get(product_id)
+            if record is None:
+                return
+            self._last_status[product_id] = result.get("status", "unknown")
+            duration = record["durationSeconds"]
+            started = self._started.pop(product_id, None)
+            if started is not None:
+                duration += time.monotonic() - started
+        fields = {"message": result.get("message", ""), "durationSeconds": round(duration, 3),
+                  "finishedAt": time.time()}
+        if result.get("removed") is True:
+            fields["state"] = REMOVED
+        self._update(product_id, **fields)
+
+    def verify(self, installed_ids):
+        """Settle attempted products against what is still installed
+
+        Products that are gone are removed. Products still installed go
+        back to pending, since the next pass tries them again; if the
+        uninstaller reported an error, its message is kept for close().
+        """
+        with self._lock:
+            attempted = [product_id for product_id, record in self._records.items() if record["state"] == RUNNING]
+        for product_id in attempted:
+            if product_id not in installed_ids:
+                self._update(product_id, state=REMOVED)
+            else:
+                self._update(product_id, state=PENDING)
+
+    def close(self, passes):
+        """Fail whatever is still pending or running once no more passes will run
+
+        A product whose last attempt failed keeps the uninstaller's error.
+        """
+        with self._lock:
+            unfinished = [(product_id, self._last_status.get(product_id) == "error" and record["message"])
+                          for product_id, record in self._records.items() if record["state"] in (PENDING, RUNNING)]
+        for product_id, error in unfinished:
+            self._update(product_id, state=FAILED,
+                         message=error or f"Still installed after {passes} uninstallation passes")
+
+    def records(self):
+        """Return every record, in selection order"""
+        with self._lock:
+            return [dict(record) for record in self._records.values()]
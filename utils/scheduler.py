@@ -0,0 +1,118 @@
+import concurrent.futures
+import threading
+import logging
+import time
+import re
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ODIS_METADATA = "C:\\ProgramData\\Autodesk\\ODIS\\metadata"
+
+GUID_PATTERN = re.compile(r"^\{[0-9A-Fa-f]{8}-([0-9A-Fa-f]{4}-){3}[0-9A-Fa-f]{12}\}$")
+
+# Lanes: only one Windows Installer transaction can run at a time, so
+# everything that ends up in msiexec shares a single lane; the rest can overlap.
+MSI_LANE = "msi"
+PARALLEL_LANE = "parallel"
+
+def classify_product(product, path_exists=os.path.exists):
+    """Return (method, lane) for a product, mirroring Uninstall-AutodeskProductsByPSChildName
+
+    method is "special", "odis", "msi", or None when no removal method applies.
+    """
+    # The script's -match and -like tests ignore case, and run in this order
+    display_name = (product.get('displayName') or '').lower()
+    uninstall_string = (product.get('uninstallString') or '').lower()
+    key = product.get('psChildName') or ''
+
+    if "autodesk access" in display_name or "autodesk identity manager" in display_name:
+        return "special", PARALLEL_LANE
+    if "autodesk genuine service" in display_name:
+        # Removed with msiexec /x
+        return "special", MSI_LANE
+    if "carbon insights for revit" in display_name:
+        return "special", PARALLEL_LANE
+
+    if "installer.exe" in uninstall_string:
+        metadata = f"{ODIS_METADATA}\\{key}"
+        if path_exists(f"{metadata}\\bundleManifest.xml") and path_exists(f"{metadata}\\SetupRes\\manifest.xsd"):
+            return "odis", PARALLEL_LANE
+        # The script falls back to msiexec when the bundle manifest is missing
+        return ("msi", MSI_LANE) if GUID_PATTERN.match(key) else (None, PARALLEL_LANE)
+
+    if GUID_PATTERN.match(key):
+        return "msi", MSI_LANE
+    return None, PARALLEL_LANE
+
+def wait_until(condition, timeout, interval=0.25):
+    """Poll condition until it is true or timeout seconds pass; return seconds waited"""
+    start = time.monotonic()
+    while not condition():
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            return timeout
+        time.sleep(min(interval, timeout - elapsed))
+    return min(time.monotonic() - start, timeout)
+
+def parallel_workers():
+    """Number of concurrent non-MSI removals, from the environment"""
+    return max(0, int(os.environ.get("AUTODESK_UNINSTALLER_PARALLEL_UNINSTALLS", "2")))
+
+class UninstallScheduler:
+    """Runs removals in lanes: MSI work one at a time, the rest on a bounded pool.
+
+    The MSI lane runs alongside the parallel pool, so a suite's ODIS products
+    and its MSI components are removed at the same time. With workers=0
+    everything runs one after another on the calling thread.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = parallel_workers() if workers is None else workers
+
+    def run(self, tasks):
+        """Run (lane, function) tasks and return their results in task order"""
+        results = [None] * len(tasks)
+
+        if self.workers <= 0:
+            for index, (lane, function) in enumerate(tasks):
+                results[index] = function()
+            return results
+
+        msi_tasks = [(index, function) for index, (lane, function) in enumerate(tasks) if lane == MSI_LANE]
+        other_tasks = [(index, function) for index, (lane, function) in enumerate(tasks) if lane != MSI_LANE]
+        logger.debug(f"Scheduling {len(msi_tasks)} MSI and {len(other_tasks)} parallel removals "
+                     f"with {self.workers} workers")
+
+        errors = []
+
+        def run_msi_lane():
+            """Work through the MSI removals strictly in order"""
+            for index, function in msi_tasks:
+                try:
+                    results[index] = function()
+                except Exception as e:
+                    errors.append(e)
+
+        msi_thread = None
+        if msi_tasks:
+            msi_thread = threading.Thread(target=run_msi_lane, name="uninstall-msi-lane", daemon=True)
+            msi_thread.start()
+
+        if other_tasks:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                       thread_name_prefix="uninstall-lane") as executor:
+                futures = {executor.submit(function): index for index, function in other_tasks}
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        errors.append(e)
+
+        if msi_thread is not None:
+            msi_thread.join()
+
+        if errors:
+            raise errors[0]
+        return results
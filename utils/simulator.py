@@ -0,0 +1,477 @@
+import contextlib
+import threading
+import logging
+import random
+import time
+import uuid
+import os
+
+from utils.discovery import discover_products, lookup_products
+from utils.filesystem import InMemoryFilesystem
+from utils.footprint import FilesystemScanner, footprint_roots
+from utils.inventory import uninstall_keys_fingerprint
+from utils.registry import UNINSTALL_KEY_PATHS, InMemoryRegistry
+from utils.residue import ADLM_FOLDERS, IDENTITY_MANAGER_FOLDERS, ResidueSweeper
+from utils.scheduler import MSI_LANE, classify_product, wait_until
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+HIVE_64, HIVE_32 = UNINSTALL_KEY_PATHS
+
+ODIS_INSTALLER = "C:\\Program Files\\Autodesk\\AdODIS\\V1\\Installer.exe"
+ODIS_METADATA = "C:\\ProgramData\\Autodesk\\ODIS\\metadata"
+
+# Milliseconds Wait-AduRemoval waits at most after an ODIS or MSI removal
+SETTLE_TIMEOUT_MS = 3000
+
+# Seconds a real removal of each kind typically takes (mean, jitter)
+DEFAULT_LATENCIES = {
+    "odis": (45.0, 15.0),
+    "msi": (12.0, 4.0),
+    "special": (6.0, 2.0),
+    "folder": (20.0, 5.0),
+}
+
+# Main products are removed with ODIS; their components are MSI packages that
+# only disappear once the product they belong to is gone.
+ODIS_PRODUCTS = [
+    "AutoCAD {year}",
+    "Revit {year}",
+    "AutoCAD Architecture {year}",
+    "AutoCAD Mechanical {year}",
+    "Autodesk Civil 3D {year}",
+    "Autodesk 3ds Max {year}",
+    "Autodesk Inventor Professional {year}",
+    "Autodesk Navisworks Manage {year}",
+]
+
+MSI_COMPONENTS = [
+    "{product} Language Pack - English",
+    "{product} Language Pack - French",
+    "{product} Language Pack - German",
+    "Revit Content Libraries {year}",
+    "Autodesk Material Library {year}",
+    "Autodesk Material Library Base Resolution Image Library {year}",
+    "Autodesk Revit Interoperability for 3ds Max {year}",
+    "Autodesk Save to Web and Mobile",
+    "Autodesk Desktop Connector",
+    "Personal Accelerator for Revit",
+]
+
+SPECIAL_PRODUCTS = [
+    "Autodesk Access",
+    "Autodesk Identity Manager",
+    "Autodesk Genuine Service",
+    "Carbon Insights for Revit {year}",
+]
+
+OTHER_PRODUCTS = [
+    ("Microsoft Visual C++ 2015-2022 Redistributable (x64)", "Microsoft Corporation"),
+    ("Microsoft Edge WebView2 Runtime", "Microsoft Corporation"),
+    ("Microsoft .NET Desktop Runtime", "Microsoft Corporation"),
+    ("Microsoft Office Professional Plus", "Microsoft Corporation"),
+    ("Google Chrome", "Google LLC"),
+    ("Mozilla Firefox", "Mozilla"),
+    ("7-Zip", "Igor Pavlov"),
+    ("Adobe Acrobat Reader", "Adobe"),
+    ("Bluebeam Revu", "Bluebeam, Inc."),
+    ("Enscape", "Enscape GmbH"),
+    ("Rhino", "Robert McNeel & Associates"),
+    ("SketchUp", "Trimble Inc."),
+    ("Notepad++", "Notepad++ Team"),
+    ("Zoom Workplace", "Zoom Video Communications, Inc."),
+    ("NVIDIA Graphics Driver", "NVIDIA Corporation"),
+    ("Intel(R) Management Engine Components", "Intel Corporation"),
+]
+
+YEARS = list(range(2019, 2027))
+
+def _env_float(name, default):
+    """Read a float from the environment"""
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+def _env_int(name, default):
+    """Read an int from the environment"""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+class SimulatedBackend:
+    """Execution backend that runs against a synthetic Windows machine.
+
+    The machine holds an in-memory uninstall registry split across the 64-bit
+    and WOW6432Node hives. Removals sleep for a modelled, per-method latency
+    (scaled by latency_scale), fail at failure_rate, and components whose
+    parent product is still installed survive the pass they were removed in,
+    the same way real suites need several passes. Like Windows Installer,
+    only one MSI removal can run at a time; one started while another is in
+    progress fails with error 1618.
+
+    product_mix, e.g. {"odis": 0.5, "msi": 0.3, "special": 0.2}, replaces the
+    realistic mix of suites and their components with Autodesk products of
+    each removal method in those proportions, none depending on another.
+    """
+
+    name = "simulator"
+
+    MIN_REGISTRY_SIZE = 10
+    MAX_REGISTRY_SIZE = 10000
+
+    def __init__(self, registry_size=200, autodesk_share=0.1, latency_scale=0.1,
+                 failure_rate=0.05, latencies=None, is_admin=True, seed=None, product_mix=None):
+        self.registry_size = min(max(registry_size, self.MIN_REGISTRY_SIZE), self.MAX_REGISTRY_SIZE)
+        self.autodesk_share = autodesk_share
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.is_admin = is_admin
+        self.product_mix = product_mix
+        self.autodesk_folder_exists = True
+        self.restart_requested = False
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Stands in for the Windows Installer _MSIExecute mutex
+        self._msi_mutex = threading.Lock()
+        self.registry = InMemoryRegistry()
+        self.filesystem = InMemoryFilesystem()
+        self._populate()
+
+    @classmethod
+    def from_environment(cls):
+        """Create a simulator configured through AUTODESK_UNINSTALLER_SIM_* variables"""
+        return cls(**cls.environment_options())
+
+    @staticmethod
+    def environment_options():
+        """Return the constructor options set through AUTODESK_UNINSTALLER_SIM_* variables"""
+        seed = os.environ.get("AUTODESK_UNINSTALLER_SIM_SEED")
+        return dict(
+            registry_size=_env_int("AUTODESK_UNINSTALLER_SIM_REGISTRY_SIZE", 200),
+            autodesk_share=_env_float("AUTODESK_UNINSTALLER_SIM_AUTODESK_SHARE", 0.1),
+            latency_scale=_env_float("AUTODESK_UNINSTALLER_SIM_LATENCY_SCALE", 0.1),
+            failure_rate=_env_float("AUTODESK_UNINSTALLER_SIM_FAILURE_RATE", 0.05),
+            is_admin=os.environ.get("AUTODESK_UNINSTALLER_SIM_ADMIN", "1") != "0",
+            seed=int(seed) if seed else None
+        )
+
+    # -- registry generation -------------------------------------------------
+
+    def _guid(self):
+        """Return a random product code in registry form"""
+        return "{" + str(uuid.UUID(int=self._random.getrandbits(128))).upper() + "}"
+
+    def _add_entry(self, display_name, publisher, method, uninstall_string=None,
+                   key=None, parent=None, hive=HIVE_64, install_location=""):
+        """Add one uninstall key to the registry"""
+        key = key or self._guid()
+        if uninstall_string is None:
+            uninstall_string = f"MsiExec.exe /X{key}" if method == "msi" else ""
+        self.registry.set_key(hive, key, {
+            "DisplayName": display_name,
+            "Publisher": publisher,
+            "UninstallString": uninstall_string,
+            "InstallLocation": install_location,
+            "_parent": parent,
+        })
+        return key
+
+    def _add_special(self, name):
+        """Add a licensing or helper component removed by its own uninstaller"""
+        display_name = name.format(year=self._random.choice(YEARS))
+        uninstall_string = ""
+        if name == "Autodesk Access":
+            uninstall_string = f'"{ODIS_INSTALLER}" -i uninstall'
+        elif name == "Autodesk Identity Manager":
+            uninstall_string = '"C:\\Program Files\\Autodesk\\AdskIdentityManager\\uninstall.exe"'
+        self._add_entry(display_name, "Autodesk", "special", uninstall_string)
+
+    def _add_odis_product(self, year):
+        """Add a main product removed through ODIS; return (key, display name)"""
+        product = self._random.choice(ODIS_PRODUCTS).format(year=year)
+        key = self._guid()
+        uninstall_string = (f'"{ODIS_INSTALLER}" -i uninstall --trigger_point system '
+                            f'-m "{ODIS_METADATA}\\{key}\\bundleManifest.xml"')
+        self._add_entry(product, "Autodesk, Inc.", "odis", uninstall_string, key=key,
+                        install_location=f"C:\\Program Files\\Autodesk\\{product}\\")
+        self._add_metadata(key)
+        return key, product
+
+    def _populate_mix(self, autodesk_count):
+        """Generate independent Autodesk products in the proportions of product_mix"""
+        total = sum(self.product_mix.values())
+        for method, share in sorted(self.product_mix.items()):
+            for index in range(round(autodesk_count * share / total)):
+                year = self._random.choice(YEARS)
+                if method == "odis":
+                    self._add_odis_product(year)
+                elif method == "msi":
+                    product = self._random.choice(ODIS_PRODUCTS).format(year=year)
+                    component = self._random.choice(MSI_COMPONENTS).format(product=product, year=year)
+                    hive = HIVE_32 if self._random.random() < 0.3 else HIVE_64
+                    self._add_entry(component, "Autodesk", "msi", hive=hive)
+                else:
+                    self._add_special(SPECIAL_PRODUCTS[index % len(SPECIAL_PRODUCTS)])
+
+    def _populate(self):
+        """Generate a registry of registry_size keys"""
+        autodesk_count = min(self.registry_size, max(5, int(self.registry_size * self.autodesk_share)))
+        if self.product_mix:
+            self._populate_mix(autodesk_count)
+        else:
+            self._populate_suites(autodesk_count)
+
+        # Everything else installed on the machine
+        for _ in range(self.registry_size - autodesk_count):
+            name, publisher = self._random.choice(OTHER_PRODUCTS)
+            display_name = f"{name} {self._random.randint(1, 30)}.{self._random.randint(0, 9)}"
+            hive = HIVE_32 if self._random.random() < 0.4 else HIVE_64
+            self._add_entry(display_name, publisher, "msi", hive=hive)
+
+        self._add_residue()
+        logger.info(f"Simulated registry holds {self.registry_size} uninstall keys "
+                    f"({autodesk_count} Autodesk)")
+
+    def _populate_suites(self, autodesk_count):
+        """Generate Autodesk suites the way they are really installed"""
+        # Licensing and helper components exist once per machine
+        for name in SPECIAL_PRODUCTS[:min(len(SPECIAL_PRODUCTS), autodesk_count)]:
+            self._add_special(name)
+
+        # Main products, each followed by the components that depend on it
+        added = sum(len(self.registry.subkeys(hive)) for hive in UNINSTALL_KEY_PATHS)
+        while added < autodesk_count:
+            year = self._random.choice(YEARS)
+            key, product = self._add_odis_product(year)
+            added += 1
+
+            for _ in range(self._random.randint(0, 4)):
+                if added >= autodesk_count:
+                    break
+                component = self._random.choice(MSI_COMPONENTS).format(product=product, year=year)
+                hive = HIVE_32 if self._random.random() < 0.3 else HIVE_64
+                self._add_entry(component, "Autodesk", "msi", parent=key, hive=hive)
+                added += 1
+
+    def _add_metadata(self, key):
+        """Create the ODIS metadata folder of a product"""
+        self.filesystem.add_file(f"{ODIS_METADATA}\\{key}\\bundleManifest.xml", 40000)
+        self.filesystem.add_file(f"{ODIS_METADATA}\\{key}\\setup.xml", 8000)
+
+    def _add_residue(self):
+        """Create shared files plus leftovers of products removed before the simulation started
+
+        Names are derived rather than drawn from the random generator, so a
+        seed produces the same machine as before they existed.
+        """
+        for folder in ADLM_FOLDERS:
+            self.filesystem.add_file(f"{folder}\\ProductInformation.pit", 20000)
+        self.filesystem.add_file(f"{IDENTITY_MANAGER_FOLDERS[0]}\\AdskIdentityManager.exe", 5000000)
+        self.filesystem.add_file(f"{IDENTITY_MANAGER_FOLDERS[1]}\\settings.json", 2000)
+
+        stale = ["{" + str(uuid.uuid5(uuid.NAMESPACE_OID, f"adu-residue-{index}")).upper() + "}"
+                 for index in range(3)]
+        for key in stale:
+            self._add_metadata(key)
+        # One key stripped of its name, one emptied completely
+        self.registry.set_key(HIVE_64, stale[0], {"InstallLocation": "C:\\Program Files\\Autodesk\\Removed\\"})
+        self.registry.set_key(HIVE_32, stale[1], {})
+
+    # -- helpers -------------------------------------------------------------
+
+    def _find(self, key):
+        """Return (hive, entry) for an uninstall key, or (None, None)"""
+        for hive in UNINSTALL_KEY_PATHS:
+            entry = self.registry.get_key(hive, key)
+            if entry is not None:
+                return hive, entry
+        return None, None
+
+    def _removal_method(self, key, entry):
+        """Return (method, lane) the way the PowerShell backend would pick them"""
+        product = {"displayName": entry["DisplayName"], "psChildName": key,
+                   "uninstallString": entry.get("UninstallString")}
+        # Every simulated ODIS product has its bundle manifest
+        return classify_product(product, path_exists=lambda path: True)
+
+    def _wait(self, kind):
+        """Sleep for the modelled duration of an operation"""
+        mean, jitter = self.latencies[kind]
+        duration = max(0.0, self._random.gauss(mean, jitter)) * self.latency_scale
+        if duration:
+            time.sleep(duration)
+
+    # -- backend interface ---------------------------------------------------
+
+    def open_session(self):
+        """The simulator needs no session; return a context manager that does nothing"""
+        return contextlib.nullcontext(self)
+
+    def check_admin_rights(self):
+        """Report the configured privilege level"""
+        return self.is_admin
+
+    def get_installed_autodesk_products(self):
+        """Get a list of installed Autodesk products"""
+        return discover_products(self.registry)
+
+    def _emit(self, on_event, event, pass_number):
+        """Deliver a progress event shaped like the PowerShell ones"""
+        if on_event is not None:
+            event["pass"] = pass_number
+            on_event(event)
+
+    def lookup_products(self, product_ids):
+        """Return the products among product_ids that are still installed"""
+        return lookup_products(self.registry, product_ids)
+
+    def inventory_fingerprint(self):
+        """Return a token that changes whenever a key is added or removed"""
+        return uninstall_keys_fingerprint(self.registry)
+
+    def removal_method(self, product):
+        """Return (method, lane) for a product"""
+        return classify_product(product, path_exists=lambda path: True)
+
+    def run_uninstall_pass(self, product_ids, pass_number, on_event=None):
+        """Run one uninstallation pass and return its results"""
+        # Look up each target's key, as Get-AduUninstallEntries does
+        targets = []
+        for key in dict.fromkeys(product_ids):
+            hive, entry = self._find(key)
+            if entry is not None and entry.get("DisplayName"):
+                targets.append((key, entry))
+
+        if not targets:
+            self._emit(on_event, {"event": "pass", "status": "info",
+                                  "message": "All selected products appear to be uninstalled or were not found"},
+                       pass_number)
+            return {
+                "status": "info",
+                "message": "All selected products appear to be uninstalled or were not found"
+            }
+
+        return [self._uninstall(key, entry, pass_number, on_event) for key, entry in targets]
+
+    def uninstall_product(self, product, pass_number, on_event=None):
+        """Uninstall a single product and return its result"""
+        key = product['psChildName']
+        hive, entry = self._find(key)
+        if entry is None or not entry.get("DisplayName"):
+            return {
+                "displayName": product.get('displayName'),
+                "status": "info",
+                "message": "Product appears to be uninstalled or was not found"
+            }
+        return self._uninstall(key, entry, pass_number, on_event)
+
+    def _uninstall(self, key, entry, pass_number, on_event):
+        """Remove one product with started/finished events around it"""
+        result = {"displayName": entry["DisplayName"], "status": "unknown", "message": ""}
+        self._emit(on_event, {"event": "started", "psChildName": key,
+                              "displayName": entry["DisplayName"]}, pass_number)
+        self._remove(key, entry, result, pass_number, on_event)
+        result["removed"] = self._find(key)[1] is None
+        self._emit(on_event, {"event": "finished", "psChildName": key, "displayName": entry["DisplayName"],
+                              "status": result["status"], "message": result["message"],
+                              "removed": result["removed"]}, pass_number)
+        return result
+
+    def _remove(self, key, entry, result, pass_number, on_event):
+        """Simulate removing one product, filling in result"""
+        method, lane = self._removal_method(key, entry)
+        if method is None:
+            result["status"] = "error"
+            result["message"] = ("No clear uninstallation method found. PSChildName not a GUID "
+                                 "and no installer.exe found.")
+            return
+
+        self._emit(on_event, {"event": "method", "psChildName": key, "displayName": entry["DisplayName"],
+                              "method": method}, pass_number)
+
+        if lane == MSI_LANE and not self._msi_mutex.acquire(blocking=False):
+            result["status"] = "error"
+            result["message"] = ("Error: Installer exited with code 1618 "
+                                 "(another installation is already in progress)")
+            return
+        try:
+            self._wait(method)
+        finally:
+            if lane == MSI_LANE:
+                self._msi_mutex.release()
+
+        if self._random.random() < self.failure_rate:
+            result["status"] = "error"
+            result["message"] = "Error: Installer exited with code 1603"
+            return
+
+        with self._lock:
+            hive, current = self._find(key)
+            parent = current.get("_parent") if current else None
+            # A component removed while its product is installed comes back
+            if current is not None and (parent is None or self._find(parent)[1] is None):
+                self.registry.delete_key(hive, key)
+
+        if method in ("odis", "msi") or lane == MSI_LANE:
+            self._settle(key, pass_number, on_event)
+
+        result["status"] = "success"
+        result["message"] = {
+            "odis": "Successfully uninstalled using ODIS bundle",
+            "msi": "Successfully uninstalled using MSI",
+            "special": "Successfully uninstalled",
+        }[method]
+
+    def _settle(self, key, pass_number, on_event):
+        """Model Wait-AduRemoval: return at once if the key is gone, else wait it out"""
+        timeout = SETTLE_TIMEOUT_MS * self.latency_scale
+        waited = 0.0
+        if self._find(key)[1] is not None:
+            waited = timeout
+            time.sleep(timeout / 1000.0)
+        self._emit(on_event, {"event": "waited", "psChildName": key, "waitedMs": round(waited),
+                              "savedMs": round(timeout - waited)}, pass_number)
+
+    def wait_until_idle(self, timeout):
+        """Wait up to timeout seconds for the simulated MSI mutex to be free"""
+        return wait_until(lambda: not self._msi_mutex.locked(), timeout)
+
+    def delete_autodesk_folder(self, on_event=None):
+        """Delete the simulated C:\\Autodesk folder, reporting progress like the real backend"""
+        report = {"path": "C:\\Autodesk", "filesRemoved": 0, "bytesRemoved": 0, "locked": [],
+                  "lockedCount": 0, "errors": [], "seconds": 0.0, "complete": True}
+        if self.autodesk_folder_exists:
+            start = time.monotonic()
+            self._wait("folder")
+            report["filesRemoved"] = self._random.randint(500, 5000)
+            report["bytesRemoved"] = report["filesRemoved"] * self._random.randint(20000, 2000000)
+            if self._random.random() < self.failure_rate:
+                logger.warning("Simulated failure deleting C:\\Autodesk folder")
+                report["locked"] = ["C:\\Autodesk\\Setup.log"]
+                report["lockedCount"] = 1
+                report["complete"] = False
+            else:
+                self.autodesk_folder_exists = False
+            report["seconds"] = round(time.monotonic() - start, 3)
+        if on_event is not None:
+            on_event(dict(report, event="folder_finished"))
+        return report["complete"]
+
+    def residue_sweeper(self):
+        """Return a sweeper over the simulated disk and registry"""
+        return ResidueSweeper(self.filesystem, self.registry)
+
+    def footprint_roots(self):
+        """Return the Autodesk folders of the simulated disk, at their default Windows paths"""
+        return footprint_roots(self.filesystem, environ={})
+
+    def footprint_scanner(self):
+        """Return a scanner over the simulated disk"""
+        return FilesystemScanner(self.filesystem)
+
+    def restart_computer(self):
+        """Record the restart instead of performing it"""
+        logger.info("Simulated computer restart requested")
+        self.restart_requested = True
+        return True
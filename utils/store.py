@@ -0,0 +1,271 @@
+import threading
+import logging
+import sqlite3
+import hashlib
+import socket
+import queue
+import time
+import os
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+STORE_ENV_VAR = "AUTODESK_UNINSTALLER_INVENTORY_DB"
+
+# Snapshots written per transaction at most
+WRITE_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL COLLATE NOCASE,
+    taken_at REAL NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_host ON snapshots (host, taken_at);
+
+CREATE TABLE IF NOT EXISTS snapshot_products (
+    snapshot_id INTEGER NOT NULL,
+    product_code TEXT NOT NULL COLLATE NOCASE,
+    display_name TEXT NOT NULL COLLATE NOCASE,
+    publisher TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshot_products_snapshot ON snapshot_products (snapshot_id);
+CREATE INDEX IF NOT EXISTS snapshot_products_code ON snapshot_products (product_code);
+CREATE INDEX IF NOT EXISTS snapshot_products_name ON snapshot_products (display_name);
+
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY COLLATE NOCASE,
+    snapshot_id INTEGER NOT NULL,
+    seen_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL COLLATE NOCASE,
+    product_code TEXT NOT NULL COLLATE NOCASE,
+    display_name TEXT NOT NULL COLLATE NOCASE,
+    change TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_at ON changes (change, at);
+CREATE INDEX IF NOT EXISTS changes_code ON changes (product_code, at);
+CREATE INDEX IF NOT EXISTS changes_host ON changes (host, at);
+"""
+
+def _digest(products):
+    """Identify a product list independent of order"""
+    pairs = sorted((product['psChildName'].lower(), product.get('displayName') or '') for product in products)
+    return hashlib.sha256(repr(pairs).encode("utf-8")).hexdigest()
+
+def _contains(text):
+    """LIKE pattern matching text anywhere, with wildcards in text escaped"""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class InventoryStore:
+    """SQLite history of inventory snapshots, per host.
+
+    record() queues a snapshot; a writer thread commits queued snapshots
+    in batches, one transaction each. A snapshot identical to the host's
+    previous one only refreshes its last-seen time. Products added or
+    removed between a host's consecutive snapshots are written to a
+    changes table as they are recorded, so "removed since" questions are
+    index range scans instead of diffs over the whole history, and the
+    hosts table points at each host's latest snapshot so "who still has
+    X" only reads current snapshots.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _open(self):
+        """Open a connection tuned for a write-ahead log"""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        # Readers keep working while the writer thread commits
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self):
+        """Return this thread's connection, used as a transaction context manager"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._open()
+        return connection
+
+    def record(self, host, products, taken_at=None):
+        """Queue a snapshot of host's products for the writer thread"""
+        self._queue.put((host, taken_at or time.time(), list(products)))
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, name="inventory-store", daemon=True)
+                self._writer.start()
+
+    def flush(self):
+        """Wait until every queued snapshot is committed"""
+        self._queue.join()
+
+    def _write_forever(self):
+        """Commit queued snapshots, as many per transaction as are waiting"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.error(f"Failed to store {len(batch)} inventory snapshots: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def write(self, snapshots):
+        """Write (host, taken_at, products) snapshots in one transaction"""
+        with self._connection() as connection:
+            for host, taken_at, products in snapshots:
+                self._write_snapshot(connection, host, taken_at, products)
+
+    def _write_snapshot(self, connection, host, taken_at, products):
+        """Insert one snapshot and the changes since the host's previous one"""
+        digest = _digest(products)
+        previous = connection.execute(
+            "SELECT h.snapshot_id, s.digest FROM hosts h JOIN snapshots s ON s.id = h.snapshot_id WHERE h.host = ?",
+            (host,)).fetchone()
+        if previous is not None and previous["digest"] == digest:
+            connection.execute("UPDATE hosts SET seen_at = ? WHERE host = ?", (taken_at, host))
+            return
+
+        snapshot_id = connection.execute("INSERT INTO snapshots (host, taken_at, digest) VALUES (?, ?, ?)",
+                                         (host, taken_at, digest)).lastrowid
+        # Uninstall key names are case-insensitive
+        current = {product['psChildName'].lower(): product for product in products}
+        connection.executemany(
+            "INSERT INTO snapshot_products (snapshot_id, product_code, display_name, publisher) VALUES (?, ?, ?, ?)",
+            [(snapshot_id, product['psChildName'], product.get('displayName') or '', product.get('publisher'))
+             for product in current.values()])
+
+        before = {}
+        if previous is not None:
+            before = {row["product_code"].lower(): row for row in connection.execute(
+                "SELECT product_code, display_name FROM snapshot_products WHERE snapshot_id = ?",
+                (previous["snapshot_id"],))}
+        changes = [(host, product['psChildName'], product.get('displayName') or '', "added", taken_at)
+                   for key, product in current.items() if key not in before]
+        changes += [(host, row["product_code"], row["display_name"], "removed", taken_at)
+                    for key, row in before.items() if key not in current]
+        connection.executemany(
+            "INSERT INTO changes (host, product_code, display_name, change, at) VALUES (?, ?, ?, ?, ?)", changes)
+        connection.execute(
+            "INSERT INTO hosts (host, snapshot_id, seen_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(host) DO UPDATE SET snapshot_id = excluded.snapshot_id, seen_at = excluded.seen_at",
+            (host, snapshot_id, taken_at))
+
+    def hosts_with(self, name=None, product_code=None):
+        """Return the hosts whose latest snapshot has a matching product
+
+        name matches anywhere in the display name, case-insensitively;
+        product_code matches the uninstall key exactly.
+        """
+        clauses = []
+        parameters = []
+        if name:
+            clauses.append("p.display_name LIKE ? ESCAPE '\\'")
+            parameters.append(_contains(name))
+        if product_code:
+            clauses.append("p.product_code = ?")
+            parameters.append(product_code)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # CROSS JOIN keeps SQLite reading current snapshots only, not the history
+        rows = self._connection().execute(
+            "SELECT h.host, p.product_code, p.display_name, h.seen_at "
+            f"FROM hosts h CROSS JOIN snapshot_products p ON p.snapshot_id = h.snapshot_id {where} "
+            "ORDER BY h.host, p.display_name", parameters).fetchall()
+        return [{"host": row["host"], "psChildName": row["product_code"], "displayName": row["display_name"],
+                 "seenAt": row["seen_at"]} for row in rows]
+
+    def changes(self, change="removed", since=0.0, host=None, name=None, product_code=None, after=None, limit=100):
+        """Return (changes, next_after) of one kind at or after since, oldest first
+
+        after is the (at, id) of the last change of the previous page.
+        """
+        clauses = ["change = ?", "at >= ?"]
+        parameters = [change, since]
+        if host:
+            clauses.append("host = ?")
+            parameters.append(host)
+        if product_code:
+            clauses.append("product_code = ?")
+            parameters.append(product_code)
+        if name:
+            clauses.append("display_name LIKE ? ESCAPE '\\'")
+            parameters.append(_contains(name))
+        if after is not None:
+            clauses.append("(at > ? OR (at = ? AND id > ?))")
+            parameters += [after[0], after[0], after[1]]
+        rows = self._connection().execute(
+            f"SELECT id, host, product_code, display_name, change, at FROM changes WHERE {' AND '.join(clauses)} "
+            "ORDER BY at, id LIMIT ?", parameters + [limit + 1]).fetchall()
+        page = [{"host": row["host"], "psChildName": row["product_code"], "displayName": row["display_name"],
+                 "change": row["change"], "at": row["at"]} for row in rows[:limit]]
+        next_after = (rows[limit - 1]["at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return page, next_after
+
+    def host_products(self, host):
+        """Return the products in a host's latest snapshot, or None for an unknown host"""
+        connection = self._connection()
+        current = connection.execute("SELECT snapshot_id, seen_at FROM hosts WHERE host = ?", (host,)).fetchone()
+        if current is None:
+            return None
+        rows = connection.execute(
+            "SELECT product_code, display_name, publisher FROM snapshot_products WHERE snapshot_id = ? "
+            "ORDER BY display_name", (current["snapshot_id"],)).fetchall()
+        return [{"psChildName": row["product_code"], "displayName": row["display_name"],
+                 "publisher": row["publisher"]} for row in rows]
+
+def default_store_path():
+    """Return the configured store path, or None when the store is disabled"""
+    path = os.environ.get(STORE_ENV_VAR)
+    if path is not None:
+        return path or None
+    base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    return os.path.join(base, "AutodeskUninstaller", "inventory.sqlite3")
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_default_store():
+    """Return the process-wide inventory store, or None when disabled"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            path = default_store_path()
+            if path is None:
+                return None
+            _default_store = InventoryStore(path)
+        return _default_store
+
+def history_store(simulated=False):
+    """Return the store inventories should be recorded in, or None
+
+    Simulated inventories are only recorded when a store is configured
+    explicitly, so trying the simulator never mixes invented hosts and
+    products into the real history.
+    """
+    if simulated and not os.environ.get(STORE_ENV_VAR):
+        return None
+    return get_default_store()
+
+def local_host():
+    """Name snapshots of this machine are stored under"""
+    return socket.gethostname()
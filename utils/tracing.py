@@ -0,0 +1,194 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import tempfile
+import cProfile
+import pstats
+import time
+import io
+import os
+import re
+
+TRACE_ENV_VAR = "AUTODESK_UNINSTALLER_TRACE"
+PROFILE_DIR_ENV_VAR = "AUTODESK_UNINSTALLER_PROFILE_DIR"
+
+# Spans kept per trace; a runaway job stops recording rather than growing without bound
+MAX_EVENTS = 100000
+
+_active = contextvars.ContextVar("autodesk_uninstaller_trace", default=None)
+
+def trace_all_jobs():
+    """True when every uninstall job should be traced"""
+    return os.environ.get(TRACE_ENV_VAR, "0").strip().lower() in ("1", "true", "yes")
+
+class Trace:
+    """Timed, nested spans of one job, exportable as Chrome trace events.
+
+    Spans are recorded as complete ("X") events on the thread that ran
+    them, so chrome://tracing and Perfetto show the lanes of an uninstall
+    pass side by side, each with its PowerShell calls nested inside.
+    """
+
+    def __init__(self, name, max_events=MAX_EVENTS):
+        self.name = name
+        self.started_at = time.time()
+        self.max_events = max_events
+        self.dropped = 0
+        self._origin = time.perf_counter()
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, category, start, end, args):
+        """Record a finished span; start and end are perf_counter() values"""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args
+        }
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+
+    def to_chrome(self):
+        """Return the trace in the Chrome Trace Event format"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.name}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                     for tid, name in threads.items()]
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"name": self.name, "startedAt": self.started_at, "droppedEvents": self.dropped}
+        }
+
+class _Span:
+    """A span being timed; annotate() adds arguments shown in the trace viewer"""
+
+    __slots__ = ("trace", "name", "category", "args", "start")
+
+    def __init__(self, trace, name, category, args):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def annotate(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = str(exc) or exc_type.__name__
+        self.trace.add(self.name, self.category, self.start, time.perf_counter(), self.args)
+        return False
+
+class _NoSpan:
+    """Stands in for a span when nothing is being traced"""
+
+    def annotate(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name, category="app", **args):
+    """Time a with block as a span of the active trace
+
+    Without an active trace this returns a shared do-nothing object, so
+    instrumented code costs one context variable read when tracing is off.
+    """
+    trace = _active.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, category, args)
+
+def current_trace():
+    """Return the trace active in this context, or None"""
+    return _active.get()
+
+@contextlib.contextmanager
+def activate(trace):
+    """Make trace (which may be None) the active trace inside the with block"""
+    token = _active.set(trace)
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+def bind(function):
+    """Let function record into the active trace when it runs on another thread"""
+    if _active.get() is None:
+        return function
+    # Each task gets its own copy: one context can't be entered by two threads at once
+    return functools.partial(contextvars.copy_context().run, function)
+
+def summarize_command(command, length=120):
+    """First line of a PowerShell command, short enough for a span argument"""
+    line = next((line.strip() for line in command.splitlines() if line.strip()), "")
+    return line if len(line) <= length else line[:length - 3] + "..."
+
+_profile_lock = threading.Lock()
+
+def start_profile():
+    """Start profiling the calling thread, or return None if a profile is already running
+
+    Only one profiler can be active in a process at a time.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except Exception:
+        _profile_lock.release()
+        raise
+    return profile
+
+def stop_profile(profile):
+    """Stop a profile started by start_profile"""
+    try:
+        profile.disable()
+    finally:
+        _profile_lock.release()
+
+def profile_text(profile, limit=60):
+    """Render the most expensive calls of a profile, by cumulative time"""
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+def profile_dir():
+    """Folder profiles are saved in"""
+    return (os.environ.get(PROFILE_DIR_ENV_VAR)
+            or os.path.join(tempfile.gettempdir(), "AutodeskUninstaller", "profiles"))
+
+def save_profile(profile, label):
+    """Save a profile for snakeviz or pstats and return its path"""
+    folder = profile_dir()
+    os.makedirs(folder, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_") or "request"
+    path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.prof")
+    profile.dump_stats(path)
+    return path